@@ -9,12 +9,12 @@ from .bead import UnpackableBead
 from . import meta
 from . import tech
 
-from .ziparchive import ZipArchive
+from .ziparchive import ZipArchive, SCOPE_ALL, SCOPE_CODE, SCOPE_DATA
 from .exceptions import InvalidArchive
 
 persistence = tech.persistence
 
-__all__ = ('Archive', 'InvalidArchive')
+__all__ = ('Archive', 'InvalidArchive', 'SCOPE_ALL', 'SCOPE_CODE', 'SCOPE_DATA')
 
 
 CACHE_CONTENT_ID = 'content_id'
@@ -117,8 +117,8 @@ class Archive(UnpackableBead):
         # need not match
         self.cache.setdefault(CACHE_INPUT_MAP, ziparchive.input_map)
 
-    def validate(self):
-        self.ziparchive.validate()
+    def validate(self, scope=SCOPE_ALL):
+        return self.ziparchive.validate(scope)
 
     @property
     def inputs(self):
@@ -127,17 +127,32 @@ class Archive(UnpackableBead):
         except LookupError:
             return self.ziparchive.inputs
 
-    def extract_dir(self, zip_dir, fs_dir):
-        return self.ziparchive.extract_dir(zip_dir, fs_dir)
+    def extract_dir(self, zip_dir, fs_dir, accept=None, readonly=False, link_index=None):
+        return self.ziparchive.extract_dir(zip_dir, fs_dir, accept, readonly, link_index)
 
-    def extract_file(self, zip_path, fs_path):
-        return self.ziparchive.extract_file(zip_path, fs_path)
+    def extract_file(self, zip_path, fs_path, readonly=False):
+        return self.ziparchive.extract_file(zip_path, fs_path, readonly)
+
+    def data_members(self):
+        return self.ziparchive.data_members()
+
+    def open_data(self, path):
+        return self.ziparchive.open_data(path)
+
+    def validate_data_member(self, path):
+        self.ziparchive.validate_data_member(path)
+
+    def copy_compressed_member(self, zip_path, target, target_info):
+        self.ziparchive.copy_compressed_member(zip_path, target, target_info)
+
+    def export(self, filename):
+        self.ziparchive.export(filename)
 
     def unpack_code_to(self, fs_dir):
         self.ziparchive.unpack_code_to(fs_dir)
 
-    def unpack_data_to(self, fs_dir):
-        self.ziparchive.unpack_data_to(fs_dir)
+    def unpack_data_to(self, fs_dir, accept=None, readonly=False, link_index=None):
+        self.ziparchive.unpack_data_to(fs_dir, accept, readonly, link_index)
 
     def unpack_meta_to(self, workspace):
         workspace.meta = self.ziparchive.meta
@@ -51,7 +51,13 @@ class UnpackableBead(Bead, metaclass=ABCMeta):
         self.unpack_meta_to(workspace)
 
     @abstractmethod
-    def unpack_data_to(self, path):
+    def unpack_data_to(self, path, accept=None, readonly=False, link_index=None):
+        '''
+        Extract data files, for which accept(path relative to data) is true (default: all).
+
+        With readonly=True the extracted files and directories are read only,
+        and files might be hard links to copies known to link_index.
+        '''
         pass
 
     @abstractmethod
@@ -0,0 +1,91 @@
+'''
+Content addressed storage of bead files
+'''
+
+import os
+import re
+import shutil
+import tempfile
+
+from . import tech
+
+securehash = tech.securehash
+
+# all hash algorithms produce sha512 hex digests
+_HASH = re.compile('[0-9a-f]{128}')
+
+
+def is_valid_hash(hash):
+    '''
+    Is hash a well formed content hash - thus safe to be used as a file name?
+    '''
+    return isinstance(hash, str) and _HASH.fullmatch(hash) is not None
+
+
+class BlobStore:
+    """
+    I store file contents (blobs) by their content hash (as found in bead manifests).
+
+    Blobs are immutable (read only), adding a blob already in the store is a no-op,
+    so beads sharing files store them only once.
+    """
+
+    def __init__(self, directory):
+        self.directory = tech.fs.Path(directory)
+
+    def path(self, hash):
+        if not is_valid_hash(hash):
+            raise ValueError(f'Invalid blob hash: {hash!r}')
+        return self.directory / hash[:2] / hash
+
+    def __contains__(self, hash):
+        return os.path.exists(self.path(hash))
+
+    def add_file(self, path, hash, algorithm=securehash.SHA512):
+        '''
+        Store the content of file at path having content hash (calculated with algorithm).
+
+        The copied content is hashed again, so that a file changed since hash was
+        calculated is stored under the hash of its stored content, not under hash.
+        Return the hash the content is stored under.
+        '''
+        if os.path.exists(self.path(hash)):
+            return hash
+        os.makedirs(self.directory, exist_ok=True)
+        # atomic update: blobs are either missing or complete
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.blob-')
+        try:
+            with os.fdopen(fd, 'wb') as blob, open(path, 'rb') as source:
+                shutil.copyfileobj(source, blob)
+            with open(temp_path, 'rb') as blob:
+                stored_hash = securehash.hash_file(
+                    algorithm, blob, os.path.getsize(temp_path))
+            blob_path = self.path(stored_hash)
+            if os.path.exists(blob_path):
+                os.remove(temp_path)
+                return stored_hash
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tech.fs.make_readonly(temp_path)
+            os.replace(temp_path, blob_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return stored_hash
+
+    def has_content(self, hash, size, algorithm=securehash.SHA512):
+        '''
+        Verify, that the stored blob is present and it has the expected content.
+
+        hash is the content hash calculated with algorithm.
+        '''
+        if not is_valid_hash(hash):
+            return False
+        blob_path = self.path(hash)
+        try:
+            if os.path.getsize(blob_path) != size:
+                return False
+            with open(blob_path, 'rb') as blob:
+                return securehash.hash_file(algorithm, blob, size) == hash
+        except OSError:
+            return False
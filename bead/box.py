@@ -14,12 +14,16 @@ Boxes can be used to:
   (this is naive access control, but could work)
 '''
 
+from collections import defaultdict
 from datetime import datetime, timedelta
 from glob import iglob, escape as glob_escape
 import os
-from typing import Iterator, Iterable, Sequence
+import re
+from typing import Dict, Iterator, Iterable, Sequence, Tuple
 
 from .archive import Archive, InvalidArchive
+from .blobstore import BlobStore
+from . import layouts
 from . import spec as bead_spec
 from .tech.timestamp import time_from_timestamp
 from .import tech
@@ -71,6 +75,13 @@ def compile_conditions(conditions):
     return match
 
 
+# beadname_20170615T075813302092+0200.zip
+_BEAD_FILE_NAME = re.compile(r'^(.*)_[0-9]{8}T[0-9]{12}[-+][0-9]{4}\.zip$')
+
+# (bead name, time) -> context of beads with the name around time
+ContextQuery = Tuple[str, datetime]
+
+
 ARCHIVE_COMMENT = '''
 This file is a BEAD zip archive.
 
@@ -128,6 +139,12 @@ class Box:
         '''
         return iter(self._beads([]))
 
+    def archive_filenames(self) -> Sequence[str]:
+        '''
+        Paths of all bead archives in this Box - including ones, that can not be opened.
+        '''
+        return sorted(iglob(Path(glob_escape(self.directory)) / '*.zip'))
+
     def _beads(self, conditions) -> Iterable[Archive]:
         '''
         Retrieve matching beads.
@@ -162,13 +179,47 @@ class Box:
             else:
                 yield archive
 
-    def store(self, workspace, freeze_time):
+    @property
+    def blob_store(self):
+        '''
+        Store of data files shared by beads, or None if beads are stored as standalone zips.
+        '''
+        blobs_directory = self.directory / layouts.Box.BLOBS
+        if os.path.isdir(blobs_directory):
+            return BlobStore(blobs_directory)
+        return None
+
+    def make_content_addressed(self):
+        '''
+        Store data files of new beads only once, in a blob store shared by the beads.
+        '''
+        tech.fs.ensure_directory(self.directory / layouts.Box.BLOBS)
+
+    def store(self, workspace, freeze_time, delta=False):
+        '''
+        Save workspace as a new bead.
+
+        With delta=True files unchanged since the latest bead with the same name
+        are copied from that bead, instead of compressing them again
+        (they are verified before copying). If that bead is damaged, a warning
+        is issued, and all files are compressed.
+        '''
         # -> Bead
         zipfilename = (
             self.directory / f'{workspace.name}_{freeze_time}.zip')
-        workspace.pack(zipfilename, freeze_time=freeze_time, comment=ARCHIVE_COMMENT)
+        previous = self.latest_bead(workspace.name) if delta else None
+        workspace.pack(
+            zipfilename, freeze_time=freeze_time, comment=ARCHIVE_COMMENT,
+            blob_store=self.blob_store, previous=previous)
         return zipfilename
 
+    def latest_bead(self, name):
+        '''
+        Return the bead with name having the latest freeze time, or None.
+        '''
+        beads = self._beads([(bead_spec.BEAD_NAME, name)])
+        return max(beads, key=lambda bead: bead.freeze_time, default=None)
+
     def find_names(self, kind, content_id, timestamp):
         '''
         -> (exact_match, best_guess, best_guess_freeze_time, names)
@@ -222,6 +273,35 @@ class Box:
         conditions = [(check_type, check_param)]
         return make_context(time, self._beads(conditions))
 
+    def get_contexts(
+            self, queries: Iterable[ContextQuery]) -> Dict[ContextQuery, 'BeadContext']:
+        '''
+        Resolve (bead name, time) queries with a single scan of the box.
+
+        Returns contexts for queries with matching beads (others are missing).
+        '''
+        queries = set(queries)
+        names = {name for name, _ in queries}
+        try:
+            filenames = os.listdir(self.directory)
+        except FileNotFoundError:
+            filenames = []
+        beads_by_name = defaultdict(list)
+        for filename in filenames:
+            match = _BEAD_FILE_NAME.match(filename)
+            if match and match.group(1) in names:
+                for bead in self._archives_from([self.directory / filename]):
+                    beads_by_name[bead.name].append(bead)
+
+        contexts = {}
+        for query in queries:
+            name, time = query
+            try:
+                contexts[query] = make_context(time, beads_by_name[name])
+            except LookupError:
+                pass
+        return contexts
+
 
 class UnionBox:
     def __init__(self, boxes: Sequence[Box]):
@@ -245,6 +325,20 @@ class UnionBox:
         context = self.get_context(check_type, check_param, time)
         return context.best
 
+    def get_contexts(
+            self, queries: Iterable[ContextQuery]) -> Dict[ContextQuery, 'BeadContext']:
+        '''
+        Resolve (bead name, time) queries with a single scan of each box.
+
+        Returns contexts for queries with matching beads (others are missing).
+        '''
+        queries = set(queries)
+        contexts: Dict[ContextQuery, BeadContext] = {}
+        for box in self.boxes:
+            for query, box_context in box.get_contexts(queries).items():
+                contexts[query] = merge_contexts(box_context, contexts.get(query))
+        return contexts
+
     def all_beads(self) -> Iterator[Archive]:
         '''
         Iterator for all beads in this Box
@@ -1,2 +1,30 @@
 class InvalidArchive(Exception):
     """Not a valid bead archive"""
+
+
+class InvalidEnvironment(ValueError):
+    """An environment variable configuring bead has an invalid value"""
+
+    def __init__(self, variable, value, accepted):
+        super().__init__(variable, value, accepted)
+        self.variable = variable
+        self.value = value
+        self.accepted = accepted
+
+    def __str__(self):
+        return f'Invalid {self.variable} value {self.value!r}, expected {self.accepted}'
+
+
+class MissingBlobStore(InvalidArchive):
+    """Data files of an archive from a content addressed box are not found"""
+
+    def __init__(self, archive_filename, blob_store_directory):
+        super().__init__(archive_filename, blob_store_directory)
+        self.archive_filename = archive_filename
+        self.blob_store_directory = blob_store_directory
+
+    def __str__(self):
+        return (
+            f'{self.archive_filename} stores its data files in {self.blob_store_directory},'
+            ' which does not exist - archives of content addressed boxes can be used'
+            ' only in their box, use `bead box export` to get a standalone archive')
@@ -18,6 +18,15 @@ class Archive:
 
     # volatile content, not included in generation of content_id
     INPUT_MAP = META / 'input.map'
+    # data files stored in the blob store of the box (path -> size),
+    # not included in generation of content_id
+    BLOBS = META / 'blobs'
+
+
+class Box:
+
+    # content addressed store of data files, its presence enables storing new beads there
+    BLOBS = Path('.blobs')
 
 
 class Workspace:
@@ -29,3 +38,9 @@ class Workspace:
 
     BEAD_META = META / 'bead'
     INPUT_MAP = META / 'input.map'
+
+    # content hashes of files from the previous save
+    HASH_CACHE = META / 'hashes'
+
+    # removed input data waiting for deletion in the background
+    TRASH = META / 'trash'
@@ -0,0 +1,100 @@
+'''
+Sharing files of loaded inputs by hard links
+'''
+
+import os
+import stat
+import tempfile
+import threading
+
+from .tech import persistence
+
+
+class LinkIndex:
+    """
+    I remember where files of beads were extracted (read only), so that another
+    extraction of the same file can be a hard link to an existing copy.
+
+    Copies are identified by the bead's content_id and the file's path in the archive
+    - the content_id determines the manifest, thus the content hash of the file.
+
+    A copy is used only while it is read only and its size, modification time and
+    inode are unchanged since its extraction.
+    Linking can fail (e.g. the copy is on another file system), then the file
+    is to be extracted as usual.
+
+    WARNING: linked copies are the same file - modifying one (after making it writable)
+    modifies all of them, so sharing is to be enabled only by explicit user choice.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        # content_id -> zip_path -> [[path, size, mtime_ns, inode], ...]
+        self._copies = {}
+
+    def _filename(self, content_id):
+        return os.path.join(self.directory, f'{content_id}.json')
+
+    def _copies_of(self, content_id):
+        if content_id not in self._copies:
+            try:
+                self._copies[content_id] = persistence.file_load(self._filename(content_id))
+            except (OSError, persistence.ReadError):
+                self._copies[content_id] = {}
+        return self._copies[content_id]
+
+    def link(self, content_id, zip_path, fs_path):
+        '''
+        Make fs_path a hard link to a known copy of zip_path from bead content_id.
+
+        Return True if fs_path was created.
+        '''
+        with self._lock:
+            copies = list(self._copies_of(content_id).get(zip_path, ()))
+        for copy in copies:
+            if _is_unchanged(copy):
+                try:
+                    os.link(copy[0], fs_path)
+                    return True
+                except OSError:
+                    pass
+        return False
+
+    def remember(self, content_id, zip_path, fs_path):
+        '''
+        Record fs_path as a (read only) copy of zip_path from bead content_id.
+        '''
+        fs_path = os.path.abspath(fs_path)
+        stat_result = os.stat(fs_path)
+        copy = [fs_path, stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino]
+        with self._lock:
+            copies = self._copies_of(content_id).setdefault(zip_path, [])
+            copies[:] = [c for c in copies if c[0] != fs_path and _is_unchanged(c)]
+            copies.append(copy)
+
+    def save(self, content_id):
+        with self._lock:
+            copies = self._copies_of(content_id)
+            # atomic update: concurrent bead processes either see the old or the new content
+            os.makedirs(self.directory, exist_ok=True)
+            fd, temp_filename = tempfile.mkstemp(dir=self.directory, prefix='.extracted-')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    persistence.dump(copies, f)
+                os.replace(temp_filename, self._filename(content_id))
+            except BaseException:
+                os.remove(temp_filename)
+                raise
+
+
+def _is_unchanged(copy):
+    path, size, mtime_ns, inode = copy
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return False
+    return (
+        not stat_result.st_mode & (stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+        and [stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino]
+        == [size, mtime_ns, inode])
@@ -11,6 +11,8 @@ with the following minimum structure:
             kind: ...,
             content_id: ...,
             freeze_time: ...,
+            include: [...],  # optional, only workspaces
+            exclude: [...],  # optional, only workspaces
         },
         'nick2' : {
             kind: ...,
@@ -25,6 +27,7 @@ with the following minimum structure:
 }
 '''
 
+from .tech import securehash
 from .tech.timestamp import time_from_timestamp
 import attr
 
@@ -35,11 +38,21 @@ import attr
 # want existing BEADs to remain connected and alive.
 
 META_VERSION = 'meta_version'
+
+# meta version -> hash algorithm of files and content_id (see tech.securehash)
+HASH_ALGORITHMS = {
+    'aaa947a6-1f7a-11e6-ba3a-0021cc73492e': securehash.SHA512,
+    '31c6f938-cb99-11f1-95a0-02fc00000001': securehash.TREE,
+}
+
 KIND = 'kind'
 INPUTS = 'inputs'
 INPUT_KIND         = 'kind'
 INPUT_CONTENT_ID   = 'content_id'
 INPUT_FREEZE_TIME  = 'freeze_time'
+# workspace only: glob patterns of data files (not) to load
+INPUT_INCLUDE      = 'include'
+INPUT_EXCLUDE      = 'exclude'
 
 
 class ValidatingStr(str):
@@ -0,0 +1,149 @@
+'''
+I am choosing the zip compression method for files.
+
+Compressing already compressed files (images, archives, columnar data files)
+costs a lot of CPU time for no gain in size, so by default (adaptive policy)
+- files with well known compressed formats are stored
+- other files are deflated, unless compressing a sample of their start
+  does not make it noticeably smaller
+
+Configuration is by environment variables:
+
+BEAD_ZIP_COMPRESSION
+    adaptive (default), deflated, stored (or off)
+BEAD_ZIP_COMPRESSION_LEVEL
+    compression level for deflated and bz2 files (0-9, bz2 uses 1 for 0)
+BEAD_ZIP_COMPRESSION_RULES
+    comma separated list of pattern:method pairs, e.g. `*.csv:lzma,raw/*:stored`.
+    The method of the first matching pattern is used, method is one of
+    stored, deflated, bz2, lzma.
+    NOTE: bz2 and lzma are not universally supported by zip tools!
+'''
+
+from fnmatch import fnmatch
+import os
+import zipfile
+import zlib
+
+from ..exceptions import InvalidEnvironment
+
+
+METHODS = {
+    'off': zipfile.ZIP_STORED,
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED,
+    'bz2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA,
+}
+
+ADAPTIVE = 'adaptive'
+
+LEVELS = range(10)
+
+COMPRESSED_EXTENSIONS = frozenset('''
+    .7z .avif .br .bz2 .docx .flac .gif .gz .h5 .hdf5 .heic .jar .jpeg .jpg .lz4 .lzma
+    .mkv .mov .mp3 .mp4 .npz .odt .ogg .orc .parquet .pdf .png .pptx .rar .rds .tgz
+    .webm .webp .whl .xlsx .xz .zip .zst
+'''.split())
+
+# files are compressed, if sampled compression saves at least this much
+SAMPLE_SIZE = 64 * 1024
+MIN_SAMPLE_SAVING = 0.1
+
+
+class CompressionPolicy:
+
+    def __init__(self, adaptive=True, method=zipfile.ZIP_DEFLATED, level=None, rules=()):
+        self.adaptive = adaptive
+        self.method = method
+        self.level = level
+        # sequence of (pattern, method)
+        self.rules = tuple(rules)
+
+    @classmethod
+    def from_environment(cls, environ=os.environ):
+        '''
+        Policy configured by BEAD_ZIP_COMPRESSION* variables, raises InvalidEnvironment.
+        '''
+        method_name = environ.get('BEAD_ZIP_COMPRESSION', ADAPTIVE)
+        if method_name != ADAPTIVE and method_name not in METHODS:
+            raise InvalidEnvironment(
+                'BEAD_ZIP_COMPRESSION', method_name,
+                'one of ' + ', '.join([ADAPTIVE, *METHODS]))
+        level = parse_level(environ.get('BEAD_ZIP_COMPRESSION_LEVEL', ''))
+        rules_spec = environ.get('BEAD_ZIP_COMPRESSION_RULES', '')
+        try:
+            rules = parse_rules(rules_spec)
+        except ValueError:
+            raise InvalidEnvironment(
+                'BEAD_ZIP_COMPRESSION_RULES', rules_spec,
+                'comma separated pattern:method pairs, method is one of ' + ', '.join(METHODS))
+        return cls(
+            adaptive=method_name == ADAPTIVE,
+            method=METHODS.get(method_name, zipfile.ZIP_DEFLATED),
+            level=level,
+            rules=rules)
+
+    def compression(self, path, zip_path):
+        '''
+        Return (compress_type, compresslevel) for file at path to be archived as zip_path.
+        '''
+        method = self._method(path, zip_path)
+        if self.level is None:
+            return method, None
+        if method == zipfile.ZIP_DEFLATED:
+            return method, self.level
+        if method == zipfile.ZIP_BZIP2:
+            # bz2 has no level 0
+            return method, max(self.level, 1)
+        return method, None
+
+    def _method(self, path, zip_path):
+        for pattern, method in self.rules:
+            if fnmatch(zip_path, pattern) or fnmatch(os.path.basename(zip_path), pattern):
+                return method
+        if not self.adaptive:
+            return self.method
+        if os.path.splitext(zip_path)[1].lower() in COMPRESSED_EXTENSIONS:
+            return zipfile.ZIP_STORED
+        if not is_compressible(path):
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+
+def is_compressible(path):
+    with open(path, 'rb') as f:
+        sample = f.read(SAMPLE_SIZE)
+    if not sample:
+        return True
+    compressed_size = len(zlib.compress(sample, 1))
+    return compressed_size <= len(sample) * (1 - MIN_SAMPLE_SAVING)
+
+
+def parse_level(level_spec):
+    '''
+    Parse compression level 0-9, the empty string means the default level (None).
+    '''
+    if not level_spec:
+        return None
+    if level_spec.strip().isdigit() and int(level_spec) in LEVELS:
+        return int(level_spec)
+    raise InvalidEnvironment(
+        'BEAD_ZIP_COMPRESSION_LEVEL', level_spec,
+        f'an integer between {LEVELS[0]} and {LEVELS[-1]}')
+
+
+def parse_rules(rules_spec):
+    '''
+    Parse `pattern:method,...` into a list of (pattern, method).
+    '''
+    rules = []
+    for rule in rules_spec.split(','):
+        rule = rule.strip()
+        if not rule:
+            continue
+        pattern, _, method_name = rule.rpartition(':')
+        if not pattern or method_name not in METHODS:
+            raise ValueError(f'Invalid compression rule: {rule!r}')
+        rules.append((pattern, METHODS[method_name]))
+    return rules
@@ -4,6 +4,21 @@ import stat
 import contextlib
 import shutil
 import tempfile
+import threading
+import time
+import uuid
+
+
+# removing files is mostly waiting for the file system, a few threads help
+DELETION_THREADS = min(8, os.cpu_count() or 1)
+
+# trees in trash directories older than this (in seconds) are considered to be left
+# behind by interrupted processes, younger ones might be being removed by other processes
+LEFTOVER_TRASH_AGE = 60 * 60
+
+# trees in trash directories, that are being removed by threads of this process
+_trees_in_removal = set()
+_trees_in_removal_lock = threading.Lock()
 
 
 class Path(str):
@@ -76,8 +91,214 @@ def all_subpaths(dir, followlinks=False):
             yield root / file
 
 
-def rmtree(root, *args, **kwargs):
-    for path in all_subpaths(root, followlinks=False):
-        if not os.path.islink(path):
-            make_writable(path)
-    shutil.rmtree(root, *args, **kwargs)
+def rmtree(root, ignore_errors=False, onerror=None, *, onexc=None, jobs=1):
+    '''
+    Remove directory tree root, even if it has read only files and directories.
+
+    The tree is traversed only once, and permissions are changed only where
+    they block the deletion (read only directories, and read only files on Windows).
+    With jobs > 1 the subdirectories of root are removed in parallel.
+    If root is a symbolic link, only the link is removed, never the tree it points to.
+
+    Errors are handled as by shutil.rmtree: they are ignored with ignore_errors=True,
+    or passed to onexc(function, path, exception) or onerror(function, path, exc_info),
+    and the removal continues with the rest of the tree. Otherwise they are raised.
+    '''
+    handle_error = _error_handler(ignore_errors, onerror, onexc)
+    try:
+        is_link = os.path.islink(root)
+    except OSError as e:
+        handle_error(os.path.islink, root, e)
+        return
+    if is_link:
+        try:
+            os.unlink(root)
+        except OSError as e:
+            handle_error(os.unlink, root, e)
+    elif jobs > 1:
+        _remove_tree_in_parallel(root, handle_error, jobs)
+    else:
+        _remove_tree(root, handle_error)
+
+
+def _error_handler(ignore_errors, onerror, onexc):
+    if ignore_errors:
+        def handle_error(function, path, exception):
+            pass
+    elif onexc is not None:
+        handle_error = onexc
+    elif onerror is not None:
+        def handle_error(function, path, exception):
+            onerror(function, path, (type(exception), exception, exception.__traceback__))
+    else:
+        def handle_error(function, path, exception):
+            raise exception
+    return handle_error
+
+
+def _remove_tree(path, handle_error, stat_result=None):
+    _remove_entries(path, handle_error, stat_result, _remove_tree)
+
+
+def _remove_tree_in_parallel(path, handle_error, jobs):
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = []
+
+        def submit_remove_tree(path, handle_error, stat_result):
+            futures.append(executor.submit(_remove_tree, path, handle_error, stat_result))
+
+        def wait_for_subtrees():
+            for future in futures:
+                future.result()
+
+        _remove_entries(path, handle_error, None, submit_remove_tree, wait_for_subtrees)
+
+
+def _remove_entries(path, handle_error, stat_result, remove_tree, wait_for_subtrees=None):
+    '''
+    Remove path: its files directly, its subdirectories with remove_tree.
+    '''
+    try:
+        _prepare_to_remove_entries(path, stat_result)
+    except OSError as e:
+        handle_error(os.chmod, path, e)
+    for entry_path, subtree_stat in _scan(path, handle_error):
+        if subtree_stat is not None:
+            remove_tree(entry_path, handle_error, subtree_stat)
+        else:
+            try:
+                _remove_file(entry_path)
+            except OSError as e:
+                handle_error(os.unlink, entry_path, e)
+    if wait_for_subtrees is not None:
+        wait_for_subtrees()
+    try:
+        os.rmdir(path)
+    except OSError as e:
+        handle_error(os.rmdir, path, e)
+
+
+def _scan(directory, handle_error):
+    '''
+    List (path, stat result for directories or None for other entries) of directory.
+    '''
+    try:
+        with os.scandir(directory) as entries:
+            entries = list(entries)
+    except OSError as e:
+        handle_error(os.scandir, directory, e)
+        return []
+    result = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            result.append((entry.path, entry.stat(follow_symlinks=False) if is_dir else None))
+        except OSError:
+            # removal of the entry reports the problem
+            result.append((entry.path, None))
+    return result
+
+
+def _prepare_to_remove_entries(directory, stat_result=None):
+    # entries of a directory can be removed only if the directory is writable
+    if stat_result is None:
+        stat_result = os.lstat(directory)
+    if not stat_result.st_mode & stat.S_IWRITE:
+        os.chmod(directory, stat_result.st_mode | stat.S_IWRITE)
+
+
+def _remove_file(path):
+    try:
+        os.unlink(path)
+    except PermissionError:
+        # read only files can not be removed on Windows
+        if os.name == 'posix':
+            raise
+        make_writable(path)
+        os.unlink(path)
+
+
+def rmtree_in_background(path, trash_dir):
+    '''
+    Move path into trash_dir and remove it in a background thread.
+
+    path is gone by the time this function returns, the returned (daemon) thread
+    is to be joined if the removal must be completed.
+    The thread also removes trees left behind in trash_dir by interrupted processes
+    (trees moved there more than LEFTOVER_TRASH_AGE seconds ago).
+    A symbolic link path is simply removed, the tree it points to is kept.
+    trash_dir should be on the same file system as path.
+    '''
+    ensure_directory(trash_dir)
+    if os.path.islink(path):
+        os.unlink(path)
+        tree = None
+    else:
+        # moving a directory to another directory updates its `..` entry
+        make_writable(path)
+        # the name records when the tree was moved to the trash
+        tree = os.path.join(trash_dir, f'{int(time.time())}-{uuid.uuid4().hex}')
+        with _trees_in_removal_lock:
+            _trees_in_removal.add(tree)
+        try:
+            os.rename(path, tree)
+        except OSError:
+            _forget_tree_in_removal(tree)
+            raise
+    thread = threading.Thread(
+        target=_remove_trash, args=(trash_dir, tree), name=f'rmtree {path}', daemon=True)
+    thread.start()
+    return thread
+
+
+def _remove_trash(trash_dir, tree):
+    try:
+        if tree is not None:
+            try:
+                rmtree(tree, onexc=_raise_unless_missing)
+            finally:
+                _forget_tree_in_removal(tree)
+    finally:
+        _remove_leftover_trash(trash_dir)
+
+
+def _remove_leftover_trash(trash_dir):
+    try:
+        names = os.listdir(trash_dir)
+    except OSError:
+        return
+    moved_before = time.time() - LEFTOVER_TRASH_AGE
+    with _trees_in_removal_lock:
+        leftovers = {
+            os.path.join(trash_dir, name)
+            for name in names
+            if _trash_time(name) < moved_before
+        } - _trees_in_removal
+        _trees_in_removal.update(leftovers)
+    for leftover in leftovers:
+        try:
+            # another process might be removing the same tree
+            rmtree(leftover, ignore_errors=True)
+        finally:
+            _forget_tree_in_removal(leftover)
+
+
+def _trash_time(name):
+    '''
+    Time when the tree with name was moved into the trash - 0 if not known.
+    '''
+    try:
+        return int(name.split('-', 1)[0])
+    except ValueError:
+        return 0
+
+
+def _raise_unless_missing(function, path, exception):
+    if not isinstance(exception, FileNotFoundError):
+        raise exception
+
+
+def _forget_tree_in_removal(tree):
+    with _trees_in_removal_lock:
+        _trees_in_removal.discard(tree)
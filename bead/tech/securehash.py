@@ -2,9 +2,30 @@
 I am providing the content hash functions.
 '''
 
+from collections import deque
 import hashlib
+import mmap
+import os
+import threading
 
+# size of blocks read into a reused buffer, can be tuned (see tests/benchmark_securehash.py)
 READ_BLOCK_SIZE = 1024 ** 2
+# regular files at least this big are hashed through a memory map, without reading them
+MMAP_MIN_SIZE = 1024 ** 2
+
+# hash algorithms - the meta version of a bead determines which one is used
+SHA512 = 'sha512'
+TREE = 'tree'
+ALGORITHMS = (SHA512, TREE)
+
+# tree hashes are sha512 hashes of the sha512 hashes of fixed size chunks,
+# the chunks are hashed in parallel
+TREE_CHUNK_SIZE = 8 * 1024 ** 2
+TREE_HASH_THREADS = os.cpu_count() or 1
+# chunks read, but not yet hashed - limited over all files hashed in parallel,
+# so that memory use does not grow with the number of files
+TREE_MAX_CHUNKS_IN_MEMORY = 2 * TREE_HASH_THREADS + 1
+_tree_chunk_slots = threading.BoundedSemaphore(TREE_MAX_CHUNKS_IN_MEMORY)
 
 # hashes are created from {length of content}:content;
 # similarity to http://cr.yp.to/proto/netstrings.txt are not accidental:
@@ -19,26 +40,23 @@ def _add_suffix(hash, size):
     hash.update(f';{size}'.encode('ascii'))
 
 
-def file(file, file_size):
+def file(file, file_size, block_size=None):
     '''
     Read file and return sha512 hash for its content.
 
     Closes the file.
-    Can process BIG files.
+    Can process BIG files: regular files are memory mapped, other file objects
+    are read in blocks of block_size (default: READ_BLOCK_SIZE) into a reused buffer.
     '''
 
     hash = hashlib.sha512()
     _add_prefix(hash, file_size)
 
-    bytes_read = 0
-
     with file:
-        while True:
-            block = file.read(READ_BLOCK_SIZE)
-            if not block:
-                break
-            bytes_read += len(block)
-            hash.update(block)
+        bytes_read = _update_from_mmap(hash, file, file_size)
+        if bytes_read is None:
+            bytes_read = _update_from_reads(
+                hash, file, min(block_size or READ_BLOCK_SIZE, max(file_size, 1)))
 
     assert bytes_read == file_size
 
@@ -46,6 +64,51 @@ def file(file, file_size):
     return str(hash.hexdigest())
 
 
+def _update_from_mmap(hash, file, file_size):
+    '''
+    Hash the whole content of a regular file through a memory map.
+
+    Return the number of bytes hashed, or None if the file can not be mapped.
+
+    WARNING: accessing a mapped page beyond the end of a file truncated by another
+    process meanwhile kills the process (SIGBUS). Files with a size different
+    from file_size are not mapped, but a truncation during hashing is not detected.
+    '''
+    if file_size < MMAP_MIN_SIZE:
+        return None
+    try:
+        fileno = file.fileno()
+        if file.tell() != 0:
+            return None
+        with mmap.mmap(fileno, file_size, access=mmap.ACCESS_READ) as mapped:
+            if os.fstat(fileno).st_size != file_size:
+                # changed since file_size was determined - read it, failing safely
+                return None
+            hash.update(mapped)
+            return len(mapped)
+    except (AttributeError, OSError, ValueError):
+        # not a regular file (e.g. zip member, pipe) or mmap is not supported
+        return None
+
+
+def _update_from_reads(hash, file, block_size):
+    buffer = memoryview(bytearray(block_size))
+    readinto = getattr(file, 'readinto', None)
+    bytes_read = 0
+    while True:
+        if readinto is None:
+            block = file.read(block_size)
+            size = len(block)
+        else:
+            size = readinto(buffer)
+            block = buffer[:size]
+        if not size:
+            break
+        bytes_read += size
+        hash.update(block)
+    return bytes_read
+
+
 def bytes(bytes):
     '''
     Return sha512 hash for bytes.
@@ -55,3 +118,127 @@ def bytes(bytes):
     hash.update(bytes)
     _add_suffix(hash, len(bytes))
     return str(hash.hexdigest())
+
+
+def hash_file(algorithm, f, file_size):
+    '''
+    Read file f and return its hash with algorithm.
+
+    Closes the file.
+    '''
+    if algorithm == TREE:
+        return tree_file(f, file_size)
+    assert algorithm == SHA512, algorithm
+    return file(f, file_size)
+
+
+def hash_bytes(algorithm, content):
+    '''
+    Return hash of content with algorithm.
+    '''
+    if algorithm == TREE:
+        return tree_bytes(content)
+    assert algorithm == SHA512, algorithm
+    return bytes(content)
+
+
+def tree_file(file, file_size):
+    '''
+    Read file and return the tree hash of its content.
+
+    Closes the file.
+    Chunks are hashed in parallel, while the next ones are being read.
+    '''
+    chunk_hashes = []
+    bytes_read = 0
+    with file:
+        if file_size <= TREE_CHUNK_SIZE:
+            # no benefit from threads
+            chunk = _read_chunk(file)
+            bytes_read = len(chunk)
+            if chunk:
+                chunk_hashes.append(_chunk_hash(chunk))
+        else:
+            executor = _executor()
+            pending = deque()
+            while True:
+                # the slot is released, when the chunk is hashed
+                _tree_chunk_slots.acquire()
+                try:
+                    chunk = _read_chunk(file)
+                    if chunk:
+                        pending.append(executor.submit(_chunk_hash_releasing_slot, chunk))
+                except BaseException:
+                    _tree_chunk_slots.release()
+                    raise
+                if not chunk:
+                    _tree_chunk_slots.release()
+                    break
+                bytes_read += len(chunk)
+                del chunk
+                while pending and pending[0].done():
+                    chunk_hashes.append(pending.popleft().result())
+            chunk_hashes.extend(future.result() for future in pending)
+
+    assert bytes_read == file_size
+    return _tree_hash(chunk_hashes, file_size)
+
+
+def tree_bytes(bytes):
+    '''
+    Return tree hash for bytes.
+    '''
+    chunk_hashes = [
+        _chunk_hash(bytes[start:start + TREE_CHUNK_SIZE])
+        for start in range(0, len(bytes), TREE_CHUNK_SIZE)]
+    return _tree_hash(chunk_hashes, len(bytes))
+
+
+def _read_chunk(file):
+    # some file objects return less than requested even before the end of file
+    blocks = []
+    remaining = TREE_CHUNK_SIZE
+    while remaining:
+        block = file.read(remaining)
+        if not block:
+            break
+        blocks.append(block)
+        remaining -= len(block)
+    return b''.join(blocks)
+
+
+def _chunk_hash(chunk):
+    return hashlib.sha512(chunk).digest()
+
+
+def _chunk_hash_releasing_slot(chunk):
+    try:
+        return _chunk_hash(chunk)
+    finally:
+        _tree_chunk_slots.release()
+
+
+def _tree_hash(chunk_hashes, size):
+    hash = hashlib.sha512()
+    hash.update(f'tree:{TREE_CHUNK_SIZE}:'.encode('ascii'))
+    _add_prefix(hash, size)
+    for chunk_hash in chunk_hashes:
+        hash.update(chunk_hash)
+    _add_suffix(hash, size)
+    return str(hash.hexdigest())
+
+
+_executor_instance = None
+_executor_lock = threading.Lock()
+
+
+def _executor():
+    # shared by all hashing threads: hashing happens in TREE_HASH_THREADS threads,
+    # even if multiple files are hashed in parallel
+    global _executor_instance
+    with _executor_lock:
+        if _executor_instance is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _executor_instance = ThreadPoolExecutor(
+                max_workers=TREE_HASH_THREADS, thread_name_prefix='tree-hash')
+        return _executor_instance
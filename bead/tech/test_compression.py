@@ -0,0 +1,87 @@
+import os
+import zipfile
+
+from ..exceptions import InvalidEnvironment
+from ..test import TestCase
+from .. import tech
+from . import compression as m
+
+write_file = tech.fs.write_file
+
+
+class Test_CompressionPolicy(TestCase):
+
+    # fixtures
+    def dir(self):
+        return self.new_temp_dir()
+
+    def text_file(self, dir):
+        path = dir / 'text.csv'
+        write_file(path, b'a,b,c\n1,2,3\n' * 10000)
+        return path
+
+    def random_file(self, dir):
+        path = dir / 'random.bin'
+        write_file(path, os.urandom(100000))
+        return path
+
+    def policy(self, **environ):
+        return m.CompressionPolicy.from_environment(environ)
+
+    # tests
+    def test_compressible_file_is_deflated(self, text_file):
+        assert self.policy().compression(text_file, 'data/text.csv') == (
+            zipfile.ZIP_DEFLATED, None)
+
+    def test_incompressible_file_is_stored(self, random_file):
+        method, _ = self.policy().compression(random_file, 'data/random.bin')
+        assert method == zipfile.ZIP_STORED
+
+    def test_known_compressed_format_is_stored(self, text_file):
+        method, _ = self.policy().compression(text_file, 'data/text.PARQUET')
+        assert method == zipfile.ZIP_STORED
+
+    def test_global_method_overrides_adaptive_policy(self, random_file, text_file):
+        deflated = self.policy(BEAD_ZIP_COMPRESSION='deflated')
+        stored = self.policy(BEAD_ZIP_COMPRESSION='stored')
+
+        assert deflated.compression(random_file, 'x.zip')[0] == zipfile.ZIP_DEFLATED
+        assert stored.compression(text_file, 'text.csv')[0] == zipfile.ZIP_STORED
+
+    def test_level(self, text_file):
+        policy = self.policy(BEAD_ZIP_COMPRESSION_LEVEL='9')
+        assert policy.compression(text_file, 'text.csv') == (zipfile.ZIP_DEFLATED, 9)
+
+    def test_rules(self, text_file, random_file):
+        policy = self.policy(BEAD_ZIP_COMPRESSION_RULES='*.csv:lzma, data/raw/*:bz2')
+
+        assert policy.compression(text_file, 'data/text.csv')[0] == zipfile.ZIP_LZMA
+        assert policy.compression(random_file, 'data/raw/x')[0] == zipfile.ZIP_BZIP2
+        assert policy.compression(random_file, 'data/x')[0] == zipfile.ZIP_STORED
+
+    def test_bz2_has_no_level_0(self, text_file):
+        policy = self.policy(
+            BEAD_ZIP_COMPRESSION_LEVEL='0', BEAD_ZIP_COMPRESSION_RULES='*.csv:bz2')
+        assert policy.compression(text_file, 'text.csv') == (zipfile.ZIP_BZIP2, 1)
+
+    def test_invalid_method(self):
+        with self.assertRaises(InvalidEnvironment) as cm:
+            self.policy(BEAD_ZIP_COMPRESSION='zstd')
+        assert 'BEAD_ZIP_COMPRESSION' in str(cm.exception)
+        assert 'adaptive, off, stored, deflated' in str(cm.exception)
+
+    def test_invalid_level(self):
+        for level in ('fast', '10', '-1'):
+            with self.assertRaises(InvalidEnvironment) as cm:
+                self.policy(BEAD_ZIP_COMPRESSION_LEVEL=level)
+            assert 'BEAD_ZIP_COMPRESSION_LEVEL' in str(cm.exception)
+            assert 'between 0 and 9' in str(cm.exception)
+
+    def test_invalid_rules_in_environment(self):
+        with self.assertRaises(InvalidEnvironment) as cm:
+            self.policy(BEAD_ZIP_COMPRESSION_RULES='*.csv:zstd')
+        assert 'BEAD_ZIP_COMPRESSION_RULES' in str(cm.exception)
+
+    def test_invalid_rule(self):
+        self.assertRaises(ValueError, m.parse_rules, '*.csv:zstd')
+        self.assertRaises(ValueError, m.parse_rules, 'lzma')
@@ -3,6 +3,8 @@ from ..test import TestCase, skipIf
 from . import fs as m
 
 import os
+import time
+from unittest import mock
 
 
 class TestPath(TestCase):
@@ -119,6 +121,160 @@ class Test_all_subpaths(TestCase):
         assert all_paths == self.__paths
 
 
+class Test_rmtree(TestCase):
+
+    # fixtures
+    def tree(self):
+        root = self.new_temp_dir() / 'tree'
+        for dir in ('a', 'b/c', 'b/d'):
+            os.makedirs(root / dir)
+        for file in ('f', 'a/f', 'b/c/f1', 'b/c/f2', 'b/d/f'):
+            m.write_file(root / file, file)
+        os.symlink('b', root / 'link')
+        return root
+
+    def read_only_tree(self, tree):
+        for path in m.all_subpaths(tree):
+            if not os.path.islink(path):
+                m.make_readonly(path)
+        return tree
+
+    # tests
+    def test_removes_read_only_tree(self, read_only_tree):
+        m.rmtree(read_only_tree)
+        assert not os.path.exists(read_only_tree)
+
+    def test_parallel(self, read_only_tree):
+        m.rmtree(read_only_tree, jobs=4)
+        assert not os.path.exists(read_only_tree)
+
+    def test_symlink_target_is_kept(self):
+        root = self.new_temp_dir()
+        os.makedirs(root / 'target')
+        m.write_file(root / 'target/file', 'content')
+        os.makedirs(root / 'tree')
+        os.symlink(root / 'target', root / 'tree/link')
+
+        m.rmtree(root / 'tree')
+
+        assert m.read_file(root / 'target/file') == 'content'
+
+    def test_symlink_root_is_removed_but_not_followed(self, tree):
+        link = self.new_temp_dir() / 'link'
+        os.symlink(tree, link)
+
+        m.rmtree(link)
+
+        assert not os.path.lexists(link)
+        assert m.read_file(tree / 'b/c/f1') == 'b/c/f1'
+
+    def test_symlink_root_in_background(self, tree):
+        link = self.new_temp_dir() / 'link'
+        os.symlink(tree, link)
+
+        m.rmtree_in_background(link, self.new_temp_dir() / 'trash').join()
+
+        assert not os.path.lexists(link)
+        assert m.read_file(tree / 'b/c/f1') == 'b/c/f1'
+
+    def test_leftover_trash_is_removed(self, read_only_tree):
+        trash = self.new_temp_dir() / 'trash'
+        os.makedirs(trash)
+        m.make_writable(read_only_tree)
+        os.rename(read_only_tree, trash / 'leftover')
+
+        m.rmtree_in_background(self.new_temp_dir(), trash).join()
+
+        assert os.listdir(trash) == []
+
+    def test_tree_in_removal_is_not_removed_as_leftover(self, tree):
+        trash = self.new_temp_dir() / 'trash'
+        os.makedirs(trash)
+        os.rename(tree, trash / 'in-removal')
+        m._trees_in_removal.add(trash / 'in-removal')
+        self.addCleanup(m._trees_in_removal.discard, trash / 'in-removal')
+
+        m.rmtree_in_background(self.new_temp_dir(), trash).join()
+
+        assert os.listdir(trash) == ['in-removal']
+
+    def test_concurrent_removals(self):
+        trash = self.new_temp_dir() / 'trash'
+        threads = []
+        for _ in range(10):
+            tree = self.new_temp_dir()
+            for i in range(10):
+                m.write_file(tree / f'{i}', f'{i}')
+            threads.append(m.rmtree_in_background(tree, trash))
+
+        for thread in threads:
+            thread.join()
+        assert os.listdir(trash) == []
+
+    def test_recent_trash_of_other_processes_is_kept(self, tree):
+        trash = self.new_temp_dir() / 'trash'
+        os.makedirs(trash)
+        recent = f'{int(time.time())}-other-process'
+        os.rename(tree, trash / recent)
+
+        m.rmtree_in_background(self.new_temp_dir(), trash).join()
+
+        assert os.listdir(trash) == [recent]
+
+    def failing_remove_file(self, failing_path):
+        remove_file = m._remove_file
+
+        def _remove_file(path):
+            if path == failing_path:
+                raise PermissionError(path)
+            remove_file(path)
+        return mock.patch.object(m, '_remove_file', _remove_file)
+
+    def remaining_files(self, tree):
+        return {
+            os.path.relpath(path, tree)
+            for path in m.all_subpaths(tree)
+            if not os.path.isdir(path)}
+
+    def test_ignore_errors_continues_removal(self, tree):
+        with self.failing_remove_file(tree / 'a/f'):
+            m.rmtree(tree, ignore_errors=True)
+
+        assert self.remaining_files(tree) == {'a/f'}
+
+    def test_onexc_is_called_for_errors(self, tree):
+        errors = []
+        with self.failing_remove_file(tree / 'a/f'):
+            m.rmtree(tree, onexc=lambda *error: errors.append(error), jobs=4)
+
+        assert self.remaining_files(tree) == {'a/f'}
+        assert [(function, path) for function, path, _ in errors] == [
+            (os.unlink, tree / 'a/f'), (os.rmdir, tree / 'a'), (os.rmdir, tree)]
+        assert isinstance(errors[0][2], PermissionError)
+
+    def test_onerror_gets_exc_info(self, tree):
+        errors = []
+        with self.failing_remove_file(tree / 'a/f'):
+            m.rmtree(tree, False, lambda *error: errors.append(error))
+
+        function, path, (exc_type, exc, _traceback) = errors[0]
+        assert (function, path, exc_type) == (os.unlink, tree / 'a/f', PermissionError)
+
+    def test_missing_directory(self):
+        missing = self.new_temp_dir() / 'missing'
+        self.assertRaises(FileNotFoundError, m.rmtree, missing)
+        m.rmtree(missing, ignore_errors=True)
+
+    def test_in_background(self, read_only_tree):
+        trash = self.new_temp_dir() / 'trash'
+
+        thread = m.rmtree_in_background(read_only_tree, trash)
+
+        assert not os.path.exists(read_only_tree)
+        thread.join()
+        assert os.listdir(trash) == []
+
+
 class Test_read_write_file(TestCase):
 
     def test(self):
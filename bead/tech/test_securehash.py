@@ -1,4 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
 import os
+import threading
+import time
+from unittest import mock
 
 from ..test import TestCase
 from .. import tech
@@ -65,3 +70,129 @@ class Test(TestCase):
 
     def then_the_hashes_are_the_same(self):
         assert self.__hashresult[0] == self.__hashresult[1]
+
+
+class Test_tree_hash(TestCase):
+
+    # fixtures
+    def content(self):
+        return os.urandom(10 * 1024 + 17)
+
+    def file(self, content):
+        path = self.new_temp_dir() / 'file'
+        write_file(path, content)
+        return path
+
+    def hash_file(self, path, algorithm=securehash.TREE):
+        return securehash.hash_file(algorithm, open(path, 'rb'), os.path.getsize(path))
+
+    # tests
+    def test_file_and_bytes_are_compatible(self, file, content):
+        assert self.hash_file(file) == securehash.tree_bytes(content)
+
+    def test_parallel_hashing_of_many_chunks(self, file, content):
+        with mock.patch.object(securehash, 'TREE_CHUNK_SIZE', 1024):
+            chunked_hash = self.hash_file(file)
+            assert chunked_hash == securehash.tree_bytes(content)
+        assert chunked_hash != self.hash_file(file)
+
+    def test_chunks_in_memory_are_limited_over_parallel_files(self, file, content):
+        chunks_in_memory = 0
+        max_chunks_in_memory = 0
+        lock = threading.Lock()
+        read_chunk = securehash._read_chunk
+        chunk_hash = securehash._chunk_hash
+
+        def counting_read_chunk(file):
+            nonlocal chunks_in_memory, max_chunks_in_memory
+            chunk = read_chunk(file)
+            if chunk:
+                with lock:
+                    chunks_in_memory += 1
+                    max_chunks_in_memory = max(max_chunks_in_memory, chunks_in_memory)
+            return chunk
+
+        def counting_chunk_hash(chunk):
+            nonlocal chunks_in_memory
+            hash = chunk_hash(chunk)
+            # slow hashing, so that readers would get ahead without the limit
+            time.sleep(0.001)
+            with lock:
+                chunks_in_memory -= 1
+            return hash
+
+        with mock.patch.multiple(
+                securehash,
+                TREE_CHUNK_SIZE=1024,
+                _tree_chunk_slots=threading.BoundedSemaphore(3),
+                _read_chunk=counting_read_chunk,
+                _chunk_hash=counting_chunk_hash):
+            expected_hash = securehash.tree_bytes(content)
+            chunks_in_memory = max_chunks_in_memory = 0
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                hashes = list(executor.map(lambda _: self.hash_file(file), range(4)))
+
+        assert hashes == [expected_hash] * 4
+        assert 0 < max_chunks_in_memory <= 3
+        assert chunks_in_memory == 0
+
+    def test_differs_from_sha512(self, file):
+        assert self.hash_file(file) != self.hash_file(file, securehash.SHA512)
+
+    def test_empty(self):
+        assert securehash.tree_bytes(b'') != securehash.tree_bytes(b'\0')
+
+
+class Test_file(TestCase):
+
+    # fixtures
+    def content(self):
+        return os.urandom(3 * 1024 ** 2 + 17)
+
+    def path(self, content):
+        path = self.new_temp_dir() / 'file'
+        write_file(path, content)
+        return path
+
+    # tests
+    def test_memory_mapped_file(self, path, content):
+        with mock.patch.object(
+                securehash, '_update_from_reads', wraps=securehash._update_from_reads) as reads:
+            hash = securehash.file(open(path, 'rb'), len(content))
+
+        assert reads.call_count == 0
+        assert hash == securehash.bytes(content)
+
+    def test_truncated_file_is_not_memory_mapped(self, path, content):
+        with open(path, 'r+b') as f:
+            f.truncate(len(content) // 2)
+
+        self.assertRaises(AssertionError, securehash.file, open(path, 'rb'), len(content))
+
+    def test_grown_file_is_not_memory_mapped(self, path, content):
+        with open(path, 'ab') as f:
+            f.write(b'more')
+
+        self.assertRaises(AssertionError, securehash.file, open(path, 'rb'), len(content))
+
+    def test_block_size(self, path, content):
+        with mock.patch.object(securehash, 'MMAP_MIN_SIZE', len(content) + 1):
+            hash = securehash.file(open(path, 'rb'), len(content), block_size=1000)
+
+        assert hash == securehash.bytes(content)
+
+    def test_file_object_without_fileno(self, content):
+        assert securehash.file(io.BytesIO(content), len(content)) == securehash.bytes(content)
+
+    def test_file_object_without_readinto(self, content):
+        class File:
+            def __init__(self, content):
+                self.read = io.BytesIO(content).read
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                pass
+
+        assert securehash.file(File(content), len(content)) == securehash.bytes(content)
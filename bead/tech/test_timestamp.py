@@ -5,6 +5,7 @@ import pytest
 
 from .timestamp import FixedOffset, Local, timestamp
 from .timestamp import parse_timedelta, parse_iso8601, time_from_timestamp, time_from_user
+from .timestamp import timestamp_sort_key
 
 
 @pytest.mark.parametrize(
@@ -68,6 +69,51 @@ def test_time_from_timestamp():
         time_from_timestamp('20000101T000000000000')
 
 
+@pytest.mark.parametrize(
+    "text",
+    [
+        '20000101T000000000000',
+        '20000101T000000000000*0000',
+        '20000101x000000000000+0000',
+        '2000010100T0000000000+0000',
+        '20000101T00000000000\u00b2+0000',
+        '20001301T000000000000+0000',
+    ])
+def test_time_from_invalid_timestamp(text):
+    with pytest.raises(ValueError):
+        time_from_timestamp(text)
+    with pytest.raises(ValueError):
+        timestamp_sort_key(text)
+
+
+def test_time_from_timestamp_shares_timezones():
+    time1 = time_from_timestamp('20000102T030405000006+0123')
+    time2 = time_from_timestamp('20100102T030405000006+0123')
+    assert time1.tzinfo is time2.tzinfo
+
+
+@pytest.mark.parametrize(
+    "timestamp1, timestamp2",
+    [
+        ('20000101T000000000000+0000', '20000101T000000000001+0000'),
+        ('20000101T000000000000+0000', '20000101T000000000000-0001'),
+        ('20000101T010000000000+0100', '20000101T000000000001+0000'),
+        ('19991231T235959999999+0000', '20000101T000000000000+0000'),
+        ('20200229T120000000000+0000', '20200301T000000000000+1100'),
+    ])
+def test_timestamp_sort_key_order(timestamp1, timestamp2):
+    assert time_from_timestamp(timestamp1) < time_from_timestamp(timestamp2)
+    assert timestamp_sort_key(timestamp1) < timestamp_sort_key(timestamp2)
+
+
+def test_timestamp_sort_key():
+    assert timestamp_sort_key('19700101T000000000000+0000') == 0
+    assert timestamp_sort_key('19700101T010000000001+0100') == 1
+    time = time_from_timestamp('20191101T010203000004+0500')
+    assert timestamp_sort_key('20191101T010203000004+0500') == (
+        int(time.timestamp()) * 1000000 + time.microsecond)
+
+
 def test_time_from_user():
     assert time_from_user('1234') == datetime(1234, 1, 1, tzinfo=UTC)
     assert time_from_user('21340228') == datetime(2134, 2, 28, tzinfo=UTC)
@@ -1,10 +1,18 @@
 from .test import TestCase
 from . import archive as m
 
+import errno
 import os
+import warnings
 import zipfile
+from unittest import mock
 
 from . import layouts
+from . import tech
+from . import ziparchive
+from . import zipopener
+from .exceptions import InvalidArchive
+from .workspace import Workspace
 
 
 class Test_Archive(TestCase):
@@ -90,3 +98,134 @@ class Test_Archive(TestCase):
     def then_an_empty_directory_is_created(self):
         assert os.path.isdir(self.__extracteddir)
         assert [] == os.listdir(self.__extracteddir)
+
+
+class Test_extract_stored(TestCase):
+
+    # fixtures
+    def content(self):
+        return os.urandom(3 * 1024 * 1024 + 17)
+
+    def archive_path(self, content):
+        path = self.new_temp_dir() / 'bead.zip'
+        with zipfile.ZipFile(path, 'w') as z:
+            z.writestr(
+                layouts.Archive.BEAD_META,
+                b'''
+                    {
+                        "meta_version": "aaa947a6-1f7a-11e6-ba3a-0021cc73492e",
+                        "kind": "TEST-FAKE",
+                        "freeze_time": "20200913T173910000000+0000",
+                        "inputs": {}
+                    }
+                ''')
+            z.writestr('data/deflated', content, compress_type=zipfile.ZIP_DEFLATED)
+            z.writestr('data/stored', content, compress_type=zipfile.ZIP_STORED)
+            z.writestr('data/empty', b'', compress_type=zipfile.ZIP_STORED)
+            z.writestr(layouts.Archive.MANIFEST, b'some manifest')
+        return path
+
+    def extract(self, archive_path, zip_path):
+        extracted_path = self.new_temp_dir() / 'extracted'
+        m.Archive(archive_path).extract_file(zip_path, extracted_path)
+        with open(extracted_path, 'rb') as f:
+            return f.read()
+
+    # tests
+    def test_stored_member_is_copied_by_the_kernel(self, archive_path, content):
+        with mock.patch.object(ziparchive, '_copy_range', wraps=ziparchive._copy_range) as copy:
+            assert self.extract(archive_path, 'data/stored') == content
+            assert self.extract(archive_path, 'data/empty') == b''
+            assert copy.call_count == 2
+
+            assert self.extract(archive_path, 'data/deflated') == content
+            assert copy.call_count == 2
+
+    def test_sendfile_is_used_without_copy_file_range(self, archive_path, content):
+        with mock.patch.object(
+                ziparchive.os, 'copy_file_range', create=True,
+                side_effect=OSError(errno.EXDEV, 'cross-device link')):
+            assert self.extract(archive_path, 'data/stored') == content
+
+    def test_fall_back_to_copying_through_python(self, archive_path, content):
+        with mock.patch.object(ziparchive.os, 'copy_file_range', create=True, side_effect=OSError):
+            with mock.patch.object(ziparchive.os, 'sendfile', create=True, side_effect=OSError):
+                assert self.extract(archive_path, 'data/stored') == content
+
+    def test_read_only_extraction(self, archive_path, content):
+        extracted_dir = self.new_temp_dir() / 'extracted'
+        with mock.patch.object(ziparchive.os, 'copy_file_range', create=True, side_effect=OSError):
+            with mock.patch.object(ziparchive.os, 'sendfile', create=True, side_effect=OSError):
+                m.Archive(archive_path).unpack_data_to(extracted_dir, readonly=True)
+
+        for path in (extracted_dir, extracted_dir / 'stored', extracted_dir / 'deflated'):
+            assert not os.stat(path).st_mode & 0o222
+        with open(extracted_dir / 'stored', 'rb') as f:
+            assert f.read() == content
+
+
+class Test_data_access(TestCase):
+
+    # fixtures
+    def random_content(self):
+        return os.urandom(100000)
+
+    def text_content(self):
+        return b'some text\n' * 10000
+
+    def archive(self, random_content, text_content):
+        workspace = Workspace(self.new_temp_dir() / 'workspace')
+        workspace.create('TEST-KIND')
+        tech.fs.write_file(workspace.directory / 'output/random', random_content)
+        tech.fs.ensure_directory(workspace.directory / 'output/sub')
+        tech.fs.write_file(workspace.directory / 'output/sub/text', text_content)
+        tech.fs.write_file(workspace.directory / 'output/empty', b'')
+        path = self.new_temp_dir() / 'bead.zip'
+        workspace.pack(path, '20200913T173910000000+0000', comment='')
+        return m.Archive(path)
+
+    def read(self, archive, path, offset=0, size=-1):
+        with archive.open_data(path) as f:
+            assert f.seekable()
+            f.seek(offset)
+            return f.read(size)
+
+    # tests
+    def test_data_members(self, archive, random_content, text_content):
+        assert archive.data_members() == {
+            'random': len(random_content),
+            'sub/text': len(text_content),
+            'empty': 0}
+
+    def test_open_data(self, archive, random_content, text_content):
+        assert self.read(archive, 'random') == random_content
+        assert self.read(archive, 'sub/text') == text_content
+        assert self.read(archive, 'empty') == b''
+
+    def test_read_a_range(self, archive, random_content, text_content):
+        assert self.read(archive, 'random', 70000, 100) == random_content[70000:70100]
+        assert self.read(archive, 'random', 99990, 100) == random_content[99990:]
+        assert self.read(archive, 'sub/text', 5005, 20) == text_content[5005:5025]
+
+    def test_seek_from_end(self, archive, random_content):
+        with archive.open_data('random') as f:
+            f.seek(-10, os.SEEK_END)
+            assert f.tell() == len(random_content) - 10
+            assert f.read() == random_content[-10:]
+
+    def test_open_missing_data(self, archive):
+        self.assertRaises(KeyError, archive.open_data, 'missing')
+
+    def test_validate_data_member(self, archive):
+        archive.validate_data_member('random')
+        archive.validate_data_member('sub/text')
+
+    def test_validate_changed_data_member(self, archive, random_content):
+        with zipfile.ZipFile(archive.archive_filename, 'a') as z:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                z.writestr(layouts.Archive.DATA / 'random', b'HACKED')
+        zipopener.close_all()
+
+        self.assertRaises(InvalidArchive, archive.validate_data_member, 'random')
+        self.assertRaises(InvalidArchive, archive.validate_data_member, 'missing')
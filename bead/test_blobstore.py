@@ -0,0 +1,54 @@
+from .test import TestCase
+from .tech.fs import write_file
+from .tech import securehash
+from . import blobstore as m
+
+import os
+
+
+class Test_BlobStore(TestCase):
+
+    # fixtures
+    def store(self):
+        return m.BlobStore(self.new_temp_dir() / 'blobs')
+
+    def path(self):
+        path = self.new_temp_dir() / 'file'
+        write_file(path, b'content')
+        return path
+
+    # tests
+    def test_file_is_stored_under_its_hash(self, store, path):
+        hash = securehash.bytes(b'content')
+
+        assert store.add_file(path, hash) == hash
+        assert store.has_content(hash, len(b'content'))
+        assert os.listdir(store.directory) == [hash[:2]]
+
+    def test_tree_hash(self, store, path):
+        hash = securehash.tree_bytes(b'content')
+
+        assert store.add_file(path, hash, securehash.TREE) == hash
+        assert store.has_content(hash, len(b'content'), securehash.TREE)
+
+    def test_file_changed_since_hashing_is_stored_under_its_new_hash(self, store, path):
+        old_hash = securehash.bytes(b'content')
+        write_file(path, b'changed content')
+
+        hash = store.add_file(path, old_hash)
+
+        assert hash == securehash.bytes(b'changed content')
+        assert old_hash not in store
+        assert store.has_content(hash, len(b'changed content'))
+
+    def test_stored_content_is_not_copied_again(self, store, path):
+        hash = securehash.bytes(b'content')
+        store.add_file(path, hash)
+        os.remove(path)
+
+        assert store.add_file(path, hash) == hash
+
+    def test_malformed_hash_is_refused(self, store):
+        self.assertRaises(ValueError, store.path, '../../etc/passwd')
+        self.assertRaises(ValueError, store.path, securehash.bytes(b'content')[:-1])
+        assert not store.has_content('../x', 1)
@@ -1,6 +1,18 @@
+import json
+import os
+import shutil
+from unittest import mock
+import zipfile
+
 from .test import TestCase
-from .box import Box
-from .tech.fs import write_file, rmtree
+from .archive import Archive, InvalidArchive
+from .exceptions import MissingBlobStore
+from .box import Box, UnionBox
+from . import box as m
+from . import layouts
+from . import ziparchive
+from . import zipopener
+from .tech.fs import make_writable, write_file, rmtree
 from .tech.timestamp import time_from_user
 from .workspace import Workspace
 from . import spec as bead_spec
@@ -53,6 +65,36 @@ class Test_box_with_beads(TestCase):
         matches = box.get_context(bead_spec.BEAD_NAME, 'BEAD3', timestamp)
         assert 'BEAD3' == matches.best.name
 
+    def test_get_contexts(self, box, timestamp):
+        queries = [('bead1', timestamp), ('BEAD3', timestamp), ('missing', timestamp)]
+        contexts = box.get_contexts(queries)
+
+        assert set(contexts) == {('bead1', timestamp), ('BEAD3', timestamp)}
+        for name, time in contexts:
+            expected = box.get_context(bead_spec.BEAD_NAME, name, time)
+            assert contexts[(name, time)].best.content_id == expected.best.content_id
+
+    def test_get_contexts_scans_the_box_once(self, box, timestamp):
+        with mock.patch.object(m.os, 'listdir', wraps=m.os.listdir) as listdir:
+            box.get_contexts([('bead1', timestamp), ('bead2', timestamp)])
+        assert listdir.call_count == 1
+
+    def test_get_contexts_works_even_with_removed_box_directory(self, box, timestamp):
+        rmtree(box.directory)
+        assert box.get_contexts([('bead1', timestamp)]) == {}
+
+    def test_union_box_get_contexts(self, box, timestamp):
+        other_box = Box('other', self.new_temp_dir())
+        ws = Workspace(self.new_temp_dir() / 'bead1')
+        ws.create('test-bead1')
+        other_box.store(ws, '20160704T162800000000+0200')
+
+        contexts = UnionBox([box, other_box]).get_contexts([('bead1', timestamp)])
+
+        context = contexts[('bead1', timestamp)]
+        assert context.bead.box_name == 'other'
+        assert context.prev.box_name == 'test'
+
 
 class Test_box_methods_tolerate_junk_in_box(Test_box_with_beads):
 
@@ -62,3 +104,238 @@ class Test_box_methods_tolerate_junk_in_box(Test_box_with_beads):
         # add junk
         write_file(box.directory / 'some-non-bead-file', 'random bits')
         return box
+
+
+class Test_content_addressed_box(TestCase):
+
+    # fixtures
+    def box(self):
+        box = Box('test', self.new_temp_dir())
+        box.make_content_addressed()
+        return box
+
+    def workspace(self):
+        ws = Workspace(self.new_temp_dir() / 'bead')
+        ws.create('test-bead')
+        write_file(ws.directory / 'output/unchanged', 'unchanged data')
+        write_file(ws.directory / 'output/changing', 'version 1')
+        write_file(ws.directory / 'code.py', 'print(42)')
+        return ws
+
+    def archive_with_blobs(self, box, workspace, blobs, manifest=None):
+        original = box.store(workspace, '20160704T000000000000+0200')
+        hacked = box.directory / 'hacked_20160704T000000000000+0200.zip'
+        updates = {layouts.Archive.BLOBS: blobs, layouts.Archive.MANIFEST: manifest or {}}
+        with zipfile.ZipFile(original) as source, zipfile.ZipFile(hacked, 'w') as target:
+            for info in source.infolist():
+                if info.filename in updates:
+                    content = json.loads(source.read(info))
+                    content.update(updates[info.filename])
+                    target.writestr(info, json.dumps(content))
+                else:
+                    target.writestr(info, source.read(info))
+        return Archive(hacked)
+
+    def blob_count(self, box):
+        return sum(len(files) for _, _, files in os.walk(box.directory / layouts.Box.BLOBS))
+
+    # tests
+    def test_data_files_are_stored_once(self, box, workspace):
+        box.store(workspace, '20160704T000000000000+0200')
+        write_file(workspace.directory / 'output/changing', 'version 2')
+        box.store(workspace, '20160705T000000000000+0200')
+
+        assert self.blob_count(box) == 3
+
+    def test_archive_reads_data_from_blobs(self, box, workspace):
+        archive = Archive(box.store(workspace, '20160704T000000000000+0200'))
+
+        assert archive.validate() > 0
+        assert archive.data_members() == {'unchanged': 14, 'changing': 9}
+        with archive.open_data('changing') as f:
+            assert f.read() == b'version 1'
+        archive.unpack_data_to(self.new_temp_dir() / 'data')
+
+    def test_damaged_blob_is_detected(self, box, workspace):
+        archive = Archive(box.store(workspace, '20160704T000000000000+0200'))
+        blob = archive.ziparchive.blob_store.path(archive.ziparchive.manifest['data/changing'])
+        make_writable(blob)
+        write_file(blob, 'version X')
+
+        self.assertRaises(InvalidArchive, archive.validate)
+
+    def test_blob_not_in_manifest_is_invalid(self, box, workspace):
+        archive = self.archive_with_blobs(box, workspace, {'data/evil': 1})
+
+        self.assertRaises(InvalidArchive, archive.validate)
+        archive.unpack_data_to(self.new_temp_dir() / 'data')
+        assert 'evil' not in archive.data_members()
+
+    def test_blob_stored_in_the_zip_is_invalid(self, box, workspace):
+        archive = self.archive_with_blobs(box, workspace, {'code/code.py': 9})
+
+        self.assertRaises(InvalidArchive, archive.validate)
+
+    def test_blob_hash_must_be_well_formed(self, box, workspace):
+        outside = '../' * 5 + 'etc/passwd'
+        archive = self.archive_with_blobs(
+            box, workspace, {'data/evil': 1}, {'data/evil': outside})
+
+        self.assertRaises(InvalidArchive, archive.validate)
+        assert 'evil' not in archive.data_members()
+        self.assertRaises(KeyError, archive.open_data, 'evil')
+
+    def test_archive_copied_out_of_its_box(self, box, workspace):
+        original = box.store(workspace, '20160704T000000000000+0200')
+        copy = self.new_temp_dir() / os.path.basename(original)
+        shutil.copy(original, copy)
+
+        with self.assertRaises(MissingBlobStore) as raised:
+            Archive(copy).validate()
+        assert 'bead box export' in str(raised.exception)
+
+    def test_export(self, box, workspace):
+        archive = Archive(box.store(workspace, '20160704T000000000000+0200'))
+        exported_path = self.new_temp_dir() / 'bead_20160704T000000000000+0200.zip'
+
+        archive.export(exported_path)
+
+        exported = Archive(exported_path)
+        exported.validate()
+        assert exported.content_id == archive.content_id
+        assert exported.ziparchive.blobs == {}
+        with exported.open_data('unchanged') as f:
+            assert f.read() == b'unchanged data'
+
+
+class Test_delta_store(TestCase):
+
+    # fixtures
+    def box(self):
+        return Box('test', self.new_temp_dir())
+
+    def workspace(self):
+        ws = Workspace(self.new_temp_dir() / 'bead')
+        ws.create('test-bead')
+        write_file(ws.directory / 'output/unchanged', 'unchanged data' * 1000)
+        write_file(ws.directory / 'output/changing', 'version 1')
+        return ws
+
+    def raw_member(self, archive_path, zip_path):
+        with zipfile.ZipFile(archive_path) as z:
+            info = z.getinfo(zip_path)
+            with open(archive_path, 'rb') as f:
+                offset = ziparchive._data_offset(f, info)
+                f.seek(offset)
+                return info.compress_type, f.read(info.compress_size)
+
+    # tests
+    def test_unchanged_files_are_copied(self, box, workspace):
+        previous = box.store(workspace, '20160704T000000000000+0200')
+        write_file(workspace.directory / 'output/changing', 'version 2')
+        with mock.patch.object(
+                ziparchive.ZipArchive, 'copy_compressed_member', autospec=True,
+                side_effect=ziparchive.ZipArchive.copy_compressed_member) as copy:
+            new = box.store(workspace, '20160705T000000000000+0200', delta=True)
+
+        copied = {call.args[1] for call in copy.call_args_list}
+        assert 'data/unchanged' in copied
+        assert 'data/changing' not in copied
+        assert (
+            self.raw_member(previous, 'data/unchanged')
+            == self.raw_member(new, 'data/unchanged'))
+
+        archive = Archive(new)
+        archive.validate()
+        with archive.open_data('changing') as f:
+            assert f.read() == b'version 2'
+        with archive.open_data('unchanged') as f:
+            assert f.read() == b'unchanged data' * 1000
+
+    def test_damaged_member_of_previous_version_is_not_copied(self, box, workspace):
+        previous = box.store(workspace, '20160704T000000000000+0200')
+        with zipfile.ZipFile(previous) as z:
+            info = z.getinfo('data/unchanged')
+        with open(previous, 'r+b') as f:
+            f.seek(ziparchive._data_offset(f, info) + info.compress_size // 2)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xff]))
+        zipopener.close_all()
+
+        new = box.store(workspace, '20160705T000000000000+0200', delta=True)
+
+        archive = Archive(new)
+        archive.validate()
+        with archive.open_data('unchanged') as f:
+            assert f.read() == b'unchanged data' * 1000
+
+    def previous_version_with_cached_meta(self, box, workspace):
+        previous = box.store(workspace, '20160704T000000000000+0200')
+        # the damaged previous version is still found through its cached meta
+        archive = Archive(previous)
+        archive.ziparchive
+        archive.save_cache()
+        return previous
+
+    def assert_damaged_previous_version_is_not_used(self, box, workspace):
+        with self.assertWarns(UserWarning):
+            new = box.store(workspace, '20160705T000000000000+0200', delta=True)
+
+        archive = Archive(new)
+        archive.validate()
+        with archive.open_data('unchanged') as f:
+            assert f.read() == b'unchanged data' * 1000
+
+    def test_truncated_previous_version_is_not_used(self, box, workspace):
+        previous = self.previous_version_with_cached_meta(box, workspace)
+        with open(previous, 'r+b') as f:
+            f.truncate(os.path.getsize(previous) // 2)
+        zipopener.close_all()
+
+        self.assert_damaged_previous_version_is_not_used(box, workspace)
+
+    def test_previous_version_with_damaged_manifest_is_not_used(self, box, workspace):
+        previous = self.previous_version_with_cached_meta(box, workspace)
+        with zipfile.ZipFile(previous) as z:
+            info = z.getinfo(layouts.Archive.MANIFEST)
+        with open(previous, 'r+b') as f:
+            f.seek(ziparchive._data_offset(f, info))
+            f.write(b'\xff' * info.compress_size)
+        zipopener.close_all()
+
+        self.assert_damaged_previous_version_is_not_used(box, workspace)
+
+    def test_zipfile_internals_used_for_copying_are_available(self):
+        # copy_compressed_member adds members through private parts of ZipFile
+        with zipfile.ZipFile(self.new_temp_dir() / 'test.zip', 'w') as z:
+            for attribute in (
+                    '_lock', '_writing', '_writecheck', '_didModify', 'fp', 'start_dir',
+                    'filelist', 'NameToInfo'):
+                assert hasattr(z, attribute), attribute
+        assert hasattr(zipfile.ZipInfo, 'FileHeader')
+
+    def test_delta_saved_archive_passes_zipfile_test(self, box, workspace):
+        box.store(workspace, '20160704T000000000000+0200')
+        write_file(workspace.directory / 'output/changing', 'version 2')
+        new = box.store(workspace, '20160705T000000000000+0200', delta=True)
+
+        with zipfile.ZipFile(new) as z:
+            assert z.testzip() is None
+
+    def test_unexpected_zipfile_internals_fall_back_to_compressing(self, box, workspace):
+        box.store(workspace, '20160704T000000000000+0200')
+        # fails after the member header is written
+        with mock.patch.object(
+                ziparchive, '_copy_bytes', side_effect=TypeError('unexpected signature')):
+            new = box.store(workspace, '20160705T000000000000+0200', delta=True)
+
+        with zipfile.ZipFile(new) as z:
+            assert z.testzip() is None
+        archive = Archive(new)
+        archive.validate()
+        with archive.open_data('unchanged') as f:
+            assert f.read() == b'unchanged data' * 1000
+
+    def test_delta_without_previous_version(self, box, workspace):
+        Archive(box.store(workspace, '20160704T000000000000+0200', delta=True)).validate()
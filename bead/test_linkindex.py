@@ -0,0 +1,51 @@
+from .test import TestCase
+from .tech.fs import make_readonly, make_writable, write_file
+from . import linkindex as m
+
+import os
+
+
+class Test_LinkIndex(TestCase):
+
+    # fixtures
+    def dir(self):
+        return self.new_temp_dir()
+
+    def index(self, dir):
+        return m.LinkIndex(dir / 'index')
+
+    def copy(self, dir):
+        path = dir / 'copy'
+        write_file(path, 'content')
+        make_readonly(path)
+        return path
+
+    # tests
+    def test_unknown_file_is_not_linked(self, index, dir):
+        assert not index.link('content_id', 'data/file', dir / 'link')
+        assert not os.path.exists(dir / 'link')
+
+    def test_remembered_copy_is_linked(self, index, copy, dir):
+        index.remember('content_id', 'data/file', copy)
+
+        assert index.link('content_id', 'data/file', dir / 'link')
+        assert os.path.samefile(copy, dir / 'link')
+        assert not index.link('other_content_id', 'data/file', dir / 'link2')
+
+    def test_saved_copies_are_known_to_new_index(self, index, copy, dir):
+        index.remember('content_id', 'data/file', copy)
+        index.save('content_id')
+
+        assert self.index(dir).link('content_id', 'data/file', dir / 'link')
+
+    def test_writable_copy_is_not_linked(self, index, copy, dir):
+        index.remember('content_id', 'data/file', copy)
+        make_writable(copy)
+
+        assert not index.link('content_id', 'data/file', dir / 'link')
+
+    def test_modified_copy_is_not_linked(self, index, copy, dir):
+        index.remember('content_id', 'data/file', copy)
+        os.utime(copy, ns=(0, 0))
+
+        assert not index.link('content_id', 'data/file', dir / 'link')
@@ -2,14 +2,19 @@ from bead.exceptions import InvalidArchive
 from .test import TestCase, chdir
 from . import workspace as m
 
+import io
 import os
+import time
 import zipfile
+from unittest import mock
 
-from .archive import Archive
+from .archive import Archive, SCOPE_CODE, SCOPE_DATA
 from . import layouts
+from . import ziparchive
 from . import tech
 
 write_file = tech.fs.write_file
+read_file = tech.fs.read_file
 ensure_directory = tech.fs.ensure_directory
 temp_dir = tech.fs.temp_dir
 timestamp = tech.timestamp.timestamp
@@ -187,6 +192,151 @@ class Test_pack_stability(TestCase):
         assert bead1.content_id == bead2.content_id
 
 
+class Test_hash_cache(TestCase):
+
+    # fixtures
+    def workspace(self):
+        ws = m.Workspace(self.new_temp_dir() / 'workspace')
+        ws.create(A_KIND)
+        write_file(ws.directory / 'source1', 'code to produce output')
+        write_file(ws.directory / 'output/output1', 'output')
+        for path in ('source1', 'output/output1'):
+            make_old(ws.directory / path)
+        return ws
+
+    def pack(self, workspace):
+        archive_path = self.new_temp_dir() / 'bead.zip'
+        workspace.pack(archive_path, '20150910T093724802366+0200', comment='')
+        return archive_path
+
+    def hashed_files(self, workspace):
+        with mock.patch.object(m.securehash, 'file', wraps=m.securehash.file) as file_hash:
+            archive_path = self.pack(workspace)
+        return Archive(archive_path), file_hash.call_count
+
+    # tests
+    def test_unchanged_files_are_not_hashed_again(self, workspace):
+        archive1, hashed_files1 = self.hashed_files(workspace)
+        archive2, hashed_files2 = self.hashed_files(workspace)
+
+        assert hashed_files1 == 2
+        assert hashed_files2 == 0
+        assert archive1.content_id == archive2.content_id
+        archive2.validate()
+
+    def test_changed_file_is_hashed_again(self, workspace):
+        archive1, _ = self.hashed_files(workspace)
+        write_file(workspace.directory / 'output/output1', 'OUTPUT')
+        make_old(workspace.directory / 'output/output1', seconds=3600)
+        archive2, hashed_files = self.hashed_files(workspace)
+
+        assert hashed_files == 1
+        assert archive1.content_id != archive2.content_id
+        archive2.validate()
+
+    def test_recently_modified_files_are_not_cached(self, workspace):
+        write_file(workspace.directory / 'output/output1', 'OUTPUT')
+        self.hashed_files(workspace)
+        _, hashed_files = self.hashed_files(workspace)
+
+        assert hashed_files == 1
+
+    def test_new_files_are_hashed_while_compressed(self, workspace):
+        with mock.patch.object(m.securehash, 'file', wraps=m.securehash.file) as file_hash:
+            archive_path = self.pack(workspace)
+
+        assert {type(call.args[0]) for call in file_hash.call_args_list} == {m._CopyingReader}
+        archive = Archive(archive_path)
+        archive.validate()
+        with archive.open_data('output1') as f:
+            assert f.read() == b'output'
+
+    def test_new_files_are_compressed_with_the_configured_level(self, workspace):
+        write_file(workspace.directory / 'output/output1', 'compressible ' * 1000)
+        with mock.patch.dict(os.environ, BEAD_ZIP_COMPRESSION_LEVEL='0'):
+            archive_path = self.pack(workspace)
+
+        with zipfile.ZipFile(archive_path) as z:
+            info = z.getinfo('data/output1')
+        assert info.compress_type == zipfile.ZIP_DEFLATED
+        # level 0 deflate stores the data in uncompressed blocks
+        assert info.compress_size > info.file_size
+
+    def test_calculated_hash_ignores_the_cache(self, workspace):
+        path = workspace.directory / 'source1'
+        hash_cache = m._HashCache(self.new_temp_dir() / 'hashes.json')
+        hash_cache.previous_entries['source1'] = hash_cache._fingerprint(path) + ['stale']
+        file = open(path, 'rb')
+
+        hash = hash_cache.calculate_hash(path, 'source1', file)
+
+        assert hash == m.securehash.bytes(b'code to produce output')
+        assert file.closed
+        assert hash_cache.entries['source1'][-1] == hash
+
+    def test_changing_hash_algorithm_invalidates_the_cache(self, workspace):
+        self.hashed_files(workspace)
+        with mock.patch.dict(os.environ, BEAD_FILE_HASH='tree'):
+            with mock.patch.object(
+                    m.securehash, 'tree_file', wraps=m.securehash.tree_file) as tree_file:
+                self.pack(workspace)
+
+        assert tree_file.call_count == 2
+
+
+class Test_tree_hash_meta_version(TestCase):
+
+    # fixtures
+    def workspace(self):
+        ws = m.Workspace(self.new_temp_dir() / 'workspace')
+        ws.create(A_KIND)
+        write_file(ws.directory / 'source1', 'code to produce output')
+        write_file(ws.directory / 'output/output1', 'output')
+        return ws
+
+    def pack(self, workspace, **environ):
+        archive_path = self.new_temp_dir() / 'bead.zip'
+        with mock.patch.dict(os.environ, environ):
+            workspace.pack(archive_path, '20150910T093724802366+0200', comment='')
+        return Archive(archive_path)
+
+    # tests
+    def test_default_is_the_original_meta_version(self, workspace):
+        assert self.pack(workspace).meta_version == m.META_VERSION
+
+    def test_tree_hashed_archive_is_valid(self, workspace):
+        archive = self.pack(workspace, BEAD_FILE_HASH='tree')
+
+        assert archive.meta_version == m.TREE_HASH_META_VERSION
+        archive.validate()
+
+    def test_content_ids_differ(self, workspace):
+        sha512_archive = self.pack(workspace, BEAD_FILE_HASH='sha512')
+        tree_archive = self.pack(workspace, BEAD_FILE_HASH='tree')
+
+        assert sha512_archive.content_id != tree_archive.content_id
+
+    def test_changed_file_is_detected(self, workspace):
+        archive = self.pack(workspace, BEAD_FILE_HASH='tree')
+        changed_path = self.new_temp_dir() / 'changed.zip'
+        with zipfile.ZipFile(archive.archive_filename) as z:
+            with zipfile.ZipFile(changed_path, 'w') as changed:
+                for name in z.namelist():
+                    content = b'changed' if name == 'data/output1' else z.read(name)
+                    changed.writestr(name, content)
+
+        self.assertRaises(InvalidArchive, Archive(changed_path).validate)
+
+    def test_invalid_hash_algorithm(self):
+        self.assertRaises(
+            ValueError, m.meta_version_from_environment, dict(BEAD_FILE_HASH='md5'))
+
+
+def make_old(path, seconds=86400):
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
 def make_bead(path, filespecs):
     with temp_dir() as root:
         workspace = m.Workspace(root / 'workspace')
@@ -264,6 +414,182 @@ class Test_load(TestCase):
         self._load_a_bead('bead2')
 
 
+class Test_input_filter(TestCase):
+
+    # fixtures
+    def workspace(self):
+        workspace = m.Workspace(self.new_temp_dir() / 'workspace')
+        workspace.create(A_KIND)
+        return workspace
+
+    def bead(self):
+        path = self.new_temp_dir() / 'bead.zip'
+        with temp_dir() as root:
+            workspace = m.Workspace(root / 'workspace')
+            workspace.create(A_KIND)
+            ensure_directory(workspace.directory / 'output/docs')
+            for filename in ('2019.csv', '2020.csv', 'docs/README.txt'):
+                write_file(workspace.directory / 'output' / filename, filename)
+            workspace.pack(path, timestamp(), 'no comment')
+        return Archive(path)
+
+    def loaded_files(self, workspace):
+        input_dir = workspace.directory / 'input/nick'
+        return {
+            os.path.relpath(path, input_dir).replace(os.sep, '/')
+            for path in tech.fs.all_subpaths(input_dir)
+            if os.path.isfile(path)}
+
+    # tests
+    def test_all_files_are_loaded_by_default(self, workspace, bead):
+        workspace.load('nick', bead)
+
+        assert self.loaded_files(workspace) == {'2019.csv', '2020.csv', 'docs/README.txt'}
+
+    def test_include(self, workspace, bead):
+        workspace.load('nick', bead, include=['*.csv'])
+
+        assert self.loaded_files(workspace) == {'2019.csv', '2020.csv'}
+
+    def test_include_and_exclude(self, workspace, bead):
+        workspace.load('nick', bead, include=['*.csv', 'docs/*'], exclude=['2019*'])
+
+        assert self.loaded_files(workspace) == {'2020.csv', 'docs/README.txt'}
+
+    def test_filter_is_remembered(self, workspace, bead):
+        workspace.load('nick', bead, exclude=['docs/*'])
+        workspace.unload('nick')
+        workspace.load('nick', bead)
+
+        assert self.loaded_files(workspace) == {'2019.csv', '2020.csv'}
+        assert workspace.get_input_filter('nick') == ([], ['docs/*'])
+
+    def test_filter_can_be_cleared(self, workspace, bead):
+        workspace.load('nick', bead, include=['2019.csv'], exclude=['docs/*'])
+        workspace.set_input_filter('nick', include=[], exclude=[])
+
+        assert workspace.get_input_filter('nick') == ([], [])
+
+    def test_path_filter(self):
+        assert m.path_filter([], []) is None
+
+        accept = m.path_filter(['data/*'], ['*.tmp'])
+        assert accept('data/x.csv')
+        assert not accept('data/x.tmp')
+        assert not accept('other/x.csv')
+
+    def test_reload_removes_old_files_in_background(self, workspace, bead):
+        workspace.load('nick', bead)
+        workspace.load('nick', bead, include=['2020.csv'])
+
+        assert self.loaded_files(workspace) == {'2020.csv'}
+        workspace.wait_for_background_removals()
+        assert os.listdir(workspace.directory / layouts.Workspace.TRASH) == []
+
+    def test_symlinked_input_directory_target_is_kept(self, workspace, bead):
+        target = self.new_temp_dir()
+        write_file(target / 'keep', 'precious')
+        workspace.load('nick', bead)
+        workspace.unload('nick')
+        with workspace.input_directory_writable():
+            os.symlink(target, workspace.directory / 'input/nick')
+            workspace.extract_input('nick', bead)
+        workspace.wait_for_background_removals()
+        workspace.unload('nick')
+        with workspace.input_directory_writable():
+            os.symlink(target, workspace.directory / 'input/nick')
+        workspace.unload('nick', background=True)
+        workspace.wait_for_background_removals()
+
+        assert not os.path.lexists(workspace.directory / 'input/nick')
+        assert read_file(target / 'keep') == 'precious'
+
+    def test_unload_in_background(self, workspace, bead):
+        workspace.load('nick', bead)
+        workspace.unload('nick', background=True)
+
+        assert not os.path.exists(workspace.directory / 'input/nick')
+        workspace.wait_for_background_removals()
+        assert os.listdir(workspace.directory / layouts.Workspace.TRASH) == []
+
+
+class Test_meta_cache(TestCase):
+
+    # fixtures
+    def workspace(self):
+        workspace = m.Workspace(self.new_temp_dir() / 'workspace')
+        workspace.create(A_KIND)
+        for path in m.fs.all_subpaths(workspace.directory / layouts.Workspace.META):
+            make_old(path)
+        return workspace
+
+    def file_loads(self, workspace, action):
+        with mock.patch.object(
+                m.persistence, 'file_load', wraps=m.persistence.file_load) as file_load:
+            action()
+        return file_load.call_count
+
+    def file_dumps(self, workspace, action):
+        with mock.patch.object(
+                m.persistence, 'file_dump', wraps=m.persistence.file_dump) as file_dump:
+            action()
+        return file_dump.call_count
+
+    # tests
+    def test_unchanged_meta_is_parsed_once(self, workspace):
+        def read_meta_many_times():
+            for _ in range(10):
+                workspace.kind
+                workspace.inputs
+                workspace.has_input('nick')
+                workspace.get_input_bead_name('nick')
+        assert self.file_loads(workspace, read_meta_many_times) == 1
+
+    def test_recently_modified_meta_is_not_cached(self, workspace):
+        workspace.add_input('nick', 'kind', 'content_id', 'freeze_time')
+
+        def read_meta_twice():
+            workspace.kind
+            workspace.kind
+        assert self.file_loads(workspace, read_meta_twice) == 2
+
+    def test_modified_meta_is_reloaded(self, workspace):
+        workspace.kind
+        other_workspace_instance = m.Workspace(workspace.directory)
+        other_workspace_instance.add_input('nick', 'kind', 'content_id', 'freeze_time')
+
+        assert workspace.has_input('nick')
+
+    def test_returned_meta_can_be_modified(self, workspace):
+        meta = workspace.meta
+        meta['kind'] = 'modified'
+
+        assert workspace.kind == A_KIND
+
+    def test_transaction_writes_once(self, workspace):
+        def add_inputs():
+            with workspace.transaction():
+                for i in range(5):
+                    workspace.add_input(f'nick{i}', 'kind', 'content_id', 'freeze_time')
+                    workspace.set_input_bead_name(f'nick{i}', f'bead{i}')
+                assert workspace.has_input('nick4')
+                assert not m.Workspace(workspace.directory).has_input('nick4')
+        assert self.file_dumps(workspace, add_inputs) == 2
+
+        assert m.Workspace(workspace.directory).has_input('nick4')
+        assert m.Workspace(workspace.directory).get_input_bead_name('nick4') == 'bead4'
+
+    def test_failed_transaction_is_discarded(self, workspace):
+        try:
+            with workspace.transaction():
+                workspace.add_input('nick', 'kind', 'content_id', 'freeze_time')
+                raise ValueError
+        except ValueError:
+            pass
+
+        assert not workspace.has_input('nick')
+
+
 class Test_input_map(TestCase):
 
     def test_default_value(self, workspace_with_input, input_nick):
@@ -393,3 +719,92 @@ class Test_is_valid(TestCase):
         zip_up(unzipped_archive_path, modified_archive_path)
 
         self.assertRaises(InvalidArchive, Archive(modified_archive_path).validate)
+
+    def test_changed_data_file_is_ignored_when_validating_code(self, unzipped_archive_path):
+        write_file(unzipped_archive_path / layouts.Archive.DATA / 'data1', b'HACKED')
+        modified_archive_path = self.new_temp_dir() / 'modified_archive.zip'
+        zip_up(unzipped_archive_path, modified_archive_path)
+
+        Archive(modified_archive_path).validate(SCOPE_CODE)
+        self.assertRaises(InvalidArchive, Archive(modified_archive_path).validate, SCOPE_DATA)
+
+    def test_changed_code_file_is_ignored_when_validating_data(self, unzipped_archive_path):
+        write_file(unzipped_archive_path / layouts.Archive.CODE / 'code1', b'HACKED')
+        modified_archive_path = self.new_temp_dir() / 'modified_archive.zip'
+        zip_up(unzipped_archive_path, modified_archive_path)
+
+        Archive(modified_archive_path).validate(SCOPE_DATA)
+        self.assertRaises(InvalidArchive, Archive(modified_archive_path).validate, SCOPE_CODE)
+
+    def test_extra_data_file_is_ignored_when_validating_code(self, archive_path):
+        with zipfile.ZipFile(archive_path, 'a') as z:
+            z.writestr(layouts.Archive.DATA / 'extra_file', b'something')
+
+        Archive(archive_path).validate(SCOPE_CODE)
+        self.assertRaises(InvalidArchive, Archive(archive_path).validate, SCOPE_DATA)
+
+    def archive_with_many_files_path(self, workspace, timestamp):
+        for i in range(10):
+            write_file(workspace.directory / f'code{i}', f'code{i}')
+            write_file(workspace.directory / f'output/data{i}', f'data{i}')
+        return self.archive_path(workspace, timestamp)
+
+    def test_validate_returns_the_number_of_bytes_verified(self, archive_with_many_files_path):
+        archive = Archive(archive_with_many_files_path)
+        meta_size = archive.validate(SCOPE_CODE) - 10 * len('code0')
+
+        assert meta_size > 0
+        assert archive.validate(SCOPE_DATA) == meta_size + 10 * len('data0')
+        assert archive.validate() == meta_size + 10 * len('code0') + 10 * len('data0')
+
+    def test_serial_and_parallel_validation_detect_a_changed_file(
+            self, archive_with_many_files_path):
+        unzipped_archive_path = self.new_temp_dir()
+        unzip(archive_with_many_files_path, unzipped_archive_path)
+        write_file(unzipped_archive_path / layouts.Archive.DATA / 'data7', b'HACKED')
+        modified_archive_path = self.new_temp_dir() / 'modified_archive.zip'
+        zip_up(unzipped_archive_path, modified_archive_path)
+
+        for threads in (1, 4):
+            with mock.patch.object(ziparchive, 'VALIDATION_THREADS', threads):
+                Archive(archive_with_many_files_path).validate()
+                self.assertRaises(InvalidArchive, Archive(modified_archive_path).validate)
+
+    def test_parallel_validation_aborts_running_checks_at_first_mismatch(
+            self, workspace, timestamp):
+        for i in range(10):
+            write_file(workspace.directory / f'output/data{i}', f'data{i}')
+        # the biggest file is checked first
+        write_file(workspace.directory / 'output/data7', 'data7' * 10000)
+        archive_path = self.archive_path(workspace, timestamp)
+        has_content_id = ziparchive._has_content_id
+        aborted = []
+
+        def _has_content_id(zipfile, info, content_id, algorithm, abort=None):
+            if info.filename == layouts.Archive.DATA / 'data7':
+                return False
+            # slow check - it is still running when the mismatch is found
+            aborted.append(abort.wait(timeout=10))
+            return has_content_id(zipfile, info, content_id, algorithm, abort)
+
+        with mock.patch.object(ziparchive, 'VALIDATION_THREADS', 4):
+            with mock.patch.object(ziparchive, '_has_content_id', _has_content_id):
+                self.assertRaises(InvalidArchive, Archive(archive_path).validate)
+
+        assert aborted and all(aborted)
+
+    def test_truncated_member_has_different_content_id(self):
+        class TruncatedMember(io.RawIOBase):
+            def readable(self):
+                return True
+
+            def readinto(self, buffer):
+                raise EOFError('Compressed file ended before the end-of-stream marker')
+
+        member = TruncatedMember()
+        opened_zipfile = mock.Mock()
+        opened_zipfile.open.return_value = member
+        info = zipfile.ZipInfo('data/file')
+        info.file_size = 100
+
+        assert not ziparchive._has_content_id(opened_zipfile, info, 'content_id', 'sha512')
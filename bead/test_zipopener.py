@@ -0,0 +1,59 @@
+from .test import TestCase
+from . import zipopener as m
+
+import zipfile
+
+
+class Test_OpenZipLRUCache(TestCase):
+
+    # fixtures
+    def cache(self):
+        cache = m.OpenZipLRUCache(max_size=2)
+        self.addCleanup(cache.close_all)
+        return cache
+
+    def zip_files(self):
+        directory = self.new_temp_dir()
+        filenames = []
+        for i in range(4):
+            filename = directory / f'{i}.zip'
+            with zipfile.ZipFile(filename, 'w') as z:
+                z.writestr('file', f'content {i}')
+            filenames.append(filename)
+        return filenames
+
+    # tests
+    def test_least_recently_used_is_closed(self, cache, zip_files):
+        first = cache.open(zip_files[0])
+        for filename in zip_files[1:]:
+            cache.open(filename)
+
+        assert first.fp is None
+        assert len(cache.open_zip_files) == 2
+
+    def test_pinned_is_not_closed(self, cache, zip_files):
+        pinned = cache.pin(zip_files[0])
+        for filename in zip_files[1:]:
+            cache.open(filename)
+
+        assert pinned.read('file') == b'content 0'
+        assert len(cache.open_zip_files) == 2
+
+    def test_cache_grows_while_all_are_pinned(self, cache, zip_files):
+        pinned = [cache.pin(filename) for filename in zip_files]
+
+        assert [z.read('file') for z in pinned] == [f'content {i}'.encode() for i in range(4)]
+        assert len(cache.open_zip_files) == 4
+
+        for filename in zip_files:
+            cache.unpin(filename)
+        assert len(cache.open_zip_files) == 2
+
+    def test_pins_are_counted(self, cache, zip_files):
+        pinned = cache.pin(zip_files[0])
+        cache.pin(zip_files[0])
+        cache.unpin(zip_files[0])
+        for filename in zip_files[1:]:
+            cache.open(filename)
+
+        assert pinned.read('file') == b'content 0'
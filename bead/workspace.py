@@ -2,13 +2,22 @@
 Proto-Beads & their filesystem layout
 '''
 
+import contextlib
+from copy import deepcopy
+from fnmatch import fnmatchcase
+import io
 import os
+import time
+import warnings
 import zipfile
+import zlib
 
 from . import layouts
 from . import meta
 from . import tech
+from .tech import compression
 from .bead import Bead
+from .exceptions import InvalidArchive, InvalidEnvironment
 
 # technology modules
 persistence = tech.persistence
@@ -18,14 +27,99 @@ fs = tech.fs
 
 # generated with `uuidgen -t`
 META_VERSION = 'aaa947a6-1f7a-11e6-ba3a-0021cc73492e'
+# file hashes are tree hashes, that can be calculated in parallel for big files
+TREE_HASH_META_VERSION = '31c6f938-cb99-11f1-95a0-02fc00000001'
+
+META_VERSIONS = {
+    securehash.SHA512: META_VERSION,
+    securehash.TREE: TREE_HASH_META_VERSION,
+}
+
+# Files modified this recently are not cached: a modification within the
+# timestamp resolution of the file system would go unnoticed later.
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+
+def meta_version_from_environment(environ=os.environ):
+    '''
+    Meta version of new beads - selected by the BEAD_FILE_HASH (sha512 or tree) variable.
+
+    sha512 (the default) beads can be used by older versions of bead as well.
+    '''
+    algorithm = environ.get('BEAD_FILE_HASH', securehash.SHA512)
+    try:
+        return META_VERSIONS[algorithm]
+    except KeyError:
+        raise InvalidEnvironment('BEAD_FILE_HASH', algorithm, 'one of ' + ', '.join(META_VERSIONS))
 
 
 class Workspace(Bead):
 
     directory = None
+    _input_directory_writers = 0
 
     def __init__(self, directory):
         self.directory = fs.Path(os.path.abspath(directory))
+        # filename -> (file stat key, parsed content)
+        self._json_cache = {}
+        # filename -> content to write at the end of the transaction
+        self._pending_writes = None
+        # threads removing directories moved to the trash
+        self._background_removals = []
+        # bead.linkindex.LinkIndex for sharing loaded input files between inputs
+        self.link_index = None
+
+    def _load_json(self, filename):
+        '''
+        Parse JSON file, reusing the previous result, if the file is unchanged.
+        '''
+        if self._pending_writes and filename in self._pending_writes:
+            return deepcopy(self._pending_writes[filename])
+        key = _stat_key(filename)
+        cached = self._json_cache.get(filename)
+        if cached is not None and cached[0] == key:
+            content = cached[1]
+        else:
+            content = persistence.file_load(filename)
+            self._cache_json(filename, key, content)
+        # copy, so that modifications of the result do not corrupt the cache
+        return deepcopy(content)
+
+    def _cache_json(self, filename, key, content):
+        mtime_ns, _size, _inode = key
+        if time.time_ns() - mtime_ns > RACY_WINDOW_NS:
+            self._json_cache[filename] = key, content
+        else:
+            self._json_cache.pop(filename, None)
+
+    def _dump_json(self, filename, content):
+        if self._pending_writes is not None:
+            self._pending_writes[filename] = deepcopy(content)
+            return
+        persistence.file_dump(content, filename)
+        self._cache_json(filename, _stat_key(filename), deepcopy(content))
+
+    @contextlib.contextmanager
+    def transaction(self):
+        '''
+        Batch changes to meta and input map.
+
+        Changes are written once, at the end of the outermost block,
+        and are discarded if the block raises an exception.
+        '''
+        is_outermost = self._pending_writes is None
+        if is_outermost:
+            self._pending_writes = {}
+        try:
+            yield self
+            if is_outermost:
+                pending_writes = self._pending_writes
+                self._pending_writes = None
+                for filename, content in pending_writes.items():
+                    self._dump_json(filename, content)
+        finally:
+            if is_outermost:
+                self._pending_writes = None
 
     @property
     def is_valid(self):
@@ -43,11 +137,11 @@ class Workspace(Bead):
 
     @property
     def meta(self):
-        return persistence.file_load(self._meta_filename)
+        return self._load_json(self._meta_filename)
 
     @meta.setter
     def meta(self, meta):
-        persistence.file_dump(meta, self._meta_filename)
+        self._dump_json(self._meta_filename, meta)
 
     # Bead properties
     @property
@@ -108,13 +202,18 @@ class Workspace(Bead):
         fs.ensure_directory(dir / layouts.Workspace.TEMP)
         fs.ensure_directory(dir / layouts.Workspace.META)
 
-    def pack(self, zipfilename, freeze_time, comment):
+    def pack(self, zipfilename, freeze_time, comment, blob_store=None, previous=None):
         '''
         Create archive from workspace.
+
+        If a blob_store (bead.blobstore.BlobStore) is given, data files are stored there,
+        and not in the archive.
+        If a previous version of the bead (an Archive) is given, files unchanged since
+        then are copied from it without compressing them again.
         '''
         assert not os.path.exists(zipfilename)
         try:
-            _ZipCreator().create(zipfilename, self, freeze_time, comment)
+            _ZipCreator(blob_store, previous).create(zipfilename, self, freeze_time, comment)
         except (RuntimeError, Exception):
             if os.path.exists(zipfilename):
                 os.remove(zipfilename)
@@ -134,10 +233,35 @@ class Workspace(Bead):
 
     def add_input(self, input_nick, kind, content_id, freeze_time_str):
         m = self.meta
-        m[meta.INPUTS][input_nick] = {
+        input = m[meta.INPUTS].setdefault(input_nick, {})
+        # keep other (e.g. filter) settings of an existing input
+        input.update({
             meta.INPUT_KIND: kind,
             meta.INPUT_CONTENT_ID: content_id,
-            meta.INPUT_FREEZE_TIME: freeze_time_str}
+            meta.INPUT_FREEZE_TIME: freeze_time_str})
+        self.meta = m
+
+    def get_input_filter(self, input_nick):
+        '''
+        Returns (include, exclude) glob pattern lists for the data files of the input.
+        '''
+        input = self.meta[meta.INPUTS][input_nick]
+        return input.get(meta.INPUT_INCLUDE, []), input.get(meta.INPUT_EXCLUDE, [])
+
+    def set_input_filter(self, input_nick, include=None, exclude=None):
+        '''
+        Set glob patterns of data files to load (include) or not to load (exclude).
+
+        None leaves the existing patterns unchanged.
+        '''
+        m = self.meta
+        input = m[meta.INPUTS][input_nick]
+        for key, patterns in ((meta.INPUT_INCLUDE, include), (meta.INPUT_EXCLUDE, exclude)):
+            if patterns is not None:
+                if patterns:
+                    input[key] = list(patterns)
+                else:
+                    input.pop(key, None)
         self.meta = m
 
     def delete_input(self, input_nick):
@@ -158,13 +282,13 @@ class Workspace(Bead):
         Map from local (bead specific) input nicks to real (more widely recognised) bead names
         """
         try:
-            return persistence.file_load(self._input_map_filename)
+            return self._load_json(self._input_map_filename)
         except:
             return {}
 
     @input_map.setter
     def input_map(self, input_map):
-        persistence.file_dump(input_map, self._input_map_filename)
+        self._dump_json(self._input_map_filename, input_map)
 
     def get_input_bead_name(self, input_nick):
         '''
@@ -180,34 +304,71 @@ class Workspace(Bead):
         input_map[input_nick] = bead_name
         self.input_map = input_map
 
-    def load(self, input_nick, bead):
+    @contextlib.contextmanager
+    def input_directory_writable(self):
         '''
-        Make output data files in bead available under input directory
+        Keep the (normally read only) input directory writable within the block.
+
+        Nested blocks do not make it read only, only the outermost one.
         '''
         input_dir = self.directory / layouts.Workspace.INPUT
-        fs.make_writable(input_dir)
+        if not self._input_directory_writers:
+            fs.make_writable(input_dir)
+        self._input_directory_writers += 1
         try:
+            yield input_dir
+        finally:
+            self._input_directory_writers -= 1
+            if not self._input_directory_writers:
+                fs.make_readonly(input_dir)
+
+    def load(self, input_nick, bead, include=None, exclude=None):
+        '''
+        Make output data files in bead available under input directory
+
+        Only files matching the input's filter are loaded, see set_input_filter.
+        '''
+        with self.input_directory_writable(), self.transaction():
             self.add_input(
                 input_nick,
                 bead.kind, bead.content_id, bead.freeze_time_str)
-            destination_dir = input_dir / input_nick
-            bead.unpack_data_to(destination_dir)
-            for f in fs.all_subpaths(destination_dir):
-                fs.make_readonly(f)
-        finally:
-            fs.make_readonly(input_dir)
+            self.set_input_filter(input_nick, include, exclude)
+            self.extract_input(input_nick, bead, path_filter(*self.get_input_filter(input_nick)))
+
+    def extract_input(self, input_nick, bead, accept=None):
+        '''
+        Replace data under the input directory of input_nick with data files from bead.
+
+        Unlike load, it neither reads nor records anything in the workspace meta,
+        thus different inputs can be extracted in parallel
+        - within an input_directory_writable block.
+        '''
+        destination_dir = self.directory / layouts.Workspace.INPUT / input_nick
+        if os.path.lexists(destination_dir):
+            self._remove_in_background(destination_dir)
+        bead.unpack_data_to(destination_dir, accept, readonly=True, link_index=self.link_index)
 
-    def unload(self, input_nick):
+    def unload(self, input_nick, background=False):
         '''
         Remove files for given input
+
+        With background=True the files are only moved out of the way,
+        the actual deletion happens in a background thread.
         '''
         assert self.has_input(input_nick)
-        input_dir = self.directory / layouts.Workspace.INPUT
-        fs.make_writable(input_dir)
-        try:
-            fs.rmtree(input_dir / input_nick)
-        finally:
-            fs.make_readonly(input_dir)
+        with self.input_directory_writable() as input_dir:
+            if background:
+                self._remove_in_background(input_dir / input_nick)
+            else:
+                fs.rmtree(input_dir / input_nick)
+
+    def _remove_in_background(self, path):
+        self._background_removals.append(
+            fs.rmtree_in_background(path, self.directory / layouts.Workspace.TRASH))
+
+    def wait_for_background_removals(self):
+        while self._background_removals:
+            self._background_removals.pop().join()
 
     def __repr__(self):
         # default values are printed as repr of the value
@@ -234,20 +395,203 @@ class Workspace(Bead):
         return ws
 
 
+def _stat_key(filename):
+    stat = os.stat(filename)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def path_filter(include, exclude):
+    '''
+    Make an accept(path) function for glob patterns, None if all paths are accepted.
+
+    A path is accepted, if it matches any include pattern (or there are none),
+    and does not match any exclude pattern.
+    '''
+    if not include and not exclude:
+        return None
+
+    def accept(path):
+        return (
+            (not include or any(fnmatchcase(path, pattern) for pattern in include))
+            and not any(fnmatchcase(path, pattern) for pattern in exclude))
+    return accept
+
+
+class _HashCache:
+    '''
+    Content hashes of workspace files recorded at the previous save.
+
+    A file is assumed to be unchanged, if its size, modification time and inode
+    are all the same as when its hash was recorded.
+    '''
+
+    RACY_WINDOW_NS = RACY_WINDOW_NS
+
+    def __init__(self, filename, algorithm=securehash.SHA512):
+        self.filename = filename
+        self.algorithm = algorithm
+        try:
+            self.previous_entries = persistence.file_load(filename)
+        except (OSError, persistence.ReadError):
+            self.previous_entries = {}
+        self.entries = {}
+        self.start_ns = time.time_ns()
+
+    def _fingerprint(self, path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino, self.algorithm]
+
+    def _record(self, key, fingerprint, hash):
+        _size, mtime_ns, _inode, _algorithm = fingerprint
+        if self.start_ns - mtime_ns > self.RACY_WINDOW_NS:
+            self.entries[key] = fingerprint + [hash]
+
+    def cached_hash(self, path, key):
+        '''
+        Return the recorded hash of file at path, or None, if it might have changed since.
+        '''
+        fingerprint = self._fingerprint(path)
+        entry = self.previous_entries.get(key)
+        if entry is not None and entry[:-1] == fingerprint:
+            self._record(key, fingerprint, entry[-1])
+            return entry[-1]
+        return None
+
+    def file_hash(self, path, key):
+        '''
+        Return the hash of file at path, calculate it, if it is not cached.
+        '''
+        hash = self.cached_hash(path, key)
+        if hash is None:
+            hash = self.calculate_hash(path, key, open(path, 'rb'))
+        return hash
+
+    def calculate_hash(self, path, key, file):
+        '''
+        Calculate and record the hash of file at path, reading (and closing) file.
+
+        file is to be opened on path (possibly wrapped).
+        '''
+        fingerprint = self._fingerprint(path)
+        size = fingerprint[0]
+        hash = securehash.hash_file(self.algorithm, file, size)
+        self._record(key, fingerprint, hash)
+        return hash
+
+    def save(self):
+        try:
+            persistence.file_dump(self.entries, self.filename)
+        except OSError:
+            # the cache is an optimization only
+            pass
+
+
+class _CopyingReader(io.RawIOBase):
+    '''
+    Read-only file object, that writes everything read from source to copy.
+    '''
+
+    def __init__(self, source, copy):
+        super().__init__()
+        self.source = source
+        self.copy = copy
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = self.source.readinto(buffer)
+        if size:
+            self.copy.write(memoryview(buffer)[:size])
+        return size
+
+    def close(self):
+        self.source.close()
+        super().close()
+
+
+def _set_compress_level(zinfo, compresslevel):
+    '''
+    Set the compression level ZipFile.open(zinfo, 'w') uses.
+
+    ZipInfo.compress_level is public since Python 3.13,
+    before that ZipFile.write sets the private _compresslevel just the same.
+    '''
+    if hasattr(zipfile.ZipInfo, 'compress_level'):
+        zinfo.compress_level = compresslevel
+    else:
+        zinfo._compresslevel = compresslevel
+
+
 class _ZipCreator:
-    def __init__(self):
+    def __init__(self, blob_store=None, previous=None):
         self.hashes = {}
         self.zipfile = None
+        self.hash_cache = None
+        self.compression_policy = None
+        self.blob_store = blob_store
+        # data files stored in blob_store: zip_path -> size
+        self.blobs = {}
+        self.previous = previous
+        # hashes of files, that can be copied from previous: zip_path -> hash
+        self.previous_hashes = {}
+        self.meta_version = None
+        self.hash_algorithm = None
 
     def add_hash(self, path, hash):
         assert path not in self.hashes
         self.hashes[path] = hash
 
     def add_file(self, path, zip_path):
-        self.zipfile.write(path, zip_path)
-        self.add_hash(
-            zip_path,
-            securehash.file(open(path, 'rb'), os.path.getsize(path)))
+        hash = self.hash_cache.cached_hash(path, zip_path)
+        if self.blob_store is not None and zip_path.startswith(layouts.Archive.DATA + '/'):
+            hash = self.blob_store.add_file(
+                path, hash or self.hash_cache.file_hash(path, zip_path), self.hash_algorithm)
+            self.blobs[zip_path] = os.path.getsize(self.blob_store.path(hash))
+        elif zip_path in self.previous_hashes:
+            hash = hash or self.hash_cache.file_hash(path, zip_path)
+            if not self.copy_previous(path, zip_path, hash):
+                self.write_file(path, zip_path, hash)
+        else:
+            hash = self.write_file(path, zip_path, hash)
+        self.add_hash(zip_path, hash)
+
+    def copy_previous(self, path, zip_path, hash):
+        '''
+        Copy the compressed member from the previous version, if it has the same content.
+
+        Return True if it was copied.
+        '''
+        if self.previous_hashes[zip_path] != hash:
+            return False
+        try:
+            self.previous.copy_compressed_member(
+                zip_path, self.zipfile, zipfile.ZipInfo.from_file(path, zip_path))
+        except InvalidArchive:
+            # damaged previous version - the file is compressed again
+            return False
+        except (AttributeError, TypeError, ValueError):
+            # ZipFile internals are not as expected - the file is compressed again
+            return False
+        return True
+
+    def write_file(self, path, zip_path, hash=None):
+        '''
+        Compress file into the archive, return its hash.
+
+        If the hash is not known, it is calculated while compressing, reading the file once.
+        '''
+        compress_type, compresslevel = self.compression_policy.compression(path, zip_path)
+        if hash is not None:
+            self.zipfile.write(
+                path, zip_path, compress_type=compress_type, compresslevel=compresslevel)
+            return hash
+        zinfo = zipfile.ZipInfo.from_file(path, zip_path)
+        zinfo.compress_type = compress_type
+        _set_compress_level(zinfo, compresslevel)
+        with self.zipfile.open(zinfo, 'w') as zip_member:
+            return self.hash_cache.calculate_hash(
+                path, zip_path, _CopyingReader(open(path, 'rb'), zip_member))
 
     def add_path(self, path, zip_path):
         if os.path.isdir(path):
@@ -263,32 +607,51 @@ class _ZipCreator:
     def add_string_content(self, zip_path, string):
         bytes = string.encode('utf-8')
         self.zipfile.writestr(zip_path, bytes)
-        self.add_hash(zip_path, securehash.bytes(bytes))
+        self.add_hash(zip_path, securehash.hash_bytes(self.hash_algorithm, bytes))
 
     def create(self, zip_file_name, workspace, timestamp, comment):
         assert workspace.is_valid
-        user_compression_preference = os.environ.get('BEAD_ZIP_COMPRESSION')
-        compression = {
-            'off': zipfile.ZIP_STORED,
-            'stored': zipfile.ZIP_STORED,
-            # these are not universally supported compression methods
-            # 'lzma': zipfile.ZIP_LZMA,
-            # 'bz2': zipfile.ZIP_BZIP2,
-            'deflated': zipfile.ZIP_DEFLATED,
-        }.get(user_compression_preference, zipfile.ZIP_DEFLATED)
+        self.compression_policy = compression.CompressionPolicy.from_environment()
+        self.meta_version = meta_version_from_environment()
+        self.hash_algorithm = meta.HASH_ALGORITHMS[self.meta_version]
+        self.hash_cache = _HashCache(
+            workspace.directory / layouts.Workspace.HASH_CACHE, self.hash_algorithm)
+        if self.previous is not None:
+            self.previous_hashes = self._copyable_hashes(self.previous)
         try:
             with zipfile.ZipFile(
                 zip_file_name,
                 mode='w',
-                compression=compression,
+                compression=self.compression_policy.method,
                 allowZip64=True,
             ) as self.zipfile:
                 self.zipfile.comment = comment.encode('utf-8')
                 self.add_data(workspace)
                 self.add_code(workspace)
                 self.add_meta(workspace, timestamp)
+            self.hash_cache.save()
         finally:
             self.zipfile = None
+            self.hash_cache = None
+
+    @staticmethod
+    def _copyable_hashes(previous):
+        try:
+            ziparchive = previous.ziparchive
+            blobs = ziparchive.blobs
+            manifest = ziparchive.manifest
+        except (
+                InvalidArchive, zipfile.BadZipFile, KeyError, ValueError,
+                OSError, EOFError, zlib.error):
+            # damaged archives can fail in many ways, delta is just an optimisation
+            warnings.warn(
+                f'Previous version {previous.archive_filename} is damaged'
+                ' - compressing all files')
+            return {}
+        return {
+            zip_path: hash
+            for zip_path, hash in manifest.items()
+            if zip_path not in blobs}
 
     def add_code(self, workspace):
         source_directory = workspace.directory
@@ -313,7 +676,7 @@ class _ZipCreator:
 
     def add_meta(self, workspace, timestamp):
         bead_meta = {
-            meta.META_VERSION: META_VERSION,
+            meta.META_VERSION: self.meta_version,
             meta.KIND: workspace.kind,
             meta.FREEZE_TIME: timestamp,
             meta.INPUTS: {
@@ -327,3 +690,5 @@ class _ZipCreator:
         self.add_string_content(layouts.Archive.BEAD_META, persistence.dumps(bead_meta))
         self.add_string_content(layouts.Archive.MANIFEST, persistence.dumps(self.hashes))
         persistence.zip_dump(workspace.input_map, self.zipfile, layouts.Archive.INPUT_MAP)
+        if self.blob_store is not None:
+            persistence.zip_dump(self.blobs, self.zipfile, layouts.Archive.BLOBS)
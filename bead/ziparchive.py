@@ -1,13 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from copy import deepcopy
+import io
+import mmap
 import os
+import posixpath
 import shutil
+import struct
+import threading
+import zlib
+from zipfile import BadZipFile, ZipFile, ZipInfo, ZIP_STORED, ZIP64_LIMIT
 
 from .bead import UnpackableBead
-from .exceptions import InvalidArchive
+from .blobstore import BlobStore, is_valid_hash
+from .exceptions import InvalidArchive, MissingBlobStore
 from . import tech
 from . import layouts
 from . import meta
 from . import zipopener
+from .tech import compression
 
 # technology modules
 timestamp = tech.timestamp
@@ -23,6 +34,48 @@ META_KEYS = (
     meta.INPUTS
 )
 
+# validation scopes: the archive directories, whose files are checked
+# (files outside code and data - the meta files - are always checked)
+SCOPE_CODE = (layouts.Archive.CODE,)
+SCOPE_DATA = (layouts.Archive.DATA,)
+SCOPE_ALL = SCOPE_CODE + SCOPE_DATA
+
+# number of threads hashing archive members in parallel
+# (both decompression and hashing release the GIL)
+VALIDATION_THREADS = os.cpu_count() or 1
+
+# permissions of files extracted read only (before applying umask)
+READONLY_FILE_MODE = 0o444
+_O_BINARY = getattr(os, 'O_BINARY', 0)
+
+
+class _ZipFilePerThread:
+    '''
+    Separate ZipFile handles for threads.
+
+    A ZipFile object is not safe to read concurrently from multiple threads.
+    '''
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._zipfiles = []
+
+    def get(self):
+        try:
+            return self._local.zipfile
+        except AttributeError:
+            zipfile = self._local.zipfile = ZipFile(self.filename)
+            with self._lock:
+                self._zipfiles.append(zipfile)
+            return zipfile
+
+    def close(self):
+        for zipfile in self._zipfiles:
+            zipfile.close()
+        self._zipfiles.clear()
+
 
 class ZipArchive(UnpackableBead):
 
@@ -31,6 +84,8 @@ class ZipArchive(UnpackableBead):
         self.box_name = box_name
         self._meta = self._load_meta()
         self._content_id = None
+        self._blobs = None
+        self._blob_manifest = None
 
     @property
     def zipfile(self):
@@ -39,27 +94,52 @@ class ZipArchive(UnpackableBead):
         except (zipopener.BadZipFile, OSError, IOError):
             raise InvalidArchive(self.archive_filename)
 
-    def validate(self):
+    @contextmanager
+    def _pinned_zipfile(self):
+        '''
+        Keep the zip file open in zipopener until the end of the with block.
+
+        Other threads opening other archives meanwhile can not close it under us.
+        '''
+        try:
+            zipfile = zipopener.pin(self.archive_filename)
+        except (zipopener.BadZipFile, OSError, IOError):
+            raise InvalidArchive(self.archive_filename)
+        try:
+            yield zipfile
+        finally:
+            zipopener.unpin(self.archive_filename)
+
+    def validate(self, scope=SCOPE_ALL):
         '''
         verify, that
         - all files under code, data, meta are present in the manifest
           file and they match their content_id (extra files are allowed
           in the archive, but not as data or code files)
+          - only those code and data files are checked, that are in scope
         - the BEAD_META file is valid
             - has meta version
             - has kind
             - has freeze time
             - has freezed name
             - has inputs (even if empty)
-        '''
-        if not all(self._checks()):
-            raise InvalidArchive
 
-    def _checks(self):
+        Returns the number of (uncompressed) bytes verified.
+        '''
+        with self._pinned_zipfile() as zipfile:
+            manifest = self.manifest
+            if not all(self._checks(manifest, scope)):
+                raise InvalidArchive(self.archive_filename)
+            return sum(
+                self._member_size(zipfile, name)
+                for name in self._manifest_names_in_scope(manifest, scope))
+
+    def _checks(self, manifest, scope):
         yield self._has_well_formed_meta()
         yield self._bead_creation_time_is_in_the_past()
-        yield self._extra_file() is None
-        yield self._file_with_different_content_id() is None
+        yield self._extra_file(manifest, scope) is None
+        yield self._invalid_blob(manifest) is None
+        yield self._file_with_different_content_id(manifest, scope) is None
 
     def _has_well_formed_meta(self):
         meta = self.meta
@@ -76,33 +156,136 @@ class ZipArchive(UnpackableBead):
         #                 2010/04/08/precision-and-accuracy-of-datetime/
         return freeze_time <= now
 
-    def _extra_file(self):
-        data_dir_prefix = layouts.Archive.DATA + '/'
-        code_dir_prefix = layouts.Archive.CODE + '/'
-        manifest = self.manifest
+    def _extra_file(self, manifest, scope):
+        scope_prefixes = tuple(dir + '/' for dir in scope)
         # check that there are no extra files
         for name in self.zipfile.namelist():
-            is_data = name.startswith(data_dir_prefix)
-            is_code = name.startswith(code_dir_prefix)
-            if is_data or is_code:
+            if name.startswith(scope_prefixes):
                 if name not in manifest:
                     # unexpected extra file!
                     return name
 
-    def _file_with_different_content_id(self):
-        for name, hash in self.manifest.items():
+    def _invalid_blob(self, manifest):
+        # blobs are data files in the manifest, that are not stored in the zip
+        names = set(self.zipfile.namelist())
+        for name in self._blob_entries():
+            if not _is_valid_blob_name(name, manifest, names):
+                return name
+
+    def _manifest_names_in_scope(self, manifest, scope):
+        out_of_scope_prefixes = tuple(dir + '/' for dir in SCOPE_ALL if dir not in scope)
+        for name in manifest:
+            if not (out_of_scope_prefixes and name.startswith(out_of_scope_prefixes)):
+                yield name
+
+    def _file_with_different_content_id(self, manifest, scope):
+        zipfile = self.zipfile
+        # (name, size)
+        members = []
+        for name in self._manifest_names_in_scope(manifest, scope):
             try:
-                info = self.zipfile.getinfo(name)
+                members.append((name, self._member_size(zipfile, name)))
             except KeyError:
                 return name
-            archived_hash = securehash.file(self.zipfile.open(info), info.file_size)
-            if hash != archived_hash:
-                return name
+        if VALIDATION_THREADS < 2 or len(members) < 2:
+            for name, _ in members:
+                if not self._member_has_content_id(zipfile, name, manifest[name]):
+                    return name
+            return None
+        return self._file_with_different_content_id_in_parallel(manifest, members)
+
+    def _file_with_different_content_id_in_parallel(self, manifest, members):
+        # biggest first, so that workers finish at about the same time
+        members = sorted(members, key=lambda member: member[1], reverse=True)
+        zipfiles = _ZipFilePerThread(self.archive_filename)
+        stop = threading.Event()
+
+        def check(name):
+            if stop.is_set():
+                return None
+            try:
+                if self._member_has_content_id(zipfiles.get(), name, manifest[name], stop):
+                    return None
+            except _Aborted:
+                return None
+            return name
+
+        try:
+            with ThreadPoolExecutor(max_workers=VALIDATION_THREADS) as executor:
+                futures = [executor.submit(check, name) for name, _ in members]
+                try:
+                    for future in as_completed(futures):
+                        name = future.result()
+                        if name is not None:
+                            return name
+                finally:
+                    # fail fast: pending checks are cancelled, running ones are aborted
+                    stop.set()
+                    for future in futures:
+                        future.cancel()
+        finally:
+            zipfiles.close()
+
+    def _member_size(self, zipfile, name):
+        if name in self.blobs:
+            return self.blobs[name]
+        return zipfile.getinfo(name).file_size
+
+    def _member_has_content_id(self, zipfile, name, content_id, abort=None):
+        '''
+        Verify member name.
+
+        If given, abort is a threading.Event, setting it aborts the verification
+        of zip members with an _Aborted exception.
+        '''
+        algorithm = self.hash_algorithm
+        if name in self.blobs:
+            return self.blob_store.has_content(content_id, self.blobs[name], algorithm)
+        return _has_content_id(zipfile, zipfile.getinfo(name), content_id, algorithm, abort)
 
     @property
     def manifest(self):
         return self.zip_load(layouts.Archive.MANIFEST)
 
+    @property
+    def blobs(self):
+        '''
+        Data files, that are stored in the blob store of the box (zip_path -> size).
+
+        Invalid entries (see validate) are ignored.
+        '''
+        if self._blobs is None:
+            blob_entries = self._blob_entries()
+            if blob_entries:
+                manifest = self.manifest
+                names = set(self.zipfile.namelist())
+                blob_entries = {
+                    name: size
+                    for name, size in blob_entries.items()
+                    if _is_valid_blob_name(name, manifest, names)}
+            self._blobs = blob_entries
+        return self._blobs
+
+    def _blob_entries(self):
+        try:
+            return self.zip_load(layouts.Archive.BLOBS)
+        except KeyError:
+            return {}
+
+    @property
+    def blob_store(self):
+        archive_directory = os.path.dirname(os.path.abspath(self.archive_filename))
+        blob_store = BlobStore(os.path.join(archive_directory, layouts.Box.BLOBS))
+        if not os.path.isdir(blob_store.directory):
+            # e.g. the archive was copied out of its box
+            raise MissingBlobStore(self.archive_filename, blob_store.directory)
+        return blob_store
+
+    def _blob_path(self, zip_path):
+        if self._blob_manifest is None:
+            self._blob_manifest = self.manifest
+        return self.blob_store.path(self._blob_manifest[zip_path])
+
     @property
     def content_id(self):
         if self._content_id is None:
@@ -110,12 +293,20 @@ class ZipArchive(UnpackableBead):
         return self._content_id
 
     def calculate_content_id(self):
-        # there is currently only one meta version
-        # and it must match the one defined in the workspace module
-        assert self._meta[meta.META_VERSION] == 'aaa947a6-1f7a-11e6-ba3a-0021cc73492e'
-        zipinfo = self.zipfile.getinfo(layouts.Archive.MANIFEST)
-        with self.zipfile.open(zipinfo) as f:
-            return securehash.file(f, zipinfo.file_size)
+        with self._pinned_zipfile() as zipfile:
+            zipinfo = zipfile.getinfo(layouts.Archive.MANIFEST)
+            return securehash.hash_file(
+                self.hash_algorithm, zipfile.open(zipinfo), zipinfo.file_size)
+
+    @property
+    def hash_algorithm(self):
+        '''
+        Algorithm of file hashes and the content_id - determined by the meta version.
+        '''
+        try:
+            return meta.HASH_ALGORITHMS[self._meta[meta.META_VERSION]]
+        except KeyError:
+            raise InvalidArchive(self.archive_filename, 'unknown meta version')
 
     @property
     def meta_version(self):
@@ -136,7 +327,8 @@ class ZipArchive(UnpackableBead):
         return deepcopy(self._meta)
 
     def zip_load(self, filename):
-        return persistence.zip_load(self.zipfile, filename)
+        with self._pinned_zipfile() as zipfile:
+            return persistence.zip_load(zipfile, filename)
 
     @property
     def input_map(self):
@@ -156,9 +348,11 @@ class ZipArchive(UnpackableBead):
         except:
             raise InvalidArchive(self.archive_filename)
 
-    def extract_file(self, zip_path, fs_path):
+    def extract_file(self, zip_path, fs_path, readonly=False):
         '''
             Extract zip_path from zipfile to fs_path.
+
+            With readonly=True the file is created read only.
         '''
         fs_path = os.path.normpath(fs_path)
 
@@ -166,32 +360,418 @@ class ZipArchive(UnpackableBead):
         if upperdirs:
             tech.fs.ensure_directory(upperdirs)
 
-        with self.zipfile.open(zip_path) as source:
-            with open(fs_path, 'wb') as target:
+        with self._pinned_zipfile():
+            self._extract_member(zip_path, fs_path, readonly)
+
+    def _extract_member(self, zip_path, fs_path, readonly):
+        is_blob = zip_path in self.blobs
+        # raises KeyError for missing members - before creating the file
+        info = None if is_blob else self.zipfile.getinfo(zip_path)
+        # the mode applies only to the new file, the open descriptor is writable
+        mode = READONLY_FILE_MODE if readonly else 0o666
+        fd = os.open(fs_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | _O_BINARY, mode)
+        with open(fd, 'wb') as target:
+            if is_blob:
+                self._extract_blob(zip_path, target)
+                return
+
+            if _is_stored(info):
+                try:
+                    self._extract_stored(info, target)
+                    return
+                except (AttributeError, OSError):
+                    # no kernel support - fall back to copying through Python
+                    target.seek(0)
+                    target.truncate()
+
+            with self.zipfile.open(info) as source:
                 shutil.copyfileobj(source, target)
 
-    def extract_dir(self, zip_dir, fs_dir):
+    def _extract_stored(self, info, target):
+        '''
+            Copy the bytes of an uncompressed member without passing them through Python.
+        '''
+        with open(self.archive_filename, 'rb') as source:
+            offset = _data_offset(source, info)
+            _copy_range(source.fileno(), offset, target.fileno(), info.file_size)
+
+    def _extract_blob(self, zip_path, target):
+        with open(self._blob_path(zip_path), 'rb') as source:
+            try:
+                _copy_range(source.fileno(), 0, target.fileno(), self.blobs[zip_path])
+                return
+            except (AttributeError, OSError):
+                target.seek(0)
+                target.truncate()
+            source.seek(0)
+            shutil.copyfileobj(source, target)
+
+    def extract_dir(self, zip_dir, fs_dir, accept=None, readonly=False, link_index=None):
         '''
             Extract all files from zipfile under zip_dir to fs_dir.
+
+            If given, only files for which accept(path relative to zip_dir) is true
+            are extracted.
+
+            With readonly=True files are created read only, and fs_dir with its
+            extracted subdirectories are made read only at the end.
+            Read only files are hard linked to identical copies known to link_index
+            (a bead.linkindex.LinkIndex), when possible.
         '''
 
         tech.fs.ensure_directory(fs_dir)
+        with self._pinned_zipfile():
+            self._extract_dir(zip_dir, fs_dir, accept, readonly, link_index)
 
+    def _extract_dir(self, zip_dir, fs_dir, accept, readonly, link_index):
         zip_dir_prefix = zip_dir + '/'
         zip_dir_prefix_len = len(zip_dir_prefix)
 
-        for zip_path in self.zipfile.namelist():
+        # relative paths of existing directories under fs_dir
+        directories = {''}
+        for zip_path in self.zipfile.namelist() + list(self.blobs):
             if not zip_path.startswith(zip_dir_prefix):
                 continue
-            fs_path = fs_dir / zip_path[zip_dir_prefix_len:]
-            self.extract_file(zip_path, fs_path)
+            path = zip_path[zip_dir_prefix_len:]
+            if accept is not None and not accept(path):
+                continue
+            if zip_path.endswith('/'):
+                _make_directories(fs_dir, path.rstrip('/'), directories)
+                continue
+            _make_directories(fs_dir, posixpath.dirname(path), directories)
+            fs_path = os.path.normpath(fs_dir / path)
+            if readonly and link_index is not None:
+                self._link_or_extract_member(zip_path, fs_path, link_index)
+            else:
+                self._extract_member(zip_path, fs_path, readonly)
+
+        if readonly:
+            if link_index is not None:
+                link_index.save(self.content_id)
+            for directory in directories:
+                tech.fs.make_readonly(fs_dir / directory)
+
+    def _link_or_extract_member(self, zip_path, fs_path, link_index):
+        if not link_index.link(self.content_id, zip_path, fs_path):
+            self._extract_member(zip_path, fs_path, readonly=True)
+            link_index.remember(self.content_id, zip_path, fs_path)
+
+    def data_members(self):
+        '''
+            Map data file paths (relative to the data directory) to their sizes.
+        '''
+        data_dir_prefix = layouts.Archive.DATA + '/'
+        sizes = {
+            info.filename: info.file_size
+            for info in self.zipfile.infolist()
+            if not info.is_dir()}
+        sizes.update(self.blobs)
+        return {
+            zip_path[len(data_dir_prefix):]: size
+            for zip_path, size in sizes.items()
+            if zip_path.startswith(data_dir_prefix)}
+
+    def open_data(self, path):
+        '''
+            Open data file at path (relative to the data directory) for reading.
+
+            The returned binary file object is seekable, stored (uncompressed)
+            files are memory mapped, compressed ones are decompressed on the fly,
+            so seeking backwards in them is slow.
+
+            Content is not verified, see validate_data_member.
+            Raises KeyError if there is no such data file.
+        '''
+        zip_path = layouts.Archive.DATA / path
+        if zip_path in self.blobs:
+            return open(self._blob_path(zip_path), 'rb')
+        info = self.zipfile.getinfo(zip_path)
+        if _is_stored(info) and info.file_size:
+            with open(self.archive_filename, 'rb') as f:
+                return _MappedMember(f, _data_offset(f, info), info.file_size)
+        return self.zipfile.open(info)
+
+    def validate_data_member(self, path):
+        '''
+            Verify, that the data file at path matches its hash in the manifest.
+
+            Raises InvalidArchive if it does not.
+        '''
+        zip_path = layouts.Archive.DATA / path
+        manifest = self.manifest
+        try:
+            is_valid = self._member_has_content_id(self.zipfile, zip_path, manifest[zip_path])
+        except KeyError:
+            is_valid = False
+        if not is_valid:
+            raise InvalidArchive(self.archive_filename, zip_path)
+
+    def copy_compressed_member(self, zip_path, target, target_info):
+        '''
+            Add member zip_path to ZipFile target without decompressing/recompressing it.
+
+            target_info (a ZipInfo) gives the name, time and attributes of the new member,
+            the compressed data (with its method, sizes and CRC) is copied from this archive.
+
+            The member is verified first, raises InvalidArchive (adding nothing),
+            if it does not match its hash in the manifest.
+
+            Adding the member goes through private parts of ZipFile,
+            if they are not as expected (AttributeError, TypeError, ValueError),
+            target is left as it was before the call.
+        '''
+        if not self._member_has_content_id(self.zipfile, zip_path, self.manifest[zip_path]):
+            raise InvalidArchive(self.archive_filename, zip_path)
+        info = self.zipfile.getinfo(zip_path)
+        target_info.compress_type = info.compress_type
+        target_info.CRC = info.CRC
+        target_info.compress_size = info.compress_size
+        target_info.file_size = info.file_size
+        zip64 = info.file_size > ZIP64_LIMIT or info.compress_size > ZIP64_LIMIT
+        with open(self.archive_filename, 'rb') as source:
+            offset = _data_offset(source, info)
+            # ZipFile has no public API for adding already compressed data,
+            # this is what ZipFile.write does for directories, plus copying the data
+            with target._lock:
+                if target._writing:
+                    raise ValueError("Can't write to ZipFile with an open writing handle")
+                target._writecheck(target_info)
+                start_dir = target.start_dir
+                try:
+                    target.fp.seek(start_dir)
+                    target_info.header_offset = target.fp.tell()
+                    target.fp.write(target_info.FileHeader(zip64))
+                    _copy_bytes(source, offset, target.fp, info.compress_size)
+                    end_of_member = target.fp.tell()
+                except BaseException:
+                    target.fp.seek(start_dir)
+                    target.fp.truncate()
+                    raise
+                target._didModify = True
+                target.filelist.append(target_info)
+                target.NameToInfo[target_info.filename] = target_info
+                target.start_dir = end_of_member
+
+    def export(self, filename):
+        '''
+            Write a standalone archive to filename, including files from the blob store.
+
+            The exported archive has the same content_id.
+        '''
+        assert not os.path.exists(filename)
+        try:
+            with ZipFile(filename, 'w', allowZip64=True) as target:
+                self._export_to(target)
+        except BaseException:
+            if os.path.exists(filename):
+                os.remove(filename)
+            raise
+
+    def _export_to(self, target):
+        zipfile = self.zipfile
+        target.comment = zipfile.comment
+        for info in zipfile.infolist():
+            if info.filename == layouts.Archive.BLOBS:
+                continue
+            # the source ZipInfo is shared with other users of the zipfile - copy it
+            target_info = ZipInfo(info.filename, info.date_time)
+            target_info.compress_type = info.compress_type
+            target_info.external_attr = info.external_attr
+            target_info.file_size = info.file_size
+            with zipfile.open(info) as source, target.open(target_info, 'w') as dest:
+                shutil.copyfileobj(source, dest)
+        policy = compression.CompressionPolicy.from_environment()
+        for zip_path in sorted(self.blobs):
+            blob_path = self._blob_path(zip_path)
+            compress_type, compresslevel = policy.compression(blob_path, zip_path)
+            target.write(
+                blob_path, zip_path, compress_type=compress_type, compresslevel=compresslevel)
 
     def unpack_code_to(self, fs_dir):
         self.extract_dir(layouts.Archive.CODE, fs_dir)
 
-    def unpack_data_to(self, fs_dir):
-        self.extract_dir(layouts.Archive.DATA, fs_dir)
+    def unpack_data_to(self, fs_dir, accept=None, readonly=False, link_index=None):
+        self.extract_dir(layouts.Archive.DATA, fs_dir, accept, readonly, link_index)
 
     def unpack_meta_to(self, workspace):
         workspace.meta = self.meta
         workspace.input_map = self.input_map
+
+
+class _MappedMember(io.RawIOBase):
+    '''
+    Read-only, seekable file object for a stored zip member, backed by mmap.
+    '''
+
+    def __init__(self, file, offset, size):
+        super().__init__()
+        # mmap offset must be a multiple of ALLOCATIONGRANULARITY
+        map_offset = offset - offset % mmap.ALLOCATIONGRANULARITY
+        self._mmap = mmap.mmap(
+            file.fileno(), offset - map_offset + size,
+            access=mmap.ACCESS_READ, offset=map_offset)
+        self._start = offset - map_offset
+        self._size = size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        start = self._start + self._position
+        count = max(0, min(len(buffer), self._size - self._position))
+        buffer[:count] = self._mmap[start:start + count]
+        self._position += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError(f'negative seek position {offset}')
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._mmap.close()
+        super().close()
+
+
+def _is_stored(info):
+    is_encrypted = info.flag_bits & 0x1
+    return info.compress_type == ZIP_STORED and not is_encrypted
+
+
+# zip local file header: signature, ..., file name length, extra field length
+_LOCAL_HEADER = struct.Struct('<4s22xHH')
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+def _data_offset(file, info):
+    '''
+    Offset of member data in the zip file.
+
+    The local header's extra field can differ from the central directory's,
+    so its length must be read from the local header.
+    '''
+    file.seek(info.header_offset)
+    header = file.read(_LOCAL_HEADER.size)
+    if len(header) != _LOCAL_HEADER.size:
+        raise BadZipFile(f'Truncated local header for {info.filename}')
+    signature, name_length, extra_length = _LOCAL_HEADER.unpack(header)
+    if signature != _LOCAL_HEADER_SIGNATURE:
+        raise BadZipFile(f'Bad local header for {info.filename}')
+    return info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+
+
+def _make_directories(root, directory, existing):
+    '''
+    Ensure, that directory (relative to root) exists, record it and its parents in existing.
+    '''
+    if directory in existing:
+        return
+    _make_directories(root, posixpath.dirname(directory), existing)
+    os.makedirs(root / directory, exist_ok=True)
+    existing.add(directory)
+
+
+def _copy_bytes(source, offset, target, count):
+    source.seek(offset)
+    while count:
+        block = source.read(min(count, securehash.READ_BLOCK_SIZE))
+        if not block:
+            raise BadZipFile('Unexpected end of zip file')
+        target.write(block)
+        count -= len(block)
+
+
+def _copy_range(src_fd, offset, dst_fd, count):
+    '''
+    Copy count bytes from src_fd at offset to dst_fd (at its current position).
+
+    Copying is done by the kernel: copy_file_range can even share the data blocks
+    (reflink) on file systems supporting it, sendfile at least avoids copying
+    through user space.
+
+    Raises AttributeError or OSError, if neither is supported.
+    '''
+    try:
+        _copy_range_with(_copy_file_range_chunk, src_fd, offset, dst_fd, count)
+    except (AttributeError, OSError):
+        os.lseek(dst_fd, 0, os.SEEK_SET)
+        os.ftruncate(dst_fd, 0)
+        _copy_range_with(_sendfile_chunk, src_fd, offset, dst_fd, count)
+
+
+def _copy_range_with(copy_chunk, src_fd, offset, dst_fd, count):
+    copied = 0
+    while copied < count:
+        chunk_size = copy_chunk(src_fd, offset + copied, dst_fd, count - copied)
+        if chunk_size == 0:
+            raise BadZipFile('Unexpected end of zip file')
+        copied += chunk_size
+
+
+def _copy_file_range_chunk(src_fd, offset, dst_fd, count):
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+
+def _sendfile_chunk(src_fd, offset, dst_fd, count):
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def _is_valid_blob_name(name, manifest, zip_names):
+    return (
+        name.startswith(layouts.Archive.DATA + '/')
+        and name in manifest
+        and name not in zip_names
+        and is_valid_hash(manifest[name]))
+
+
+def _has_content_id(zipfile, info, content_id, algorithm, abort=None):
+    try:
+        member = zipfile.open(info)
+        if abort is not None:
+            member = _AbortableReader(member, abort)
+        return securehash.hash_file(algorithm, member, info.file_size) == content_id
+    except (BadZipFile, zlib.error, EOFError, OSError):
+        # e.g. CRC error, corrupted or truncated compressed data
+        return False
+
+
+class _Aborted(Exception):
+    pass
+
+
+class _AbortableReader(io.RawIOBase):
+    '''
+    Read-only file object reading source, until abort (a threading.Event) is set.
+
+    Reading after abort is set raises _Aborted.
+    '''
+
+    def __init__(self, source, abort):
+        super().__init__()
+        self.source = source
+        self.abort = abort
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.abort.is_set():
+            raise _Aborted()
+        return self.source.readinto(buffer)
+
+    def close(self):
+        self.source.close()
+        super().close()
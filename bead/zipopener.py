@@ -5,17 +5,21 @@ This does not mean reading any file or even looping over the zip directory.
 
 For this reason this module provides a small LRU cache of open (for reading) zip files.
 
+Zip files in use by other threads can be pinned, so that they are not closed
+while in use - the cache can grow above its size limit meanwhile.
+
 Actually having this module made the tests (which use only small files)
 run ~4% faster (5.14 -> 4.94 = 0.2s faster).
 """
 
 import atexit
+import threading
 from typing import Dict, Tuple
 from zipfile import BadZipFile, ZipFile
 
 from tracelog import TRACELOG
 
-__all__ = ('BadZipFile', 'open', 'close_all')
+__all__ = ('BadZipFile', 'open', 'pin', 'unpin', 'close_all')
 
 FileName = str
 LogicalTime = int
@@ -27,22 +31,59 @@ class OpenZipLRUCache:
         self.open_zip_files: Dict[FileName, ZipFile] = {}
         self.access_times: Dict[FileName, LogicalTime] = {}
         self.access_count: LogicalTime = 0
+        self.pin_counts: Dict[FileName, int] = {}
+        # beads can be loaded from multiple threads
+        self.lock = threading.RLock()
 
     def open(self, filename):
-        if filename not in self.open_zip_files:
-            if len(self.open_zip_files) == self.max_size:
-                self.close(self.least_recently_used_filename)
-            self.open_zip_files[filename] = ZipFile(filename)
-
-        self.access(filename)
-        return self.open_zip_files[filename]
+        with self.lock:
+            if filename not in self.open_zip_files:
+                self.close_unpinned_above(self.max_size - 1)
+                self.open_zip_files[filename] = ZipFile(filename)
+
+            self.access(filename)
+            return self.open_zip_files[filename]
+
+    def pin(self, filename):
+        '''
+        Open filename and keep it open until a matching unpin.
+        '''
+        with self.lock:
+            zipfile = self.open(filename)
+            self.pin_counts[filename] = self.pin_counts.get(filename, 0) + 1
+            return zipfile
+
+    def unpin(self, filename):
+        with self.lock:
+            self.pin_counts[filename] -= 1
+            if not self.pin_counts[filename]:
+                del self.pin_counts[filename]
+            self.close_unpinned_above(self.max_size)
+
+    def close_unpinned_above(self, size):
+        with self.lock:
+            while len(self.open_zip_files) > size:
+                filename = self.least_recently_used_filename
+                if filename is None:
+                    # all are pinned
+                    return
+                self.close(filename)
 
     @property
     def least_recently_used_filename(self):
+        '''
+        Least recently used, not pinned zip file - or None, if there is no such file.
+        '''
         def access_time(filename_access_time: Tuple[FileName, LogicalTime]):
             _, access_time = filename_access_time
             return access_time
-        least_recently_used_filename, _ = sorted(self.access_times.items(), key=access_time)[0]
+        unpinned = [
+            filename_access_time
+            for filename_access_time in self.access_times.items()
+            if filename_access_time[0] not in self.pin_counts]
+        if not unpinned:
+            return None
+        least_recently_used_filename, _ = min(unpinned, key=access_time)
         TRACELOG(
             f'{least_recently_used_filename}: {self.access_times[least_recently_used_filename]}')
         return least_recently_used_filename
@@ -54,18 +95,22 @@ class OpenZipLRUCache:
 
     def close(self, filename):
         TRACELOG(f'{filename}')
-        self.open_zip_files[filename].close()
-        del self.open_zip_files[filename]
-        del self.access_times[filename]
+        with self.lock:
+            self.open_zip_files[filename].close()
+            del self.open_zip_files[filename]
+            del self.access_times[filename]
 
     def close_all(self):
-        for filename in list(self.open_zip_files.keys()):
-            self.close(filename)
+        with self.lock:
+            for filename in list(self.open_zip_files.keys()):
+                self.close(filename)
 
 
 _cache = OpenZipLRUCache()
 
 open = _cache.open
+pin = _cache.pin
+unpin = _cache.unpin
 close_all = _cache.close_all
 
 
@@ -8,3 +8,9 @@ INPUT_NICK = (
     'name of input,'
     + ' its workspace relative location is "input/%(metavar)s"')
 BOX = 'Name of box to store bead'
+INPUT_INCLUDE = (
+    'load only data files matching glob %(metavar)s (relative to the data directory),'
+    + ' can be repeated, remembered for later loads/updates of the input')
+INPUT_EXCLUDE = (
+    'do not load data files matching glob %(metavar)s,'
+    + ' can be repeated, remembered for later loads/updates of the input')
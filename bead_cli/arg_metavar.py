@@ -3,3 +3,4 @@ WORKSPACE  = 'DIRECTORY'
 BEAD_REF   = 'BEAD-REF'
 INPUT_NICK = 'INPUT-NAME'
 BOX = 'BOX-NAME'
+PATTERN = 'PATTERN'
@@ -1,11 +1,30 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
 import os
+import struct
+import time
+import zlib
 
 from bead import tech
-from bead.archive import Archive
+from bead import ziparchive
+from bead.archive import Archive, InvalidArchive, SCOPE_ALL
+from bead.box import Box
+from bead.exceptions import InvalidEnvironment
 from .cmdparse import Command
-from .common import OPTIONAL_ENV, die
+from .common import (
+    BEAD_REF_BASE, BEAD_TIME, OPTIONAL_ENV, die, format_throughput, resolve_bead)
 from .web import rewire
 
+# box verification report fields
+REPORT_PATH = 'path'
+REPORT_CONTENT_ID = 'content_id'
+REPORT_STATUS = 'status'
+REPORT_BYTES = 'bytes'
+REPORT_SECONDS = 'seconds'
+
+STATUS_OK = 'ok'
+STATUS_DAMAGED = 'damaged'
+
 
 class CmdAdd(Command):
     '''
@@ -15,6 +34,9 @@ class CmdAdd(Command):
     def declare(self, arg):
         arg('name')
         arg('directory')
+        arg('--content-addressed', dest='content_addressed', default=False,
+            action='store_true',
+            help='Store data files of new beads only once, shared by all beads in the box')
         arg(OPTIONAL_ENV)
 
     def run(self, args):
@@ -32,6 +54,9 @@ class CmdAdd(Command):
             env.add_box(name, location)
             env.save()
             print(f'Will remember box {name}')
+            if args.content_addressed:
+                Box(name, location).make_content_addressed()
+                print(f'New beads in box {name} will share their data files')
         except ValueError as e:
             print('ERROR:', *e.args)
             print('Check the parameters: both name and directory must be unique!')
@@ -93,6 +118,33 @@ class CmdXmeta(Command):
         print(f'Saved {archive.cache_path}')
 
 
+class CmdExport(Command):
+    '''
+    Write a bead as a standalone zip archive.
+
+    Beads in content addressed boxes depend on the data files stored in the box,
+    the exported archive contains them as well.
+    '''
+    def declare(self, arg):
+        arg(BEAD_REF_BASE)
+        arg(BEAD_TIME)
+        arg('zip_archive_filename')
+        arg(OPTIONAL_ENV)
+
+    def run(self, args):
+        try:
+            bead = resolve_bead(args.get_env(), args.bead_ref_base, args.bead_time)
+        except LookupError:
+            die('Bead not found!')
+        if os.path.exists(args.zip_archive_filename):
+            die(f'File {args.zip_archive_filename} already exists')
+        try:
+            bead.export(args.zip_archive_filename)
+        except InvalidEnvironment as e:
+            die(str(e))
+        print(f'Exported {bead.archive_filename} to {args.zip_archive_filename}')
+
+
 class CmdRewire(Command):
     '''
     Remap inputs.
@@ -116,3 +168,136 @@ class CmdRewire(Command):
         # is not exported/cached with xmeta
         for bead in box.all_beads():
             rewire.apply(bead, rewire_specs)
+
+
+class CmdVerify(Command):
+    '''
+    Verify the integrity of all beads in a box.
+
+    Archives are verified in parallel, biggest first.
+    Results are appended to the report file (one JSON object per line),
+    archives already in the report are skipped, so an interrupted verification
+    can be continued by rerunning the command with the same report.
+    '''
+
+    def declare(self, arg):
+        arg('name')
+        arg('--report', metavar='FILE', default=None,
+            help='JSON lines report, also used to resume an interrupted verification')
+        arg('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+            help='number of archives verified in parallel')
+        arg(OPTIONAL_ENV)
+
+    def run(self, args):
+        env = args.get_env()
+        box = env.get_box(args.name)
+        if box is None:
+            die(f'Unknown box {args.name}')
+
+        reported = _read_report(args.report) if args.report else set()
+        paths, skipped = _archives_to_verify(box, reported)
+        if skipped:
+            print(f'Skipping {skipped} archives already in the report')
+
+        verification_cache = env.get_verification_cache()
+        results = []
+        start = time.perf_counter()
+        try:
+            for result in _verify_archives(paths, args.jobs):
+                results.append(result)
+                _print_result(result)
+                if args.report:
+                    _append_to_report(args.report, result)
+                if result[REPORT_STATUS] == STATUS_OK:
+                    verification_cache.remember(
+                        Archive(result[REPORT_PATH], box.name), SCOPE_ALL, save=False)
+        finally:
+            # do not grow forever
+            verification_cache.forget_missing_archives()
+            verification_cache.save()
+        elapsed = time.perf_counter() - start
+
+        damaged = [r for r in results if r[REPORT_STATUS] != STATUS_OK]
+        total_bytes = sum(r[REPORT_BYTES] for r in results)
+        print(
+            f'Verified {len(results)} archives,'
+            f' {len(damaged)} damaged ({format_throughput(total_bytes, elapsed)})')
+        if damaged:
+            die(f'{len(damaged)} damaged archive(s) in box {box.name}')
+
+
+def _archives_to_verify(box, reported):
+    '''
+    Return paths of archives in box not in reported (biggest first) and the number skipped.
+
+    Archives are opened only by _verify_archive, so that all problems are reported.
+    '''
+    sizes = {}
+    skipped = 0
+    for path in box.archive_filenames():
+        if os.path.abspath(path) in reported:
+            skipped += 1
+            continue
+        try:
+            sizes[path] = os.path.getsize(path)
+        except FileNotFoundError:
+            # removed meanwhile
+            pass
+    return sorted(sizes, key=sizes.get, reverse=True), skipped
+
+
+def _verify_archives(paths, jobs):
+    if jobs < 2 or len(paths) < 2:
+        yield from map(_verify_archive, paths)
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_verifier) as executor:
+        futures = [executor.submit(_verify_archive, path) for path in paths]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _init_verifier():
+    # parallelism comes from the processes
+    ziparchive.VALIDATION_THREADS = 1
+
+
+def _verify_archive(path):
+    start = time.perf_counter()
+    result = {
+        REPORT_PATH: os.path.abspath(path),
+        REPORT_CONTENT_ID: None,
+        REPORT_STATUS: STATUS_DAMAGED,
+        REPORT_BYTES: 0,
+    }
+    try:
+        archive = Archive(path)
+        result[REPORT_CONTENT_ID] = archive.content_id
+        result[REPORT_BYTES] = archive.validate(SCOPE_ALL)
+        result[REPORT_STATUS] = STATUS_OK
+    except (InvalidArchive, ziparchive.BadZipFile, OSError, EOFError, struct.error, zlib.error):
+        # damaged archives can fail in many ways, they are all reported as damaged
+        pass
+    result[REPORT_SECONDS] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def _print_result(result):
+    status = 'OK' if result[REPORT_STATUS] == STATUS_OK else 'DAMAGED!'
+    print(f'{result[REPORT_PATH]}: {status}', flush=True)
+
+
+def _read_report(report):
+    try:
+        with open(report) as f:
+            return {json.loads(line)[REPORT_PATH] for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def _append_to_report(report, result):
+    with open(report, 'a') as f:
+        f.write(json.dumps(result, sort_keys=True) + '\n')
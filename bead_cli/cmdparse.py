@@ -12,6 +12,7 @@ For single command scripts, be more minimalist and just use argparse directly.
 
 
 import argparse
+import importlib
 import pipes
 
 
@@ -58,6 +59,47 @@ class Command:
         raise NotImplementedError
 
 
+class _LazyArgumentParser(argparse.ArgumentParser):
+    '''
+    An `argparse.ArgumentParser`, that can delay declaring its arguments until needed.
+
+    Declaring a command needs the command implementation imported, which can be
+    expensive, while usually only one command is used.
+    '''
+
+    _declare_arguments = None
+
+    def declare_lazily(self, declare_arguments):
+        self._declare_arguments = declare_arguments
+
+    def _ensure_declared(self):
+        declare_arguments, self._declare_arguments = self._declare_arguments, None
+        if declare_arguments is not None:
+            declare_arguments()
+
+    def parse_known_args(self, *args, **kwargs):
+        self._ensure_declared()
+        return super().parse_known_args(*args, **kwargs)
+
+    def format_usage(self):
+        self._ensure_declared()
+        return super().format_usage()
+
+    def format_help(self):
+        self._ensure_declared()
+        return super().format_help()
+
+
+def _import_command(dotted_path):
+    '''
+    Import and return the command class defined by `dotted_path`.
+
+    E.g. 'package.module.CommandClass'
+    '''
+    module_name, _, class_name = dotted_path.rpartition('.')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
 class Parser:
     '''
     Wrapper for `argparse.ArgumentParser` with conveniences for multi-command
@@ -94,7 +136,8 @@ class Parser:
     @property
     def _subparsers(self):
         if self.__subparsers is None:
-            self.__subparsers = self.argparser.add_subparsers()
+            self.__subparsers = self.argparser.add_subparsers(
+                parser_class=_LazyArgumentParser)
         return self.__subparsers
 
     def _make_command(self, commandish):
@@ -141,14 +184,22 @@ class Parser:
         Its name will be `name` and its arguments are defined by `commandish`
         Its help line will be `title`, while its help will be generated from
         its arguments.
+
+        `commandish` can also be the dotted path of a `Command` class
+        (e.g. 'package.module.CmdName'), in which case its module is imported
+        only when the command is used.
         '''
+        parser = self._subparsers.add_parser(name, help=title)
+        if isinstance(commandish, str):
+            parser.declare_lazily(
+                lambda: self._declare_command(parser, _import_command(commandish)))
+        else:
+            self._declare_command(parser, commandish)
+
+    def _declare_command(self, parser, commandish):
         command = self._make_command(commandish)
-        parser = self._subparsers.add_parser(
-            name,
-            help=title,
-            description=command.description,
-            formatter_class=command.FORMATTER_CLASS
-        )
+        parser.description = command.description
+        parser.formatter_class = command.FORMATTER_CLASS
         command.declare(self.__class__(parser, self.defaults).arg)
         parser.set_defaults(_cmdparse__run=command.run)
 
@@ -1,16 +1,18 @@
 import os
 import sys
+import time
 
-from bead.exceptions import InvalidArchive
+from bead.exceptions import InvalidArchive, MissingBlobStore
 from bead.workspace import Workspace
 from bead import spec as bead_spec
-from bead.archive import Archive
+from bead.archive import Archive, SCOPE_ALL
 from bead import box as bead_box
 from bead.tech.fs import Path
 from bead.tech.timestamp import time_from_user, parse_iso8601
 from . import arg_help
 from . import arg_metavar
 from .environment import Environment
+from .verification import VerificationCache
 
 
 TIME_LATEST = parse_iso8601('9999-12-31')
@@ -34,13 +36,38 @@ def warning(msg):
 def OPTIONAL_WORKSPACE(parser):
     '''
     Define `workspace` as option, defaulting to current directory
+
+    Use `resolve_workspace` to get the workspace.
     '''
     parser.arg(
         '--workspace', '-w', metavar=arg_metavar.WORKSPACE,
-        type=Workspace, default=Workspace.for_current_working_directory(),
+        type=Workspace, default=CURRENT_WORKSPACE,
         help=arg_help.WORKSPACE)
 
 
+# cwd -> valid workspace containing it
+_current_workspaces = {}
+
+
+def resolve_workspace(workspace) -> Workspace:
+    '''
+    Replace the CURRENT_WORKSPACE default with the workspace of the current directory.
+
+    The workspace is searched for only when needed (walking up the directory tree
+    is expensive on network file systems) and at most once per directory.
+    '''
+    if workspace is not CURRENT_WORKSPACE:
+        return workspace
+    cwd = os.getcwd()
+    try:
+        return _current_workspaces[cwd]
+    except KeyError:
+        workspace = Workspace.for_current_working_directory()
+        if workspace.is_valid:
+            _current_workspaces[cwd] = workspace
+        return workspace
+
+
 def assert_valid_workspace(workspace):
     if not workspace.is_valid:
         die(f'{workspace.directory} is not a valid workspace')
@@ -98,6 +125,9 @@ class DefaultArgSentinel:
         return self.description
 
 
+CURRENT_WORKSPACE = DefaultArgSentinel('workspace of the current directory')
+
+
 def BEAD_TIME(parser):
     parser.arg('-t', '--time', dest='bead_time', type=time_from_user, default=TIME_LATEST)
 
@@ -136,11 +166,35 @@ def resolve_bead(env, bead_ref_base, time):
     return unionbox.get_at(bead_spec.BEAD_NAME, bead_ref_base, time)
 
 
-def verify_with_feedback(archive: Archive):
+def REVERIFY(parser):
+    parser.arg(
+        '--reverify', dest='reverify', default=False, action='store_true',
+        help='verify archives, even if they were successfully verified before')
+
+
+def get_verification_cache(args) -> VerificationCache:
+    return args.get_env().get_verification_cache(reverify=args.reverify)
+
+
+def format_throughput(byte_count, seconds):
+    megabytes = byte_count / 1024 ** 2
+    return f'{megabytes:.1f} MB in {seconds:.2f}s, {megabytes / max(seconds, 1e-6):.1f} MB/s'
+
+
+def verify_with_feedback(
+        archive: Archive, verification_cache: VerificationCache, scope=SCOPE_ALL):
     print(f'Verifying archive {archive.archive_filename} ...', end='', flush=True)
+    if verification_cache.is_verified(archive, scope):
+        print(' OK (verified before)', flush=True)
+        return
+    start = time.perf_counter()
     try:
-        archive.validate()
-        print(' OK', flush=True)
-    except InvalidArchive:
+        bytes_verified = archive.validate(scope)
+        elapsed = time.perf_counter() - start
+        print(f' OK ({format_throughput(bytes_verified, elapsed)})', flush=True)
+    except InvalidArchive as e:
         print(' DAMAGED!', flush=True)
+        if isinstance(e, MissingBlobStore):
+            warning(str(e))
         raise
+    verification_cache.remember(archive, scope)
@@ -3,13 +3,20 @@ User specific environment
 '''
 
 from bead.box import Box
+from bead.linkindex import LinkIndex
 from bead.tech import persistence
 import os
 
+from .verification import VerificationCache
+
 ENV_BOXES = 'boxes'
 BOX_NAME = 'name'
 BOX_LOCATION = 'directory'
 
+# Opt-in: identical input files of all workspaces are hard links to a single copy.
+# WARNING: a shared copy made writable and modified changes the input in all workspaces!
+HARDLINK_INPUTS = 'BEAD_HARDLINK_INPUTS'
+
 
 class Environment:
     """
@@ -79,3 +86,16 @@ class Environment:
 
     def is_known_box(self, name):
         return self.get_box(name) is not None
+
+    def get_verification_cache(self, reverify=False):
+        directory = os.path.dirname(self.filename)
+        return VerificationCache(os.path.join(directory, 'verified.json'), reverify)
+
+    def get_link_index(self, environ=os.environ):
+        '''
+        Return the LinkIndex of extracted input files, or None if hard linking is not enabled.
+        '''
+        if environ.get(HARDLINK_INPUTS, '').lower() not in ('1', 'yes', 'true', 'on'):
+            return None
+        directory = os.path.dirname(self.filename)
+        return LinkIndex(os.path.join(directory, 'extracted'))
@@ -1,5 +1,8 @@
-from bead.exceptions import InvalidArchive
+from bead.exceptions import InvalidArchive, MissingBlobStore
+from bead.archive import SCOPE_DATA
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os.path
+import time
 
 from .cmdparse import Command
 
@@ -7,15 +10,15 @@ from . import arg_metavar
 from . import arg_help
 from .common import (
     OPTIONAL_WORKSPACE, OPTIONAL_ENV,
-    DefaultArgSentinel, assert_valid_workspace,
-    verify_with_feedback,
-    die, warning
+    DefaultArgSentinel, assert_valid_workspace, resolve_workspace,
+    REVERIFY, get_verification_cache, verify_with_feedback,
+    format_throughput, die, warning
 )
 from .common import BEAD_REF_BASE_defaulting_to, BEAD_OFFSET, BEAD_TIME, resolve_bead, TIME_LATEST
 from bead.box import UnionBox
 from bead.meta import BeadName
 import bead.spec as bead_spec
-from bead.workspace import Workspace
+from bead.workspace import Workspace, path_filter
 
 # input_nick
 ALL_INPUTS = DefaultArgSentinel('all inputs')
@@ -39,6 +42,31 @@ def INPUT_NICK(parser):
         metavar=arg_metavar.INPUT_NICK, help=arg_help.INPUT_NICK)
 
 
+def INPUT_FILTER(parser):
+    '''
+    Declare `include` and `exclude` glob pattern options
+    '''
+    parser.arg(
+        '--include', action='append', default=None,
+        metavar=arg_metavar.PATTERN, help=arg_help.INPUT_INCLUDE)
+    parser.arg(
+        '--exclude', action='append', default=None,
+        metavar=arg_metavar.PATTERN, help=arg_help.INPUT_EXCLUDE)
+
+
+def has_input_filter(args):
+    return args.include is not None or args.exclude is not None
+
+
+def JOBS(parser):
+    '''
+    Declare `jobs` option for loading inputs in parallel
+    '''
+    parser.arg(
+        '-j', '--jobs', type=int, default=1, metavar='N',
+        help='verify and load (all) inputs in parallel using %(metavar)s workers')
+
+
 # bead_ref
 SAME_BEAD_NEWEST_VERSION = DefaultArgSentinel('same bead, newest version')
 USE_INPUT_NICK = DefaultArgSentinel(f'use {arg_metavar.INPUT_NICK}')
@@ -53,13 +81,15 @@ class CmdAdd(Command):
         arg(INPUT_NICK)
         arg(BEAD_REF_BASE_defaulting_to(USE_INPUT_NICK))
         arg(BEAD_TIME)
+        arg(INPUT_FILTER)
         arg(OPTIONAL_WORKSPACE)
+        arg(REVERIFY)
         arg(OPTIONAL_ENV)
 
     def run(self, args):
         input_nick = args.input_nick
         bead_ref_base = args.bead_ref_base
-        workspace = get_workspace(args)
+        workspace = get_loading_workspace(args)
         env = args.get_env()
 
         if os.path.dirname(input_nick):
@@ -73,7 +103,9 @@ class CmdAdd(Command):
         except LookupError:
             die(f'Not a known bead name: {bead_ref_base}')
 
-        _check_load_with_feedback(workspace, args.input_nick, bead)
+        _check_load_with_feedback(
+            workspace, args.input_nick, bead, get_verification_cache(args),
+            args.include, args.exclude)
 
 
 class CmdMap(Command):
@@ -130,11 +162,16 @@ class CmdUpdate(Command):
         arg(BEAD_REF_BASE_defaulting_to(SAME_BEAD_NEWEST_VERSION))
         arg(BEAD_TIME)
         arg(BEAD_OFFSET)
+        arg(INPUT_FILTER)
+        arg(JOBS)
         arg(OPTIONAL_WORKSPACE)
+        arg(REVERIFY)
         arg(OPTIONAL_ENV)
 
     def run(self, args):
         if args.input_nick is ALL_INPUTS:
+            if has_input_filter(args):
+                die('--include/--exclude can be specified only for a single input')
             self.update_all_inputs(args)
         else:
             self.update_one_input(args)
@@ -142,16 +179,17 @@ class CmdUpdate(Command):
     def update_all_inputs(self, args):
         assert args.bead_ref_base is SAME_BEAD_NEWEST_VERSION
         assert not args.bead_offset, "--next, --prev can not be specified when updating all inputs"
-        workspace = get_workspace(args)
+        workspace = get_loading_workspace(args)
         env = args.get_env()
-        unionbox = UnionBox(env.get_boxes())
-        for input in workspace.inputs:
-            bead_name = workspace.get_input_bead_name(input.name)
+        loader = _make_loader(workspace, get_verification_cache(args), args.jobs)
+        inputs = workspace.inputs
+        bead_names = {input.name: workspace.get_input_bead_name(input.name) for input in inputs}
+        contexts = UnionBox(env.get_boxes()).get_contexts(
+            (bead_name, args.bead_time) for bead_name in bead_names.values())
+        for input in inputs:
+            bead_name = bead_names[input.name]
             try:
-                bead = unionbox.get_at(
-                    check_type=bead_spec.BEAD_NAME,
-                    check_param=bead_name,
-                    time=args.bead_time)
+                bead = contexts[(bead_name, args.bead_time)].best
             except LookupError:
                 if workspace.is_loaded(input.name):
                     print(
@@ -160,13 +198,14 @@ class CmdUpdate(Command):
                 else:
                     warning(f'Could not find bead for "{input.name}" with name "{bead_name}"')
             else:
-                _update_input(workspace, input, bead)
+                _update_input(workspace, input, bead, loader)
+        loader.finish()
         print('All inputs are up to date.')
 
     def update_one_input(self, args):
         input_nick = args.input_nick
         bead_ref_base = args.bead_ref_base
-        workspace = get_workspace(args)
+        workspace = get_loading_workspace(args)
         env = args.get_env()
         input = workspace.get_input(input_nick)
         if input is None:
@@ -200,13 +239,19 @@ class CmdUpdate(Command):
             assert args.bead_offset == 0
             bead = resolve_bead(env, bead_ref_base, args.bead_time)
         if bead:
-            _update_input(workspace, input, bead)
+            loader = _SerialLoader(workspace, get_verification_cache(args))
+            _update_input(workspace, input, bead, loader, args.include, args.exclude)
         else:
             die('Can not find matching bead')
 
 
-def _update_input(workspace, input, bead):
-    if workspace.is_loaded(input.name) and input.content_id == bead.content_id:
+def _update_input(workspace, input, bead, loader, include=None, exclude=None):
+    is_filter_changed = include is not None or exclude is not None
+    if (
+        workspace.is_loaded(input.name)
+        and input.content_id == bead.content_id
+        and not is_filter_changed
+    ):
         assert input.kind == bead.kind
         assert input.freeze_time == bead.freeze_time
         print(
@@ -215,7 +260,7 @@ def _update_input(workspace, input, bead):
     else:
         if input.kind != bead.kind:
             warning(f'Updating input "{input.name}" with a bead of different kind')
-        _check_load_with_feedback(workspace, input.name, bead)
+        loader.load(input.name, bead, include, exclude)
 
 
 class CmdLoad(Command):
@@ -225,29 +270,41 @@ class CmdLoad(Command):
 
     def declare(self, arg):
         arg(OPTIONAL_INPUT_NICK)
+        arg(INPUT_FILTER)
+        arg(JOBS)
         arg(OPTIONAL_WORKSPACE)
+        arg(REVERIFY)
         arg(OPTIONAL_ENV)
 
     def run(self, args):
         input_nick = args.input_nick
-        workspace = get_workspace(args)
+        workspace = get_loading_workspace(args)
         env = args.get_env()
+        verification_cache = get_verification_cache(args)
         if input_nick is ALL_INPUTS:
+            if has_input_filter(args):
+                die('--include/--exclude can be specified only for a single input')
             inputs = workspace.inputs
             if inputs:
+                loader = _make_loader(workspace, verification_cache, args.jobs)
                 for input in inputs:
-                    _load(env, workspace, input)
+                    _load(env, workspace, input, loader)
+                loader.finish()
             else:
                 warning('No inputs defined to load.')
         else:
             if not workspace.has_input(input_nick):
                 die(f'No input with name {input_nick}')
-            _load(env, workspace, workspace.get_input(input_nick))
+            _load(
+                env, workspace, workspace.get_input(input_nick),
+                _SerialLoader(workspace, verification_cache),
+                args.include, args.exclude)
 
 
-def _load(env, workspace, input):
+def _load(env, workspace, input, loader, include=None, exclude=None):
     assert input is not None
-    if not workspace.is_loaded(input.name):
+    is_filter_changed = include is not None or exclude is not None
+    if is_filter_changed or not workspace.is_loaded(input.name):
         name = workspace.get_input_bead_name(input.name)
         content_id = input.content_id
         bead = None
@@ -259,23 +316,123 @@ def _load(env, workspace, input):
             warning(
                 f'Could not find archive named "{name}" for input "{input.name}" - not loaded!')
             return
-        _check_load_with_feedback(workspace, input.name, bead)
+        loader.load(input.name, bead, include, exclude)
     else:
         print(f'"{input.name}" is already loaded - skipping')
 
 
-def _check_load_with_feedback(workspace: Workspace, input_nick, bead):
+def _make_loader(workspace, verification_cache, jobs):
+    if jobs > 1:
+        return _ConcurrentLoader(workspace, verification_cache, jobs)
+    return _SerialLoader(workspace, verification_cache)
+
+
+class _SerialLoader:
+    '''
+    Verify and load inputs one by one, as they are requested.
+    '''
+
+    def __init__(self, workspace, verification_cache):
+        self.workspace = workspace
+        self.verification_cache = verification_cache
+
+    def load(self, input_nick, bead, include=None, exclude=None):
+        _check_load_with_feedback(
+            self.workspace, input_nick, bead, self.verification_cache, include, exclude)
+
+    def finish(self):
+        pass
+
+
+class _ConcurrentLoader:
+    '''
+    Collect inputs to load, then verify and extract them in parallel at finish.
+
+    The workspace meta is updated only from the calling thread,
+    workers write only under their own input directories.
+    '''
+
+    def __init__(self, workspace, verification_cache, jobs):
+        self.workspace = workspace
+        self.verification_cache = verification_cache
+        self.jobs = jobs
+        self.loads = []
+
+    def load(self, input_nick, bead, include=None, exclude=None):
+        assert include is None and exclude is None
+        self.loads.append((input_nick, bead))
+
+    def finish(self):
+        if not self.loads:
+            return
+        workspace = self.workspace
+        total = len(self.loads)
+        print(f'Loading {total} inputs using {min(self.jobs, total)} workers ...', flush=True)
+        start = time.perf_counter()
+        total_bytes = 0
+        loaded = 0
+        with workspace.input_directory_writable():
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                futures = {}
+                for input_nick, bead in self.loads:
+                    is_verified = self.verification_cache.is_verified(bead, SCOPE_DATA)
+                    accept = None
+                    if workspace.has_input(input_nick):
+                        accept = path_filter(*workspace.get_input_filter(input_nick))
+                    future = executor.submit(
+                        _verify_and_extract, workspace, input_nick, bead, is_verified, accept)
+                    futures[future] = input_nick, bead, is_verified
+                try:
+                    for done, future in enumerate(as_completed(futures), 1):
+                        input_nick, bead, is_verified = futures[future]
+                        try:
+                            total_bytes += future.result()
+                        except InvalidArchive as e:
+                            print(f'[{done}/{total}] {input_nick}: DAMAGED!', flush=True)
+                            if isinstance(e, MissingBlobStore):
+                                warning(str(e))
+                            warning(f'Bead for {input_nick} is found but damaged - not loading.')
+                            continue
+                        if not is_verified:
+                            # saved once, when all inputs are done
+                            self.verification_cache.remember(bead, SCOPE_DATA, save=False)
+                        with workspace.transaction():
+                            workspace.set_input_bead_name(input_nick, bead.name)
+                            workspace.add_input(
+                                input_nick, bead.kind, bead.content_id, bead.freeze_time_str)
+                        loaded += 1
+                        print(f'[{done}/{total}] {input_nick}: loaded', flush=True)
+                finally:
+                    self.verification_cache.save()
+        workspace.wait_for_background_removals()
+        elapsed = time.perf_counter() - start
+        print(
+            f'Loaded {loaded} of {total} inputs'
+            f' (verified {format_throughput(total_bytes, elapsed)})')
+
+
+def _verify_and_extract(workspace, input_nick, bead, is_verified, accept):
+    bytes_verified = 0 if is_verified else bead.validate(SCOPE_DATA)
+    workspace.extract_input(input_nick, bead, accept)
+    return bytes_verified
+
+
+def _check_load_with_feedback(
+        workspace: Workspace, input_nick, bead, verification_cache,
+        include=None, exclude=None):
     try:
-        verify_with_feedback(bead)
+        verify_with_feedback(bead, verification_cache, scope=SCOPE_DATA)
     except InvalidArchive:
         warning(f'Bead for {input_nick} is found but damaged - not loading.')
     else:
-        workspace.set_input_bead_name(input_nick, bead.name)
-        if workspace.is_loaded(input_nick):
-            print(f'Removing current data from {input_nick}')
-            workspace.unload(input_nick)
-        print(f'Loading new data to {input_nick} ...', end='', flush=True)
-        workspace.load(input_nick, bead)
+        with workspace.transaction():
+            workspace.set_input_bead_name(input_nick, bead.name)
+            if workspace.is_loaded(input_nick):
+                print(f'Removing current data from {input_nick}')
+                workspace.unload(input_nick, background=True)
+            print(f'Loading new data to {input_nick} ...', end='', flush=True)
+            workspace.load(input_nick, bead, include, exclude)
+            workspace.wait_for_background_removals()
         print(' Done')
 
 
@@ -308,5 +465,18 @@ def _unload(workspace, input_nick):
 
 
 def get_workspace(args) -> Workspace:
-    assert_valid_workspace(args.workspace)
-    return args.workspace
+    workspace = resolve_workspace(args.workspace)
+    assert_valid_workspace(workspace)
+    return workspace
+
+
+def get_loading_workspace(args) -> Workspace:
+    '''
+    Workspace for loading inputs.
+
+    Identical input files are shared (hard linked) with other loads,
+    if enabled by the BEAD_HARDLINK_INPUTS environment variable.
+    '''
+    workspace = get_workspace(args)
+    workspace.link_index = args.get_env().get_link_index()
+    return workspace
@@ -2,18 +2,18 @@ import os
 import sys
 import traceback
 
-import appdirs
 from .cmdparse import Parser, Command
 
 from bead.tech.fs import Path
 from bead.tech.timestamp import timestamp
-from .common import warning
-from . import workspace
-from . import input
-from . import box
-from .web import commands as web
 from . import git_info
 
+# command implementations are imported only when used - for faster startup
+WORKSPACE = 'bead_cli.workspace'
+INPUT = 'bead_cli.input'
+BOX = 'bead_cli.box'
+WEB = 'bead_cli.web.commands'
+
 
 VERSION_INFO = f'''
 Python:
@@ -44,36 +44,36 @@ def make_argument_parser(defaults):
     (parser
         .commands(
             'new',
-            workspace.CmdNew,
+            f'{WORKSPACE}.CmdNew',
             'Create and initialize new workspace directory with a new bead.',
 
             'develop',
-            workspace.CmdDevelop,
+            f'{WORKSPACE}.CmdDevelop',
             'Create workspace from specified bead.',
 
             'save',
-            workspace.CmdSave,
+            f'{WORKSPACE}.CmdSave',
             'Save workspace in a box.',
 
             'status',
-            workspace.CmdStatus,
+            f'{WORKSPACE}.CmdStatus',
             'Show workspace information.',
 
             # TODO: remove nuke command after next release
             'nuke',
-            workspace.CmdNuke,
+            f'{WORKSPACE}.CmdNuke',
             'No operation, you probably want zap, to delete the workspace.',
 
             'web',
-            web.CmdWeb,
+            f'{WEB}.CmdWeb',
             'Manage/visualize the big picture - connections between beads.',
 
             'zap',
-            workspace.CmdZap,
+            f'{WORKSPACE}.CmdZap',
             'Delete workspace.',
 
             'xmeta',
-            box.CmdXmeta,
+            f'{BOX}.CmdXmeta',
             'eXport eXtended meta attributes to a file next to zip archive.',
 
             'version',
@@ -84,47 +84,55 @@ def make_argument_parser(defaults):
         .group('input', 'Manage data loaded from other beads')
         .commands(
             'add',
-            input.CmdAdd,
+            f'{INPUT}.CmdAdd',
             'Define dependency and load its data.',
 
             'delete',
-            input.CmdDelete,
+            f'{INPUT}.CmdDelete',
             'Forget all about an input.',
 
             'map',
-            input.CmdMap,
+            f'{INPUT}.CmdMap',
             'Change the name of the bead from which the input is loaded/updated.',
 
             'update',
-            input.CmdUpdate,
+            f'{INPUT}.CmdUpdate',
             'Update input[s] to newest version or defined bead.',
 
             'load',
-            input.CmdLoad,
+            f'{INPUT}.CmdLoad',
             'Load data from already defined dependency.',
 
             'unload',
-            input.CmdUnload,
+            f'{INPUT}.CmdUnload',
             'Unload input data.',))
 
     (parser
         .group('box', 'Manage bead boxes')
         .commands(
             'add',
-            box.CmdAdd,
+            f'{BOX}.CmdAdd',
             'Define a box.',
 
             'list',
-            box.CmdList,
+            f'{BOX}.CmdList',
             'Show known boxes.',
 
             'forget',
-            box.CmdForget,
+            f'{BOX}.CmdForget',
             'Forget a known box.',
 
             'rewire',
-            box.CmdRewire,
-            'Remap inputs.'))
+            f'{BOX}.CmdRewire',
+            'Remap inputs.',
+
+            'verify',
+            f'{BOX}.CmdVerify',
+            'Verify the integrity of all beads in a box.',
+
+            'export',
+            f'{BOX}.CmdExport',
+            'Write a bead as a standalone zip archive.'))
 
     return parser
 
@@ -150,7 +158,9 @@ for your convenience, thus it is not really helpful in fixing the bug.
 
 
 def main(run=run):
+    import appdirs
     if git_info.DIRTY:
+        from .common import warning
         warning('test build, DO NOT USE for production!!!')
     config_dir = appdirs.user_config_dir(
         'bead_cli-6a4d9d98-8e64-4a2a-b6c2-8a753ea61daf')
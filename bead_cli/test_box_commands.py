@@ -1,9 +1,13 @@
 from glob import glob
+import json
 import os
+import shutil
 
 from bead.test import TestCase
+from bead import zipopener
 
 from .test_robot import Robot
+from . import test_fixtures as fixtures
 
 from bead.tech.timestamp import timestamp
 from bead.workspace import Workspace
@@ -191,3 +195,126 @@ class Test_box_commands(TestCase):
         assert robot.stderr == ''
         assert 'a' == robot.read_file('input/input-a/README')
         assert 'b' == robot.read_file('input/input-b/README')
+
+    def test_content_addressed_box(self, robot, dir1):
+        robot.cli('box', 'add', '--content-addressed', 'cas-box', dir1)
+        assert os.path.isdir(robot.cwd / dir1 / '.blobs')
+
+        robot.cli('new', 'a')
+        robot.cd('a')
+        robot.write_file('output/README', 'a')
+        robot.cli('save')
+        robot.cd('..')
+
+        robot.cli('new', 'x')
+        robot.cd('x')
+        robot.cli('input', 'add', 'a')
+        assert 'a' == robot.read_file('input/a/README')
+        robot.cd('..')
+
+        robot.cli('box', 'export', 'a', 'a.zip')
+        robot.cli('box', 'forget', 'cas-box')
+        robot.cd('x')
+        robot.cli('input', 'unload', 'a')
+        robot.cli('input', 'update', 'a', '../a.zip')
+        assert robot.stderr == ''
+        assert 'a' == robot.read_file('input/a/README')
+
+    def test_archive_copied_out_of_content_addressed_box(self, robot, dir1):
+        robot.cli('box', 'add', '--content-addressed', 'cas-box', dir1)
+        robot.cli('new', 'a')
+        robot.cd('a')
+        robot.write_file('output/README', 'a')
+        robot.cli('save')
+        robot.cd('..')
+        [archive] = glob(robot.cwd / dir1 / 'a_*.zip')
+        shutil.copy(archive, robot.cwd / 'a.zip')
+
+        robot.cli('new', 'x')
+        robot.cd('x')
+        robot.cli('input', 'add', 'a', '../a.zip')
+
+        assert 'bead box export' in robot.stderr
+        assert not os.path.exists(robot.cwd / 'input/a/README')
+
+
+class Test_box_verify(TestCase, fixtures.RobotAndBeads):
+
+    def test_valid_box(self, robot, bead_a, bead_b):
+        robot.cli('box', 'verify', 'box', '--jobs', '2')
+
+        assert 'Verified 2 archives, 0 damaged' in robot.stdout
+        assert 'DAMAGED' not in robot.stdout
+
+    def test_verified_beads_are_not_verified_again_on_load(self, robot, bead_a):
+        robot.cli('box', 'verify', 'box')
+        robot.cli('new', 'ws')
+        robot.cd('ws')
+        robot.cli('input', 'add', bead_a)
+
+        assert 'verified before' in robot.stdout
+
+    def test_deleted_archives_are_forgotten(self, robot, bead_a, bead_b, box):
+        robot.cli('box', 'verify', 'box')
+        [archive_filename] = glob(box.directory / f'{bead_b}_*.zip')
+        os.remove(archive_filename)
+
+        robot.cli('box', 'verify', 'box')
+
+        with robot.environment as env:
+            entries = env.get_verification_cache().entries
+        assert len(entries) == 1
+        assert os.path.abspath(archive_filename) not in entries
+
+    def test_damaged_bead_is_reported(self, robot, bead_a, hacked_data_bead):
+        self.assertRaises(
+            SystemExit, robot.cli, 'box', 'verify', 'box', '--jobs', '2', '--report', 'report')
+
+        assert '1 damaged' in robot.stderr
+        with open(robot.cwd / 'report') as f:
+            report = [json.loads(line) for line in f]
+        status = {os.path.basename(r['path']).split('_2')[0]: r['status'] for r in report}
+        assert status == {bead_a: 'ok', hacked_data_bead: 'damaged'}
+        assert all(r['content_id'] for r in report)
+
+    def test_corrupted_compressed_data_is_reported(self, robot, bead_a, corrupted_data_bead):
+        self.assertRaises(SystemExit, robot.cli, 'box', 'verify', 'box', '--report', 'report')
+
+        assert 'Verified 2 archives, 1 damaged' in robot.stdout
+        with open(robot.cwd / 'report') as f:
+            report = [json.loads(line) for line in f]
+        status = {os.path.basename(r['path']).split('_2')[0]: r['status'] for r in report}
+        assert status == {bead_a: 'ok', corrupted_data_bead: 'damaged'}
+
+    def test_truncated_archive_is_reported(self, robot, bead_a, bead_b, box):
+        [archive_filename] = glob(box.directory / f'{bead_b}_*.zip')
+        with open(archive_filename, 'r+b') as f:
+            f.truncate(os.path.getsize(archive_filename) // 2)
+        zipopener.close_all()
+
+        self.assertRaises(SystemExit, robot.cli, 'box', 'verify', 'box')
+
+        assert 'Verified 2 archives, 1 damaged' in robot.stdout
+        assert f'{os.path.abspath(archive_filename)}: DAMAGED!' in robot.stdout
+
+    def test_verification_is_resumed_from_report(self, robot, bead_a, bead_b):
+        robot.cli('box', 'verify', 'box', '--report', 'report')
+        robot.cli('box', 'verify', 'box', '--report', 'report')
+
+        assert 'Skipping 2 archives' in robot.stdout
+        assert 'Verified 0 archives' in robot.stdout
+        with open(robot.cwd / 'report') as f:
+            assert len(f.readlines()) == 2
+
+    def test_report_entries_of_other_boxes_are_not_skipped(self, robot, bead_a):
+        with open(robot.cwd / 'report', 'w') as f:
+            f.write(json.dumps({'path': '/other/box/bead_a.zip', 'status': 'ok'}) + '\n')
+
+        robot.cli('box', 'verify', 'box', '--report', 'report')
+
+        assert 'Skipping' not in robot.stdout
+        assert 'Verified 1 archives' in robot.stdout
+
+    def test_unknown_box(self, robot):
+        self.assertRaises(SystemExit, robot.cli, 'box', 'verify', 'unknown-box')
+        assert 'Unknown box' in robot.stderr
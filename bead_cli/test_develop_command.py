@@ -54,3 +54,20 @@ class Test_develop(TestCase, fixtures.RobotAndBeads):
         os.makedirs(robot.cwd / bead_a)
         self.assertRaises(SystemExit, robot.cli, 'develop', bead_a)
         assert 'ERROR' in robot.stderr
+
+    def test_damaged_output_does_not_prevent_developing_the_code(self, robot, hacked_data_bead):
+        robot.cli('develop', hacked_data_bead)
+
+        assert Workspace(robot.cwd / 'hacked_data_bead').is_valid
+
+    def test_damaged_output_is_detected_when_extracted(self, robot, hacked_data_bead):
+        self.assertRaises(SystemExit, robot.cli, 'develop', '-x', hacked_data_bead)
+        assert 'ERROR' in robot.stderr
+
+    def test_verification_of_code_does_not_cover_data(self, robot, bead_a):
+        robot.cli('develop', bead_a)
+        robot.cli('develop', '-x', bead_a, 'with-output')
+        assert 'verified before' not in robot.stdout
+
+        robot.cli('develop', bead_a, 'code-only')
+        assert 'verified before' in robot.stdout
@@ -8,6 +8,7 @@ import zipfile
 from bead.workspace import Workspace
 from bead import layouts
 from bead import tech
+from bead import ziparchive
 from bead.archive import Archive
 from .test_robot import Robot
 
@@ -83,6 +84,28 @@ class RobotAndBeads:
                 z.writestr(layouts.Archive.DATA / 'README', 'HACKED')
         return hacked_bead_path
 
+    def hacked_data_bead(self, robot, box):
+        workspace_dir = self.new_temp_dir() / 'hacked_data_bead'
+        ws = Workspace(workspace_dir)
+        ws.create('hacked-kind')
+        tech.fs.write_file(ws.directory / 'code', 'code')
+        tech.fs.write_file(ws.directory / 'output/README', 'README')
+        hacked_bead_path = box.directory / f'hacked_data_bead_{TS1}.zip'
+        ws.pack(hacked_bead_path, TS1, comment='hacked bead')
+        with zipfile.ZipFile(hacked_bead_path, 'a') as z:
+            z.writestr(layouts.Archive.DATA / 'extra_file', 'HACKED')
+        return 'hacked_data_bead'
+
+    def corrupted_data_bead(self, robot, box):
+        workspace_dir = self.new_temp_dir() / 'corrupted_data_bead'
+        ws = Workspace(workspace_dir)
+        ws.create('corrupted-kind')
+        tech.fs.write_file(ws.directory / 'output/data.csv', 'a,b,c\n1,2,3\n' * 1000)
+        corrupted_bead_path = box.directory / f'corrupted_data_bead_{TS1}.zip'
+        ws.pack(corrupted_bead_path, TS1, comment='corrupted bead')
+        corrupt_member(corrupted_bead_path, layouts.Archive.DATA / 'data.csv')
+        return 'corrupted_data_bead'
+
     def _bead_with_history(self, robot, box, bead_name, bead_kind):
         def make_bead(freeze_time):
             with TempDir() as tempdir_obj:
@@ -125,3 +148,15 @@ class RobotAndBeads:
 
     def assert_not_loaded(self, robot, input_nick):
         assert not os.path.exists(robot.cwd / f'input/{input_nick}/README')
+
+
+def corrupt_member(archive_path, zip_path):
+    '''
+    Overwrite the compressed data of member zip_path - it becomes an invalid deflate stream.
+    '''
+    with zipfile.ZipFile(archive_path) as z:
+        info = z.getinfo(zip_path)
+    assert info.compress_type == zipfile.ZIP_DEFLATED
+    with open(archive_path, 'r+b') as f:
+        f.seek(ziparchive._data_offset(f, info))
+        f.write(b'\xff' * info.compress_size)
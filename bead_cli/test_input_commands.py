@@ -1,7 +1,11 @@
 from bead.test import TestCase
 
 import os
+import threading
+from unittest import mock
 from bead.workspace import Workspace
+from bead import zipopener
+from bead.ziparchive import ZipArchive
 from . import test_fixtures as fixtures
 
 
@@ -219,3 +223,134 @@ class Test_input_commands(TestCase, fixtures.RobotAndBeads):
         robot.cli('input', 'unload', 'input_a')
         assert not os.path.exists(robot.cwd / 'input/input_a')
         assert not os.path.exists(robot.cwd / 'input/input_b')
+
+    def test_successful_verification_is_remembered(self, robot, bead_a):
+        robot.cli('new', 'test-workspace')
+        robot.cd('test-workspace')
+        robot.cli('input', 'add', bead_a)
+        assert 'verified before' not in robot.stdout
+
+        robot.cli('input', 'unload')
+        robot.cli('input', 'load')
+        self.assert_loaded(robot, bead_a, bead_a)
+        assert 'verified before' in robot.stdout
+
+        robot.cli('input', 'unload')
+        robot.cli('input', 'load', '--reverify')
+        assert 'verified before' not in robot.stdout
+
+    def test_changed_archive_is_verified_again(self, robot, box, bead_a):
+        robot.cli('new', 'test-workspace')
+        robot.cd('test-workspace')
+        robot.cli('input', 'add', bead_a)
+
+        with robot.environment:
+            [archive] = box.all_beads()
+        os.utime(archive.archive_filename, ns=(0, 0))
+
+        robot.cli('input', 'unload')
+        robot.cli('input', 'load')
+        assert 'verified before' not in robot.stdout
+
+    def test_input_filter(self, robot, bead_a):
+        robot.cli('new', 'test-workspace')
+        robot.cd('test-workspace')
+        robot.cli('input', 'add', 'a', bead_a, '--exclude', 'README')
+        assert not os.path.exists(robot.cwd / 'input/a/README')
+
+        robot.cli('status')
+        assert 'Exclude:     README' in robot.stdout
+
+        # filter is remembered
+        robot.cli('input', 'unload', 'a')
+        robot.cli('input', 'load', 'a')
+        assert not os.path.exists(robot.cwd / 'input/a/README')
+
+        # changing the filter reloads the input
+        robot.cli('input', 'load', 'a', '--exclude', 'other-file')
+        self.assert_loaded(robot, 'a', bead_a)
+
+    def test_input_filter_requires_input_name(self, robot, bead_a):
+        robot.cli('new', 'test-workspace')
+        robot.cd('test-workspace')
+        robot.cli('input', 'add', bead_a)
+        self.assertRaises(SystemExit, robot.cli, 'input', 'load', '--include', '*.csv')
+        self.assertRaises(SystemExit, robot.cli, 'input', 'update', '--include', '*.csv')
+
+    def test_load_in_parallel(self, robot, bead_with_inputs, bead_a, bead_b):
+        robot.cli('develop', bead_with_inputs)
+        robot.cd(bead_with_inputs)
+        robot.cli('input', 'load', '--jobs', '4')
+
+        self.assert_loaded(robot, 'input_a', bead_a)
+        self.assert_loaded(robot, 'input_b', bead_b)
+        assert 'Loaded 2 of 2 inputs' in robot.stdout
+
+    def test_load_in_parallel_more_inputs_than_open_zip_files(self, robot, beads):
+        # zipopener keeps at most 10 zip files open
+        bead_names = [
+            self._new_bead(robot, beads, f'bead_{i}')
+            for i in range(zipopener.OpenZipLRUCache().max_size + 2)]
+        robot.cli('new', 'test-workspace')
+        robot.cd('test-workspace')
+        for bead_name in bead_names:
+            robot.cli('input', 'add', bead_name)
+        robot.cli('input', 'unload')
+        zipopener.close_all()
+
+        # all workers open their archive before any of them reads it
+        barrier = threading.Barrier(len(bead_names), timeout=10)
+        member_has_content_id = ZipArchive._member_has_content_id
+
+        def synchronized_member_has_content_id(*args, **kwargs):
+            barrier.wait()
+            return member_has_content_id(*args, **kwargs)
+
+        with mock.patch.object(
+                ZipArchive, '_member_has_content_id', synchronized_member_has_content_id):
+            robot.cli('input', 'load', '--reverify', '-j', str(len(bead_names)))
+
+        assert 'WARNING' not in robot.stderr
+        assert f'Loaded {len(bead_names)} of {len(bead_names)} inputs' in robot.stdout
+        for bead_name in bead_names:
+            self.assert_loaded(robot, bead_name, bead_name)
+
+    def test_parallel_update_keeps_input_if_new_bead_is_damaged(
+            self, robot, bead_a, bead_b, hacked_data_bead):
+        robot.cli('new', 'test-workspace')
+        robot.cd('test-workspace')
+        robot.cli('input', 'add', 'a', bead_a)
+        robot.cli('input', 'add', 'b', bead_b)
+        robot.cli('input', 'map', 'a', hacked_data_bead)
+        robot.cli('input', 'update', '-j', '2')
+
+        assert 'WARNING' in robot.stderr
+        assert 'Loaded 0 of 1 inputs' in robot.stdout
+        self.assert_loaded(robot, 'a', bead_a)
+        self.assert_loaded(robot, 'b', bead_b)
+
+    def _input_inodes(self, robot, bead_a):
+        robot.cli('new', 'test-workspace')
+        robot.cd('test-workspace')
+        robot.cli('input', 'add', 'a1', bead_a)
+        robot.cli('input', 'add', 'a2', bead_a)
+        robot.cd('..')
+        robot.cli('new', 'other-workspace')
+        robot.cd('other-workspace')
+        robot.cli('input', 'add', 'a', bead_a)
+
+        return {
+            os.stat(robot.cwd / '..' / path).st_ino
+            for path in (
+                'test-workspace/input/a1/README',
+                'test-workspace/input/a2/README',
+                'other-workspace/input/a/README')}
+
+    def test_input_files_are_not_hard_linked_by_default(self, robot, bead_a):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('BEAD_HARDLINK_INPUTS', None)
+            assert len(self._input_inodes(robot, bead_a)) == 3
+
+    def test_identical_input_files_are_hard_linked_if_enabled(self, robot, bead_a):
+        with mock.patch.dict(os.environ, BEAD_HARDLINK_INPUTS='1'):
+            assert len(self._input_inodes(robot, bead_a)) == 1
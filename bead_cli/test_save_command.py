@@ -1,10 +1,14 @@
 import os
+from unittest import mock
 
 from bead.test import TestCase, skipIf
 
 from . import test_fixtures as fixtures
 from bead.workspace import Workspace
+from bead.archive import Archive
 from bead.box import Box
+from bead import layouts
+from bead import zipopener
 
 
 class Test(TestCase, fixtures.RobotAndBeads):
@@ -35,6 +39,47 @@ class Test(TestCase, fixtures.RobotAndBeads):
         robot.cli('develop', 'bead')
         self.assert_file_contains(robot.cwd / 'bead/symlink', 'content')
 
+    def test_delta_save(self, robot, box):
+        robot.cli('new', 'bead')
+        robot.cd('bead')
+        robot.write_file('output/data', 'unchanged data')
+        robot.cli('save')
+        robot.write_file('output/new-data', 'new data')
+        robot.cli('save', '--delta')
+        robot.cd('..')
+        robot.cli('zap', 'bead')
+
+        robot.cli('develop', '-x', 'bead')
+        self.assert_file_contains(robot.cwd / 'bead/output/data', 'unchanged data')
+        self.assert_file_contains(robot.cwd / 'bead/output/new-data', 'new data')
+
+    def test_delta_save_with_damaged_previous_version(self, robot, box):
+        robot.cli('new', 'bead')
+        robot.cd('bead')
+        robot.write_file('output/data', 'unchanged data')
+        robot.cli('save')
+        for name in os.listdir(box.directory):
+            if name.endswith('.zip'):
+                # the damaged bead is still found through its cached meta
+                archive = Archive(box.directory / name)
+                archive.ziparchive
+                archive.save_cache()
+                fixtures.corrupt_member(box.directory / name, layouts.Archive.MANIFEST)
+        zipopener.close_all()
+        robot.cli('save', '--delta')
+
+        assert 'WARNING' in robot.stderr
+        assert 'damaged' in robot.stderr
+
+    def test_invalid_compression_setting_is_reported(self, robot, box):
+        robot.cli('new', 'bead')
+        robot.cd('bead')
+        with mock.patch.dict(os.environ, BEAD_ZIP_COMPRESSION_LEVEL='best'):
+            self.assertRaises(SystemExit, robot.cli, 'save')
+
+        assert 'BEAD_ZIP_COMPRESSION_LEVEL' in robot.stderr
+        assert os.listdir(box.directory) == []
+
 
 class Test_no_box(TestCase):
 
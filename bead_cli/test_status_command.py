@@ -1,5 +1,9 @@
+from unittest import mock
+
 from bead.test import TestCase
+from bead.workspace import Workspace
 
+from . import common
 from . import test_fixtures as fixtures
 
 
@@ -73,3 +77,23 @@ class Test_status(TestCase, fixtures.RobotAndBeads):
     def test_invalid_workspace(self, robot):
         robot.cli('status')
         assert 'WARNING' in robot.stderr
+
+    def test_explicit_workspace_is_not_searched_for(self, robot, bead_a):
+        robot.cli('develop', bead_a)
+        with mock.patch.object(
+                Workspace, 'for_current_working_directory', side_effect=AssertionError):
+            robot.cli('status', '--workspace', bead_a)
+
+        assert bead_a in robot.stdout
+
+    def test_current_workspace_is_searched_for_once(self, robot, bead_a):
+        robot.cli('develop', bead_a)
+        robot.cd(bead_a)
+        with robot.environment:
+            with mock.patch.object(
+                    Workspace, 'for_current_working_directory',
+                    wraps=Workspace.for_current_working_directory) as search:
+                workspace = common.resolve_workspace(common.CURRENT_WORKSPACE)
+                assert common.resolve_workspace(common.CURRENT_WORKSPACE) is workspace
+        assert search.call_count == 1
+        assert workspace.is_valid
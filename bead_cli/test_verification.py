@@ -0,0 +1,64 @@
+from bead.test import TestCase
+from bead.tech.fs import write_file
+from . import verification as m
+
+import os
+
+
+class FakeArchive:
+    def __init__(self, archive_filename):
+        self.archive_filename = archive_filename
+        self.content_id = 'content_id'
+
+
+class Test_VerificationCache(TestCase):
+
+    # fixtures
+    def dir(self):
+        return self.new_temp_dir()
+
+    def cache_file(self, dir):
+        return dir / 'cache' / 'verified.json'
+
+    def archive(self, dir):
+        write_file(dir / 'archive.zip', 'archive')
+        return FakeArchive(dir / 'archive.zip')
+
+    # tests
+    def test_verification_is_remembered(self, cache_file, archive):
+        m.VerificationCache(cache_file).remember(archive, ['data'])
+
+        cache = m.VerificationCache(cache_file)
+        assert cache.is_verified(archive, ['data'])
+        assert not cache.is_verified(archive, ['code', 'data'])
+
+    def test_changed_archive_is_not_verified(self, cache_file, archive):
+        m.VerificationCache(cache_file).remember(archive, ['data'])
+        write_file(archive.archive_filename, 'changed archive')
+
+        assert not m.VerificationCache(cache_file).is_verified(archive, ['data'])
+
+    def test_deleted_archives_are_forgotten(self, cache_file, archive, dir):
+        write_file(dir / 'deleted.zip', 'deleted')
+        deleted = FakeArchive(dir / 'deleted.zip')
+        cache = m.VerificationCache(cache_file)
+        cache.remember(deleted, ['data'])
+        cache.remember(archive, ['data'])
+        os.remove(deleted.archive_filename)
+
+        cache.forget_missing_archives()
+        cache.save()
+
+        assert list(m.VerificationCache(cache_file).entries) == [
+            os.path.abspath(archive.archive_filename)]
+
+    def test_remember_does_not_check_other_archives(self, cache_file, archive, dir):
+        write_file(dir / 'deleted.zip', 'deleted')
+        deleted = FakeArchive(dir / 'deleted.zip')
+        cache = m.VerificationCache(cache_file)
+        cache.remember(deleted, ['data'])
+        os.remove(deleted.archive_filename)
+
+        cache.remember(archive, ['data'])
+
+        assert len(m.VerificationCache(cache_file).entries) == 2
@@ -1,8 +1,10 @@
 import re
+from unittest import mock
 from bead.tech.fs import read_file, rmtree, write_file
 from bead.tech import persistence
 from bead.test import TestCase
 
+from bead_cli.web import commands
 from bead_cli.web.freshness import Freshness
 from bead_cli.web.sketch import Sketch
 from . import test_fixtures as fixtures
@@ -28,6 +30,20 @@ class Test_web(TestCase, fixtures.RobotAndBeads):
         robot.cli('web png all.png')
         self.assert_file_exists(robot.cwd / 'all.png')
 
+    def test_renderer_is_shut_down(self, robot, bead_with_inputs):
+        def fake_dot(dot_str, output_file, format):
+            write_file(output_file, dot_str)
+
+        with mock.patch.object(commands, 'graphviz_dot', side_effect=fake_dot):
+            with mock.patch.object(
+                    commands.BackgroundRenderer, 'shutdown', autospec=True,
+                    side_effect=commands.BackgroundRenderer.shutdown) as shutdown:
+                robot.cli('web svg all.svg')
+
+        self.assert_file_exists(robot.cwd / 'all.svg')
+        [(renderer,), _] = shutdown.call_args
+        assert renderer.executor is None
+
     def test_meta_save_load(self, robot, bead_with_inputs, box):
         robot.cli('web save all.web')
         self.assert_file_exists(robot.cwd / 'all.web')
@@ -56,6 +72,23 @@ class Test_web(TestCase, fixtures.RobotAndBeads):
 
         assert len(heads_only_web) < len(full_web)
 
+    def test_dot_parts_output(self, robot, bead_with_inputs):
+        robot.cli('web dot-parts part.dot')
+        self.assert_file_exists(robot.cwd / 'part_1.dot')
+        self.assert_file_does_not_exists(robot.cwd / 'part_2.dot')
+
+    @needs_dot
+    def test_svg_parts_output(self, robot, bead_with_inputs):
+        robot.cli('web svg-parts part.svg')
+        self.assert_file_exists(robot.cwd / 'part_1.svg')
+
+    def test_collapse(self, robot, bead_with_history):
+        robot.cli('web color dot all.dot collapse dot collapsed.dot')
+        full_web = read_file(robot.cwd / 'all.dot')
+        collapsed_web = read_file(robot.cwd / 'collapsed.dot')
+
+        assert len(collapsed_web) < len(full_web)
+
     def test_invalid_command_reported(self, robot):
         with self.assertRaises(SystemExit):
             robot.cli('web load x this-command-does-not-exist c')
@@ -0,0 +1,103 @@
+'''
+Remembering successful archive verifications
+'''
+
+import os
+import tempfile
+
+from bead.tech import persistence
+
+
+ENTRY_SIZE = 'size'
+ENTRY_MTIME_NS = 'mtime_ns'
+ENTRY_INODE = 'inode'
+ENTRY_CONTENT_ID = 'content_id'
+ENTRY_SCOPE = 'scope'
+
+
+class VerificationCache:
+    """
+    I remember archives, that were successfully verified, so that they need not be
+    verified (re-hashed) again.
+
+    An archive is identified by its path, and it is considered unchanged while its
+    size, modification time, inode and content_id all remain the same.
+
+    Archives can be verified partially (see bead.archive.SCOPE_*), the verified
+    parts are remembered and accumulated.
+    """
+
+    def __init__(self, filename, reverify=False):
+        self.filename = filename
+        # forget previous verifications, but still remember new ones
+        self.reverify = reverify
+        self._entries = None
+
+    @property
+    def entries(self):
+        if self._entries is None:
+            try:
+                self._entries = persistence.file_load(self.filename)
+            except (FileNotFoundError, persistence.ReadError):
+                self._entries = {}
+        return self._entries
+
+    def _fingerprint(self, archive):
+        stat = os.stat(archive.archive_filename)
+        return {
+            ENTRY_SIZE: stat.st_size,
+            ENTRY_MTIME_NS: stat.st_mtime_ns,
+            ENTRY_INODE: stat.st_ino,
+            ENTRY_CONTENT_ID: archive.content_id,
+        }
+
+    def _key(self, archive):
+        return os.path.abspath(archive.archive_filename)
+
+    def _verified_scope(self, archive):
+        entry = dict(self.entries.get(self._key(archive), {}))
+        verified_scope = entry.pop(ENTRY_SCOPE, ())
+        if entry != self._fingerprint(archive):
+            return set()
+        return set(verified_scope)
+
+    def is_verified(self, archive, scope):
+        if self.reverify:
+            return False
+        try:
+            return set(scope) <= self._verified_scope(archive)
+        except OSError:
+            return False
+
+    def remember(self, archive, scope, save=True):
+        verified_scope = self._verified_scope(archive) | set(scope)
+        entry = self._fingerprint(archive)
+        entry[ENTRY_SCOPE] = sorted(verified_scope)
+        self.entries[self._key(archive)] = entry
+        if save:
+            self.save()
+
+    def forget_missing_archives(self):
+        '''
+        Forget archives, that no longer exist (e.g. deleted or renamed).
+
+        Stats every remembered path, so it is not done on every save,
+        only by `box verify`, which is expected to be slow anyway.
+        '''
+        self._entries = {
+            path: entry
+            for path, entry in self.entries.items()
+            if os.path.exists(path)}
+
+    def save(self):
+        # atomic update: concurrent bead processes either see the old or the new content
+        directory = os.path.dirname(self.filename)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_filename = tempfile.mkstemp(dir=directory, prefix='.verified-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                persistence.dump(self.entries, f)
+            os.replace(temp_filename, self.filename)
+        except BaseException:
+            os.remove(temp_filename)
+            raise
@@ -1,12 +1,22 @@
-from typing import Dict, Iterable
+from bisect import bisect
+from collections import defaultdict
+from typing import Dict, Iterable, List
 
-from bead.tech.timestamp import EPOCH_STR
+from bead.tech.timestamp import EPOCH_STR, timestamp_sort_key
 
 from .dummy import Dummy
 from .freshness import Freshness
 from . import graphviz
 
 
+def _time_order(bead):
+    return timestamp_sort_key(bead.freeze_time_str)
+
+
+def _head_order(bead):
+    return (bead.is_not_phantom, _time_order(bead))
+
+
 class Cluster:
     """
     Versions of beads having the same name.
@@ -16,6 +26,10 @@ class Cluster:
     def __init__(self, name):
         self.name = name
         self.beads_by_content_id = {}
+        # most recent first
+        self._beads: List[Dummy] = []
+        # negated time orders of `_beads`, in increasing order (for bisect)
+        self._sort_keys: List[int] = []
 
         # use a phantom bead instead of None for default value
         phantom_head = (
@@ -27,29 +41,46 @@ class Cluster:
         phantom_head.set_freshness(Freshness.PHANTOM)
         self.head = phantom_head
 
+    @classmethod
+    def from_beads(cls, name, beads: Iterable[Dummy]) -> 'Cluster':
+        """
+        Create a cluster from all versions at once, sorting them only once.
+        """
+        cluster = cls(name)
+        for bead in beads:
+            assert bead.name == name
+            assert bead.content_id not in cluster.beads_by_content_id
+            cluster.beads_by_content_id[bead.content_id] = bead
+        cluster._beads = sorted(
+            cluster.beads_by_content_id.values(), key=_time_order, reverse=True)
+        cluster._sort_keys = [-_time_order(bead) for bead in cluster._beads]
+        for bead in cluster.beads_by_content_id.values():
+            cluster._update_head(bead)
+        return cluster
+
     def add(self, bead):
         assert bead.name == self.name
         assert bead.content_id not in self.beads_by_content_id
         self.beads_by_content_id[bead.content_id] = bead
 
-        def head_order(bead):
-            return (bead.is_not_phantom, bead.freeze_time)
+        sort_key = -_time_order(bead)
+        index = bisect(self._sort_keys, sort_key)
+        self._sort_keys.insert(index, sort_key)
+        self._beads.insert(index, bead)
+        self._update_head(bead)
 
-        if head_order(bead) >= head_order(self.head):
+    def _update_head(self, bead):
+        if _head_order(bead) >= _head_order(self.head):
             self.head = bead
 
     def beads(self):
         """
         Time sorted list of beads, most recent first.
         """
-        return (
-            sorted(
-                self.beads_by_content_id.values(),
-                key=(lambda bead: bead.freeze_time),
-                reverse=True))
+        return list(self._beads)
 
     def reset_freshness(self):
-        beads = self.beads()
+        beads = self._beads
 
         if beads and beads[0].is_not_phantom:
             beads[0].set_freshness(Freshness.UP_TO_DATE)
@@ -59,16 +90,16 @@ class Cluster:
 
     @property
     def as_dot(self):
-        return ''.join(graphviz.dot_cluster_as_fragments(self.name, self.beads()))
+        return ''.join(graphviz.dot_cluster_as_fragments(self.name, self._beads))
 
     def __len__(self):
         return len(self.beads_by_content_id)
 
 
 def create_cluster_index(beads: Iterable[Dummy]) -> Dict[str, Cluster]:
-    cluster_by_name: Dict[str, Cluster] = {}
+    beads_by_name: Dict[str, List[Dummy]] = defaultdict(list)
     for bead in beads:
-        if bead.name not in cluster_by_name:
-            cluster_by_name[bead.name] = Cluster(bead.name)
-        cluster_by_name[bead.name].add(bead)
-    return cluster_by_name
+        beads_by_name[bead.name].append(bead)
+    return {
+        name: Cluster.from_beads(name, cluster_beads)
+        for name, cluster_beads in beads_by_name.items()}
@@ -1,4 +1,5 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import os
 import subprocess
 import textwrap
@@ -54,6 +55,14 @@ class CmdWeb(Command):
     svg filename.svg
         Save connections as image in SVG format
 
+    dot-parts filename.dot
+    png-parts filename.png
+    svg-parts filename.svg
+        Split the graph into unconnected parts and save each part to its own
+        file, numbered by decreasing size (e.g. filename_1.png, filename_2.png, ...)
+
+    Images are rendered in the background, in parallel with each other.
+
     color
         Assign freshness to nodes, which are visualized as colors.
         Answers the question: "Are all input at the latest version?"
@@ -78,6 +87,12 @@ class CmdWeb(Command):
         cluster and possibly a few older ones, that are referenced
         by outdated, but not yet superseded (updated) computations.
 
+    collapse
+        Reduce graph to the most recent computation per cluster, and merge
+        all input connections between two clusters into a single edge.
+        Meant for visualizing huge webs: use it after "color", just before
+        "png" or "svg".
+
     view filename
         open filename in browser (shortcut after save/png/svg)
     '''
@@ -109,9 +124,14 @@ class CmdWeb(Command):
             msg += f'\nCould not parse: {remaining_words}'
             die(msg)
 
+        renderer = BackgroundRenderer()
         sketch = Sketch.from_beads([])
-        for command in commands:
-            sketch = command(sketch)
+        try:
+            for command in commands:
+                command.renderer = renderer
+                sketch = command(sketch)
+        finally:
+            renderer.shutdown()
 
 
 def parse_commands(env, words):
@@ -135,6 +155,9 @@ def parse_commands(env, words):
 
 
 class SketchProcessor:
+    # BackgroundRenderer for writing images, set by CmdWeb.run
+    renderer = None
+
     def __init__(self, _args):
         pass
 
@@ -189,7 +212,7 @@ class WritePng(ProcessorWithFileName):
     def __call__(self, sketch):
         dot_str = sketch.as_dot()
         print(f"Creating PNG: {self.file_name}")
-        graphviz_dot(dot_str, self.file_name, format='png')
+        self.renderer.render(dot_str, self.file_name, format='png')
         return sketch
 
 
@@ -197,12 +220,51 @@ class WriteSvg(ProcessorWithFileName):
     def __call__(self, sketch):
         dot_str = sketch.as_dot()
         print(f"Creating SVG: {self.file_name}")
-        graphviz_dot(dot_str, self.file_name, format='svg')
+        self.renderer.render(dot_str, self.file_name, format='svg')
         return sketch
 
 
+class WriteParts(ProcessorWithFileName):
+    FORMAT = 'dot'
+
+    def __call__(self, sketch):
+        parts = sketch.components()
+        file_names = numbered_file_names(self.file_name, len(parts))
+        if file_names:
+            print(
+                f"Creating {len(parts)} {self.FORMAT.upper()} files:"
+                + f" {file_names[0]} .. {file_names[-1]}")
+        for part, file_name in zip(parts, file_names):
+            self.write(part.as_dot(), file_name)
+        return sketch
+
+    def write(self, dot_str, file_name):
+        self.renderer.render(dot_str, file_name, format=self.FORMAT)
+
+
+class WriteDotParts(WriteParts):
+    def write(self, dot_str, file_name):
+        tech.fs.write_file(file_name, dot_str)
+
+
+class WritePngParts(WriteParts):
+    FORMAT = 'png'
+
+
+class WriteSvgParts(WriteParts):
+    FORMAT = 'svg'
+
+
+def numbered_file_names(file_name, count):
+    stem, ext = os.path.splitext(file_name)
+    width = len(str(count))
+    return [f'{stem}_{n:0{width}d}{ext}' for n in range(1, count + 1)]
+
+
 class View(ProcessorWithFileName):
     def __call__(self, sketch):
+        # the file might be still rendered
+        self.renderer.wait()
         print(f"Viewing {self.file_name}")
         webbrowser.open(self.file_name)
 
@@ -249,6 +311,11 @@ class KeepOnlyHeads(SketchProcessor):
         return web_sketch.heads_of(sketch).drop_deleted_inputs()
 
 
+class Collapse(SketchProcessor):
+    def __call__(self, sketch):
+        return web_sketch.collapse(sketch)
+
+
 class RewireWriteOptions(ProcessorWithFileName):
     def __call__(self, sketch):
         rewire_options = rewire.get_options(sketch.beads)
@@ -280,9 +347,13 @@ SUBCOMMANDS = {
     'dot': WriteDot,
     'png': WritePng,
     'svg': WriteSvg,
+    'dot-parts': WriteDotParts,
+    'png-parts': WritePngParts,
+    'svg-parts': WriteSvgParts,
     '/': Filter,
     'color': SetFreshness,
     'heads': KeepOnlyHeads,
+    'collapse': Collapse,
     'view': View,
     'auto-rewire': AutoRewire,
     'rewire-options': RewireWriteOptions,
@@ -314,3 +385,36 @@ def load_all_beads(boxes):
 def graphviz_dot(dot_str, output_file, format):
     cmd = ['dot', '-o', output_file, '-T', format]
     subprocess.run(cmd, input=dot_str.encode('utf-8'), capture_output=True, check=True)
+
+
+class BackgroundRenderer:
+    """
+    Run graphviz's dot processes concurrently.
+
+    Errors are reported by `wait`, which must be called before using the rendered files.
+    """
+    def __init__(self):
+        self.executor = None
+        self.renderings = []
+
+    def render(self, dot_str, output_file, format):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+        self.renderings.append(
+            self.executor.submit(graphviz_dot, dot_str, output_file, format))
+
+    def wait(self):
+        renderings, self.renderings = self.renderings, []
+        for rendering in renderings:
+            rendering.result()
+
+    def shutdown(self):
+        '''
+        Wait for the renderings and stop the worker threads.
+        '''
+        try:
+            self.wait()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
@@ -15,9 +15,11 @@ class Edge:
     src: Node
     dest: Node
     label: str = ''
+    # number of input links represented by this edge
+    weight: int = 1
 
     def reversed(self):
-        return Edge(self.dest, self.src, self.label)
+        return Edge(self.dest, self.src, self.label, self.weight)
 
     @cached_property
     def src_ref(self):
@@ -85,10 +85,15 @@ def dot_cluster_as_fragments(cluster_name, beads, indent='  '):
     yield ']'
 
 
+# edges representing many input links are drawn thicker, up to this width
+MAX_PENWIDTH = 8
+
+
 class Context:
 
-    def __init__(self):
+    def __init__(self, use_auxiliary_nodes=True):
         self.__unique_node_counter = 0
+        self.use_auxiliary_nodes = use_auxiliary_nodes
 
     def _get_unique_node_id(self):
         """
@@ -97,7 +102,7 @@ class Context:
         self.__unique_node_counter += 1
         return f"unique_{self.__unique_node_counter}"
 
-    def dot_edge(self, bead_src, bead_dest, name, is_auxiliary_edge, indent='  '):
+    def dot_edge(self, bead_src, bead_dest, name, is_auxiliary_edge, weight=1, indent='  '):
         """
         Create an edge with a label in the DOT language between two beads.
 
@@ -106,6 +111,9 @@ class Context:
         edges are overlapped, producing a messy graph.
         To amend this a conceptual edge is implemented with
         a series of extra nodes and edges between them.
+
+        The extra nodes are left out, if the context is not using auxiliary nodes,
+        as they make the layout of huge graphs prohibitively slow.
         """
         src = f'{node_cluster(bead_src)}:{Port(bead_src).output}:e'
         dest = f'{node_cluster(bead_dest)}:{Port(bead_dest).input}:w'
@@ -114,9 +122,10 @@ class Context:
         silent_helper_nodes = []
         color = bead_color(bead_src) if not is_auxiliary_edge else 'grey90'
         label = html.escape(name)
+        penwidth = f' penwidth="{min(weight, MAX_PENWIDTH)}"' if weight > 1 else ''
 
         # add auxiliary nodes before label
-        for _ in range(4):
+        for _ in range(4 if self.use_auxiliary_nodes else 0):
             unique_node = self._get_unique_node_id()
             before_label.append(unique_node)
             silent_helper_nodes.append(unique_node)
@@ -137,6 +146,7 @@ class Context:
                 f'{before_label[-1]} -> {after_label[0]} ',
                 '[',
                 f'fontcolor="{color}" color="{color}" fontsize="10" label="{label}" weight="100"',
+                penwidth,
                 ']',
                 ';'
             ]
@@ -1,3 +1,4 @@
+from collections import defaultdict
 import itertools
 from typing import Set, Dict, List, Tuple, Sequence, Iterable
 
@@ -64,10 +65,19 @@ class Sketch:
 
     def color_beads(self):
         color_beads(self)
+        # freshness is shown on the plot
+        self.__dict__.pop('_dot', None)
 
-    def as_dot(self):
+    @cached_property
+    def _dot(self):
         return plot_clusters_as_dot(self)
 
+    def as_dot(self):
+        return self._dot
+
+    def components(self) -> List["Sketch"]:
+        return components(self)
+
     def drop_deleted_inputs(self) -> "Sketch":
         return drop_deleted_inputs(self)
 
@@ -81,6 +91,39 @@ def simplify(sketch: Sketch) -> Sketch:
     raise NotImplementedError
 
 
+def collapse(sketch: Sketch) -> Sketch:
+    """
+    Keep only cluster heads and merge parallel edges between clusters.
+
+    Every cluster is represented by a single node, its head, superseded versions are dropped.
+    Edges leading to a head from any version of the same cluster are merged into one edge,
+    that has the merged input names as label and their number as weight.
+
+    The resulting sketch is meant for visualizing huge webs, freshness should be set
+    (`color_beads`) before collapsing.
+    Makes a new instance
+    """
+    head_by_name = {name: cluster.head for name, cluster in sketch.cluster_by_name.items()}
+    head_refs = {head.ref for head in head_by_name.values()}
+    edges_by_cluster_pair: Dict[Tuple[str, str], List[Edge]] = defaultdict(list)
+    for edge in sketch.edges:
+        if edge.dest_ref in head_refs:
+            edges_by_cluster_pair[(edge.src.name, edge.dest.name)].append(edge)
+
+    def merged_edge(src_name, dest_name, edges):
+        labels = sorted({edge.label for edge in edges})
+        return Edge(
+            head_by_name[src_name],
+            head_by_name[dest_name],
+            ', '.join(labels),
+            weight=len(edges))
+
+    merged_edges = tuple(
+        merged_edge(src_name, dest_name, edges)
+        for (src_name, dest_name), edges in sorted(edges_by_cluster_pair.items()))
+    return Sketch(beads=tuple(head_by_name.values()), edges=merged_edges)
+
+
 def heads_of(sketch: Sketch) -> Sketch:
     """
     Keep only cluster heads and their inputs.
@@ -94,6 +137,43 @@ def heads_of(sketch: Sketch) -> Sketch:
     return Sketch(beads=tuple(heads), edges=head_edges)
 
 
+def components(sketch: Sketch) -> List[Sketch]:
+    """
+    Split sketch into weakly connected components.
+
+    Versions of a bead are kept together, even if they are not connected through inputs.
+    Components are ordered by decreasing size.
+    Makes new instances
+    """
+    root_by_name = {name: name for name in sketch.cluster_by_name}
+
+    def root(name):
+        while root_by_name[name] != name:
+            # path halving
+            root_by_name[name] = root_by_name[root_by_name[name]]
+            name = root_by_name[name]
+        return name
+
+    for edge in sketch.edges:
+        src_root, dest_root = root(edge.src.name), root(edge.dest.name)
+        if src_root != dest_root:
+            root_by_name[max(src_root, dest_root)] = min(src_root, dest_root)
+
+    beads_by_root: Dict[str, List[Dummy]] = defaultdict(list)
+    for bead in sketch.beads:
+        beads_by_root[root(bead.name)].append(bead)
+    edges_by_root: Dict[str, List[Edge]] = defaultdict(list)
+    for edge in sketch.edges:
+        edges_by_root[root(edge.dest.name)].append(edge)
+
+    def size_and_name(root_name):
+        return (-len(beads_by_root[root_name]), root_name)
+
+    return [
+        Sketch(beads=tuple(beads_by_root[root_name]), edges=tuple(edges_by_root[root_name]))
+        for root_name in sorted(beads_by_root, key=size_and_name)]
+
+
 def add_final_sink_to(sketch: Sketch) -> Tuple[Sketch, Dummy]:
     """
     Add a new node, and edges from all nodes.
@@ -231,13 +311,23 @@ def drop_after(sketch: Sketch, timestamp) -> Sketch:
     raise NotImplementedError
 
 
-def plot_clusters_as_dot(sketch: Sketch):
+# above this many edges graphviz's layout becomes too slow with auxiliary nodes
+MAX_EDGES_WITH_AUXILIARY_NODES = 1000
+
+
+def plot_clusters_as_dot(sketch: Sketch, max_edges_with_auxiliary_nodes=None):
     """
     Generate GraphViz .dot file content, which describe the connections between beads
     and their up-to-date status.
+
+    Edges are drawn with auxiliary nodes for better readability only for smaller graphs,
+    having at most `max_edges_with_auxiliary_nodes` edges.
     """
+    if max_edges_with_auxiliary_nodes is None:
+        max_edges_with_auxiliary_nodes = MAX_EDGES_WITH_AUXILIARY_NODES
     formatted_bead_clusters = '\n\n'.join(c.as_dot for c in sketch.clusters)
-    graphviz_context = graphviz.Context()
+    graphviz_context = graphviz.Context(
+        use_auxiliary_nodes=len(sketch.edges) <= max_edges_with_auxiliary_nodes)
 
     def format_inputs():
         def edges_as_dot():
@@ -245,7 +335,8 @@ def plot_clusters_as_dot(sketch: Sketch):
                 is_auxiliary_edge = (
                     edge.dest.freshness not in (OUT_OF_DATE, UP_TO_DATE))
 
-                yield graphviz_context.dot_edge(edge.src, edge.dest, edge.label, is_auxiliary_edge)
+                yield graphviz_context.dot_edge(
+                    edge.src, edge.dest, edge.label, is_auxiliary_edge, edge.weight)
         return '\n'.join(edges_as_dot())
 
     return graphviz.DOT_GRAPH_TEMPLATE.format(
@@ -1,18 +1,19 @@
-from bead.exceptions import InvalidArchive
+from bead.exceptions import InvalidArchive, InvalidEnvironment
+from bead.archive import SCOPE_ALL, SCOPE_CODE
 import os
 import sys
+import warnings
 
 from bead import tech
 from bead.workspace import Workspace
 from bead import layouts
-import bead.spec as bead_spec
 
 from .cmdparse import Command
 from .common import assert_valid_workspace, die, warning
 from .common import DefaultArgSentinel
-from .common import OPTIONAL_WORKSPACE, OPTIONAL_ENV
+from .common import OPTIONAL_WORKSPACE, OPTIONAL_ENV, CURRENT_WORKSPACE, resolve_workspace
 from .common import BEAD_REF_BASE, BEAD_TIME, resolve_bead
-from .common import verify_with_feedback
+from .common import REVERIFY, get_verification_cache, verify_with_feedback
 from . import arg_metavar
 from . import arg_help
 
@@ -76,12 +77,17 @@ class CmdSave(Command):
     def declare(self, arg):
         arg('box_name', nargs='?', default=USE_THE_ONLY_BOX, type=str,
             metavar=arg_metavar.BOX, help=arg_help.BOX)
+        arg('--delta', dest='delta', default=False, action='store_true',
+            help='Copy files unchanged since the latest version in the box'
+            ' from it, instead of compressing them again'
+            ' (they are still decompressed and verified before copying,'
+            ' which is much faster than compressing, but not free)')
         arg(OPTIONAL_WORKSPACE)
         arg(OPTIONAL_ENV)
 
     def run(self, args):
         box_name = args.box_name
-        workspace = args.workspace
+        workspace = resolve_workspace(args.workspace)
         env = args.get_env()
         assert_valid_workspace(workspace)
         # XXX: (usability) save - support saving directly to a directory outside of workspace
@@ -107,7 +113,14 @@ class CmdSave(Command):
             box = env.get_box(box_name)
             if box is None:
                 die(f'Unknown box: {box_name}')
-        location = box.store(workspace, timestamp())
+        with warnings.catch_warnings(record=True) as store_warnings:
+            warnings.simplefilter('always', UserWarning)
+            try:
+                location = box.store(workspace, timestamp(), delta=args.delta)
+            except InvalidEnvironment as e:
+                die(str(e))
+        for store_warning in store_warnings:
+            warning(str(store_warning.message))
         print(f'Successfully stored bead at {location}.')
 
 
@@ -129,6 +142,7 @@ class CmdDevelop(Command):
         arg('-x', '--extract-output', dest='extract_output',
             default=False, action='store_true',
             help='Extract output data as well (normally it is not needed!).')
+        arg(REVERIFY)
         arg(OPTIONAL_ENV)
 
     def run(self, args):
@@ -139,7 +153,9 @@ class CmdDevelop(Command):
         except LookupError:
             die('Bead not found!')
         try:
-            verify_with_feedback(bead)
+            verify_with_feedback(
+                bead, get_verification_cache(args),
+                scope=SCOPE_ALL if extract_output else SCOPE_CODE)
         except InvalidArchive:
             die('Bead is damaged')
         if args.workspace is DERIVE_FROM_BEAD_NAME:
@@ -163,12 +179,24 @@ class CmdDevelop(Command):
             print('Input data not loaded, update if needed and load manually')
 
 
+def _print_input_filter(workspace, input_nick):
+    include, exclude = workspace.get_input_filter(input_nick)
+    if include:
+        print(f'\tInclude:     {" ".join(include)}')
+    if exclude:
+        print(f'\tExclude:     {" ".join(exclude)}')
+
+
 def print_inputs(env, workspace, verbose):
     assert_valid_workspace(workspace)
     inputs = sorted(workspace.inputs)
 
     if inputs:
         boxes = env.get_boxes()
+        input_bead_names = {
+            input.name: workspace.get_input_bead_name(input.name) for input in inputs}
+        queries = [(input_bead_names[input.name], input.freeze_time) for input in inputs]
+        box_contexts = [box.get_contexts(queries) for box in boxes]
 
         print('Inputs:')
         has_not_loaded = False
@@ -180,17 +208,17 @@ def print_inputs(env, workspace, verbose):
             has_not_loaded = has_not_loaded or is_not_loaded
             print(f'input/{input.name}')
             print(f'\tStatus:      {"**NOT LOADED**" if is_not_loaded else "loaded"}')
-            input_bead_name = workspace.get_input_bead_name(input.name)
+            input_bead_name = input_bead_names[input.name]
             print(f'\tBead:        {input_bead_name} # {input.freeze_time_str}')
+            _print_input_filter(workspace, input.name)
             if verbose:
                 print(f'\tKind:        {input.kind}')
                 print(f'\tContent id:  {input.content_id}')
             print('\tBox[es]:')
             has_box = False
-            for box in boxes:
+            for box, contexts in zip(boxes, box_contexts):
                 try:
-                    context = box.get_context(
-                        bead_spec.BEAD_NAME, input_bead_name, input.freeze_time)
+                    context = contexts[(input_bead_name, input.freeze_time)]
                 except LookupError:
                     # not in this box
                     continue
@@ -223,7 +251,7 @@ class CmdStatus(Command):
         arg(OPTIONAL_ENV)
 
     def run(self, args):
-        workspace = args.workspace
+        workspace = resolve_workspace(args.workspace)
         verbose = args.verbose
         env = args.get_env()
         kind_needed = verbose
@@ -243,15 +271,16 @@ class CmdZap(Command):
     '''
 
     def declare(self, arg):
-        arg(WORKSPACE_defaulting_to(Workspace.for_current_working_directory()))
+        arg(WORKSPACE_defaulting_to(CURRENT_WORKSPACE))
 
     def run(self, args):
-        workspace = args.workspace
+        workspace = resolve_workspace(args.workspace)
         assert_valid_workspace(workspace)
         directory = workspace.directory
         # on non-posix systems (Windows) it might happen, that we can not remove
         # the directory we are in -> ignore errors
-        tech.fs.rmtree(directory, ignore_errors=os.name != 'posix')
+        tech.fs.rmtree(
+            directory, ignore_errors=os.name != 'posix', jobs=tech.fs.DELETION_THREADS)
         print(f'Deleted workspace {directory}')
 
 
@@ -0,0 +1,88 @@
+'''
+Micro benchmark of file hashing (bead.tech.securehash.file)
+
+Compares the current implementation - reads into a reused buffer (reads), or
+memory mapping files of at least MMAP_MIN_SIZE bytes (default) - with the previous
+one (allocating a new block for each read), for various file and block sizes.
+
+Usage: python tests/benchmark_securehash.py [DIRECTORY]
+'''
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+# run as a script, sys.path[0] is tests/ - bead is found in the repository root
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from bead.tech import securehash  # noqa: E402
+
+
+FILE_SIZES = (4 * 1024, 1024 ** 2, 64 * 1024 ** 2, 256 * 1024 ** 2)
+BLOCK_SIZES = (64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2)
+REPEAT = 3
+
+
+def previous_file_hash(file, file_size, block_size=securehash.READ_BLOCK_SIZE):
+    hash = hashlib.sha512()
+    securehash._add_prefix(hash, file_size)
+    bytes_read = 0
+    with file:
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            bytes_read += len(block)
+            hash.update(block)
+    assert bytes_read == file_size
+    securehash._add_suffix(hash, file_size)
+    return str(hash.hexdigest())
+
+
+def throughput(hash_function, path, size, **kwargs):
+    '''
+    Return the best of REPEAT runs in MiB/s.
+    '''
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        hash_function(open(path, 'rb'), size, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return size / 1024 ** 2 / max(best, 1e-9)
+
+
+def benchmark(directory):
+    print(f'{"file size":>12} {"block size":>12} {"previous":>12} {"reads":>12} {"default":>12}')
+    for size in FILE_SIZES:
+        path = os.path.join(directory, f'file-{size}')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        assert previous_file_hash(open(path, 'rb'), size) == securehash.file(
+            open(path, 'rb'), size)
+        default_throughput = throughput(securehash.file, path, size)
+        for block_size in BLOCK_SIZES:
+            previous = throughput(previous_file_hash, path, size, block_size=block_size)
+            securehash.MMAP_MIN_SIZE, mmap_min_size = float('inf'), securehash.MMAP_MIN_SIZE
+            try:
+                reads = throughput(securehash.file, path, size, block_size=block_size)
+            finally:
+                securehash.MMAP_MIN_SIZE = mmap_min_size
+            print(
+                f'{size:>12} {block_size:>12} {previous:>10.0f}/s {reads:>10.0f}/s'
+                f' {default_throughput:>10.0f}/s')
+        os.remove(path)
+
+
+def main():
+    if len(sys.argv) > 1:
+        benchmark(sys.argv[1])
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            benchmark(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+'''
+Startup time benchmark: `bead` is called many times from scripts.
+
+Reports the cumulative import time of bead_cli.main (as reported by -X importtime),
+and the most expensive modules imported by it.
+
+Usage: python tests/benchmark_startup.py
+'''
+
+import os
+import subprocess
+import sys
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# cumulative import time of bead_cli.main in microseconds, that is to be kept
+IMPORT_TIME_BUDGET_US = 100000
+REPEAT = 5
+TOP = 15
+
+
+def import_times_us(module):
+    '''
+    Return {imported module: cumulative import time in microseconds}.
+    '''
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_ROOT, check=True, capture_output=True, universal_newlines=True).stderr
+    times = {}
+    # lines look like: 'import time:       692 |      70995 | bead_cli.main'
+    for line in stderr.splitlines()[1:]:
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    runs = [import_times_us('bead_cli.main') for _ in range(REPEAT)]
+    best = min(runs, key=lambda times: times['bead_cli.main'])
+    total = best['bead_cli.main']
+    print(f'bead_cli.main: {total} us (budget: {IMPORT_TIME_BUDGET_US} us, best of {REPEAT})')
+    for name, time in sorted(best.items(), key=lambda item: item[1], reverse=True)[1:TOP]:
+        print(f'{time:>10} us  {name}')
+    if total > IMPORT_TIME_BUDGET_US:
+        sys.exit('Import time budget exceeded')
+
+
+if __name__ == '__main__':
+    main()
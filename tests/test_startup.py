@@ -0,0 +1,55 @@
+'''
+`bead` is called many times from scripts, so its startup should be fast:
+modules implementing commands should be imported only when the command is used.
+
+See also benchmark_startup.py.
+'''
+import os
+import subprocess
+import sys
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY_MODULES = (
+    'bead.workspace',
+    'bead.box',
+    'bead_cli.common',
+    'bead_cli.workspace',
+    'bead_cli.input',
+    'bead_cli.box',
+    'bead_cli.web.commands',
+)
+
+
+def run_python(code, *options):
+    return subprocess.run(
+        [sys.executable, *options, '-c', code],
+        cwd=REPO_ROOT, check=True, capture_output=True, universal_newlines=True)
+
+
+def test_version_command_does_not_import_command_modules(tmp_path):
+    code = '\n'.join((
+        'import sys',
+        'import bead_cli.main',
+        f'bead_cli.main.run({str(tmp_path)!r}, ["version"])',
+        'print(*sorted(sys.modules))',
+    ))
+
+    imported_modules = set(run_python(code).stdout.split())
+
+    assert set(LAZY_MODULES) & imported_modules == set()
+
+
+def test_command_modules_are_imported_when_used(tmp_path):
+    code = '\n'.join((
+        'import sys',
+        'import bead_cli.main',
+        f'bead_cli.main.run({str(tmp_path)!r}, ["box", "list", "--env", {str(tmp_path)!r}])',
+        'print(*sorted(sys.modules))',
+    ))
+
+    imported_modules = set(run_python(code).stdout.split())
+
+    assert 'bead_cli.box' in imported_modules
+    assert 'bead_cli.input' not in imported_modules
@@ -0,0 +1,31 @@
+from tests.sketcher import Sketcher
+from bead_cli.web.cluster import Cluster, create_cluster_index
+
+
+def test_batch_and_incremental_construction_agree():
+    sketcher = Sketcher()
+    sketcher.define('a3 a1 a5 a2 a4')
+    beads = [sketcher[name] for name in ('a3', 'a1', 'a5', 'a2', 'a4')]
+    cluster = Cluster('a')
+    for bead in beads:
+        cluster.add(bead)
+
+    [batch_cluster] = create_cluster_index(beads).values()
+
+    assert cluster.beads() == batch_cluster.beads()
+    assert [b.content_id for b in cluster.beads()] == [
+        'content_id_a5', 'content_id_a4', 'content_id_a3', 'content_id_a2', 'content_id_a1']
+    assert cluster.head is batch_cluster.head
+
+
+def test_head_is_not_phantom():
+    sketcher = Sketcher()
+    sketcher.define('a1 a2 b1')
+    sketcher.phantom('a2')
+    sketcher.compile('a2 -> b1')
+
+    cluster = sketcher.sketch.cluster_by_name['a']
+
+    assert len(cluster) == 2
+    assert cluster.head.content_id == 'content_id_a1'
+    assert cluster.beads()[0].content_id == 'content_id_a2'
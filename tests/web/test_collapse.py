@@ -0,0 +1,56 @@
+from tests.sketcher import Sketcher, bead
+from bead_cli.web.sketch import collapse, plot_clusters_as_dot
+from bead_cli.web.freshness import UP_TO_DATE, OUT_OF_DATE
+
+
+def sketch_with_history():
+    sketcher = Sketcher()
+    sketcher.define('a1 a2 b1 b2 c1')
+    sketcher.compile(
+        """
+        a1 -> b1 -> c1
+        a2 -> b2
+        a1 -:older:-> b2
+        """
+    )
+    return sketcher.sketch
+
+
+def test_collapse_keeps_only_heads():
+    sketch = collapse(sketch_with_history())
+
+    assert {b.content_id for b in sketch.beads} == {
+        'content_id_a2', 'content_id_b2', 'content_id_c1'}
+    assert all(len(cluster) == 1 for cluster in sketch.clusters)
+
+
+def test_collapse_merges_parallel_edges():
+    sketch = collapse(sketch_with_history())
+
+    edges = {(e.src.name, e.dest.name): e for e in sketch.edges}
+    assert set(edges) == {('a', 'b'), ('b', 'c')}
+    assert edges[('a', 'b')].weight == 2
+    assert edges[('a', 'b')].label == 'a, older'
+    assert edges[('b', 'c')].weight == 1
+
+
+def test_collapse_keeps_freshness():
+    sketch = sketch_with_history()
+    sketch.color_beads()
+    sketch = collapse(sketch)
+
+    assert bead(sketch, 'b2').freshness == OUT_OF_DATE
+    assert bead(sketch, 'a2').freshness == UP_TO_DATE
+
+
+def test_auxiliary_nodes_are_dropped_for_big_graphs():
+    sketch = sketch_with_history()
+
+    assert 'unique_' in plot_clusters_as_dot(sketch)
+    assert 'unique_' not in plot_clusters_as_dot(sketch, max_edges_with_auxiliary_nodes=3)
+
+
+def test_weighted_edges_are_thicker():
+    dot = plot_clusters_as_dot(collapse(sketch_with_history()))
+
+    assert dot.count('penwidth="2"') == 1
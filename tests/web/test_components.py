@@ -0,0 +1,38 @@
+from tests.sketcher import Sketcher
+
+
+def test_components():
+    sketcher = Sketcher()
+    sketcher.define('a1 a2 b1 c1 d1 e1 f1')
+    sketcher.compile(
+        """
+        a1 -> b1
+        a2 -> c1
+              d1 -> e1
+        """
+    )
+
+    components = sketcher.sketch.components()
+
+    assert [{b.name for b in c.beads} for c in components] == [set('abc'), set('de'), set('f')]
+    assert [len(c.edges) for c in components] == [2, 1, 0]
+
+
+def test_components_of_empty_sketch():
+    sketcher = Sketcher()
+
+    assert sketcher.sketch.components() == []
+
+
+def test_dot_is_regenerated_after_coloring():
+    sketcher = Sketcher()
+    sketcher.define('a1 a2 b1')
+    sketcher.compile('a1 -> b1')
+    sketch = sketcher.sketch
+
+    dot = sketch.as_dot()
+    assert dot is sketch.as_dot()
+    assert 'orange' not in dot
+
+    sketch.color_beads()
+    assert 'orange' in sketch.as_dot()